@@ -9,19 +9,71 @@ Tab 4: Tasks 107-110 - permit checkboxes + additional permits + 108-110 checkbox
 Run:
   pip install -r requirements.txt
   streamlit run app.py
+
+Tests:
+  pip install -r requirements-dev.txt
+  python -m pytest tests
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import RerunException, get_script_run_ctx
 import re
 import json
+import hashlib
+import hmac
+import logging
+import time
+import traceback
+import os
 import pathlib
+import uuid
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+import altair as alt
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse, quote
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+
+from overlays import (
+    EnvironmentalOverlays,
+    JurisdictionOverlays,
+    ParcelLocator,
+    load_environmental_overlays,
+    load_jurisdiction_overlays,
+    load_parcel_locator,
+)
+from proposal_store import BitmapIndex, BitRegistry, ProposalStore
+from fee_analytics import FeeSuggester
+from similarity import SimilarityIndex
+from revisions import RevisionHistory, describe_change
+from session_spill import SessionSpiller, session_footprint
+from cache_backends import TieredCache, make_cache
+from rate_card import TASK_310_HOURS_KEYS, RateCardWatcher
+from proposal_rules import RuleError, RuleSet, load_rules
+from rate_limit import RateLimitTimeout, TokenBucket
+from lookup_queue import LookupQueue, LookupReplayer
+from response_archive import ResponseArchive
+from tracing import Tracer, waterfall_rows
+from metrics import REGISTRY, start_http_server
+from profiling import NULL_PROFILE, RerunProfile
+from warmup import ColdStart, Warmup
+from pcpao import (
+    BASE_URL as PCPAO_BASE_URL,
+    PARSER_VERSION,
+    PINELLAS_CITY_MAP,
+    QUICKSEARCH_URL,
+    details_url,
+    expand_city_name,
+    extract_record,
+    normalize_parcel_id,
+    parcel_key,
+    quicksearch_payload,
+    quicksearch_row,
+    register_city_names,
+    row_fingerprint,
+    RevalidationCounters,
+)
 
 # -----------------------------------------------------------------------------
 # Config
@@ -31,390 +83,82 @@ st.set_page_config(page_title="Proposal App (Test)", page_icon="📄", layout="w
 # -----------------------------------------------------------------------------
 # UI Styling
 # -----------------------------------------------------------------------------
-CUSTOM_CSS = """
-<style>
-/* Design tokens */
-:root {
-    --navy: #0b1f3a;
-    --navy-2: #122c54;
-    --ink: #101820;
-    --paper: #f7f8fb;
-    --panel: #ffffff;
-    --border: #c9d3e1;
-    --field-border: #0b1f3a;
-    --field-border-width: 1px;
-    --field-radius: 8px;
-    --btn-bg: #eef3fb;
-    --btn-text: #0b1f3a;
-    --tab-bg: #e9eef6;
-    --tab-bg-active: #ffffff;
-    --tab-border: #0b1f3a;
-    --tab-text: #0b1f3a;
-    --tab-text-active: #0b1f3a;
-    --tab-shadow: 0 6px 14px rgba(11,31,58,0.12);
-}
-
-/* App background */
-html, body, [data-testid="stAppViewContainer"], .stApp {
-    background: var(--paper) !important;
-}
-
-/* Make labels and text readable */
-label, .stMarkdown, .stText, p, span, div {
-    color: var(--ink) !important;
-}
-
-/* Force readable input text (including disabled) */
-input[type="text"], input[type="number"], textarea {
-    color: var(--ink) !important;
-    -webkit-text-fill-color: var(--ink) !important;
-}
-input::placeholder, textarea::placeholder {
-    color: #8a96a8 !important;
-    -webkit-text-fill-color: #8a96a8 !important;
-}
-
-/* Inputs: text, number, textarea */
-input[type="text"], input[type="number"], textarea {
-    border: 0 !important;
-    border-radius: var(--field-radius) !important;
-    background: var(--panel) !important;
-    color: var(--ink) !important;
-    box-shadow: none !important;
-}
-/* Number input steppers: hide right-side buttons */
-/* Hide ALL buttons inside number inputs - BaseWeb and native */
-div[data-baseweb="input"] button,
-div[data-baseweb="input"] [data-baseweb="button"],
-div[data-baseweb="input"] [role="button"],
-div[data-baseweb="base-input"] button,
-[data-baseweb="base-input"] button {
-    display: none !important;
-    width: 0 !important;
-    height: 0 !important;
-    visibility: hidden !important;
-}
-/* Hide buttons that appear between columns/inputs */
-div[data-testid="column"] button,
-div[data-testid="stHorizontalBlock"] button,
-.stNumberInput button {
-    display: none !important;
-    width: 0 !important;
-    visibility: hidden !important;
-}
-div[data-baseweb="input"] [aria-label="Increment"],
-div[data-baseweb="input"] [aria-label="Decrement"] {
-    display: none !important;
-}
-/* More aggressive button hiding */
-div[data-baseweb="input"] button[title="Increment value"],
-div[data-baseweb="input"] button[title="Decrement value"] {
-    display: none !important;
-    visibility: hidden !important;
-}
-/* Hide the button container completely */
-div[data-baseweb="input"] > div > div > div:has(button) {
-    display: none !important;
-}
-/* Target StepperButton specifically */
-button[class*="StepperButton"],
-button[class*="stepper"],
-div[class*="StepperButton"],
-div[class*="InputSteppers"] {
-    display: none !important;
-    width: 0 !important;
-}
-/* Hide last-child divs that contain buttons */
-div[data-baseweb="input"] > div > div:last-child {
-    display: none !important;
-    width: 0 !important;
-}
-div[data-baseweb="input"] > div > div:last-child > div {
-    display: none !important;
-}
-/* Native browser spinners */
-input[type="number"]::-webkit-inner-spin-button,
-input[type="number"]::-webkit-outer-spin-button {
-    -webkit-appearance: none !important;
-    margin: 0 !important;
-    display: none !important;
-}
-input[type="number"] {
-    -moz-appearance: textfield !important;
-}
-/* NUCLEAR OPTION: Hide all buttons in row containers */
-[data-testid="stHorizontalBlock"] button[kind="secondary"] {
-    display: none !important;
-}
-
-/* Additional Services: wrap long labels tighter */
-.additional-services label {
-    max-width: 260px;
-    display: inline-block;
-    white-space: normal;
-}
-.st-key-tab3-scope .task-label {
-    margin-top: 10px;
-    line-height: 1.2;
-}
-.st-key-tab3-scope div[data-baseweb="checkbox"] {
-    margin-top: 0;
-}
-.additional-services .svc-label {
-    margin-top: 10px;
-    line-height: 1.2;
-}
-.st-key-tab3-scope div[data-baseweb="input"] {
-    margin-top: 0;
-}
-.additional-services div[data-baseweb="checkbox"] {
-    max-width: 260px;
-}
-.additional-services div[data-baseweb="input"] {
-    max-width: 260px;
-    margin-left: 24px;
-}
-/* BaseWeb input wrapper consistency */
-div[data-baseweb="input"] > div {
-    border: var(--field-border-width) solid var(--field-border) !important;
-    border-radius: var(--field-radius) !important;
-    background: var(--panel) !important;
-    box-shadow: 0 2px 6px rgba(11,31,58,0.06) !important;
-}
-div[data-baseweb="input"] input {
-    border: none !important;
-    box-shadow: none !important;
-}
-input[disabled], textarea[disabled] {
-    color: var(--ink) !important;
-    -webkit-text-fill-color: var(--ink) !important;
-    opacity: 1 !important;
-    background: #ffffff !important;
-}
-
-/* Selectbox (BaseWeb) */
-div[data-baseweb="select"] > div {
-    border: var(--field-border-width) solid var(--field-border) !important;
-    border-radius: var(--field-radius) !important;
-    background: var(--panel) !important;
-    color: var(--ink) !important;
-    box-shadow: 0 2px 6px rgba(11,31,58,0.06) !important;
-}
-div[data-baseweb="select"] [aria-disabled="true"] {
-    color: var(--ink) !important;
-    -webkit-text-fill-color: var(--ink) !important;
-    opacity: 1 !important;
-}
-div[data-baseweb="select"] * {
-    color: var(--ink) !important;
-}
-div[data-baseweb="select"] [data-baseweb="select"] {
-    background: var(--panel) !important;
-}
-
-/* Multiselect / dropdown menu background */
-div[data-baseweb="popover"] {
-    color: var(--ink) !important;
-}
-ul[role="listbox"] {
-    background: var(--panel) !important;
-}
-li[role="option"] {
-    background: var(--panel) !important;
-    color: var(--ink) !important;
-}
-li[role="option"][aria-selected="true"] {
-    background: #eef3fb !important;
-    color: var(--ink) !important;
-}
-
-/* Checkboxes: increase contrast */
-div[data-baseweb="checkbox"] svg {
-    color: var(--navy) !important;
-    fill: none !important;
-}
-div[data-baseweb="checkbox"] > div,
-div[data-baseweb="checkbox"] div[role="checkbox"] {
-    border-color: #b9c6db !important;
-    background: #edf2f9 !important;
-    opacity: 0.8 !important;
-    border-width: 0.2px !important;
-    border-radius: 4px !important;
-    box-shadow: inset 0 0 0 0.2px #b9c6db !important;
-}
-div[data-baseweb="checkbox"] div[role="checkbox"][aria-checked="true"] {
-    background: #edf2f9 !important;
-    border-color: #b9c6db !important;
-    box-shadow: inset 0 0 0 1px #b9c6db !important;
-}
-div[data-baseweb="checkbox"] div[role="checkbox"] > div {
-    background: #edf2f9 !important;
-}
-div[data-baseweb="checkbox"] div[role="checkbox"] svg {
-    fill: none !important;
-}
-div[data-baseweb="checkbox"] div[role="checkbox"] svg rect {
-    fill: #edf2f9 !important;
-    stroke: #b9c6db !important;
-    stroke-width: 0.2px !important;
-}
-div[data-baseweb="checkbox"] div[role="checkbox"] svg path {
-    stroke: #6b7a99 !important;
-    fill: none !important;
-}
-div[data-baseweb="checkbox"] div[role="checkbox"]::before,
-div[data-baseweb="checkbox"] div[role="checkbox"]::after {
-    background: #edf2f9 !important;
-}
-
-/* Total proposal cost badge */
-.total-proposal-badge {
-    background: #f1f5fb;
-    border: 2px solid var(--navy);
-    color: var(--navy);
-    border-radius: 10px;
-    padding: 10px 14px;
-    font-weight: 700;
-    text-align: right;
-    box-shadow: 0 6px 14px rgba(11,31,58,0.12);
-}
-
-/* Buttons */
-button[kind="primary"], button, .stButton>button {
-    border: 2px solid var(--navy) !important;
-    background: var(--btn-bg) !important;
-    color: var(--btn-text) !important;
-    border-radius: var(--field-radius) !important;
-    box-shadow: 0 6px 14px rgba(11,31,58,0.12) !important;
-    height: 46px !important;
-}
-button:hover, .stButton>button:hover {
-    background: #e4ebf7 !important;
-}
-button:disabled, .stButton>button:disabled {
-    border: 2px solid var(--navy) !important;
-    background: var(--btn-bg) !important;
-    color: var(--btn-text) !important;
-    box-shadow: none !important;
-    opacity: 1 !important;
-}
-
-/* Link buttons should match regular buttons */
-div[data-testid="stLinkButton"] > a,
-div[data-testid="stLinkButton"] > a > button {
-    border: 2px solid var(--navy) !important;
-    background: var(--btn-bg) !important;
-    color: var(--btn-text) !important;
-    border-radius: var(--field-radius) !important;
-    box-shadow: 0 6px 14px rgba(11,31,58,0.12) !important;
-    height: 46px !important;
-}
-div[data-testid="stLinkButton"] > a:hover,
-div[data-testid="stLinkButton"] > a:hover > button {
-    background: #e4ebf7 !important;
-}
+# Theme styles live in static/theme.css. With server.enableStaticServing (see
+# .streamlit/config.toml) each rerun only carries a <link> whose ?v= content
+# hash lets the browser/proxy cache the stylesheet indefinitely; without it the
+# stylesheet is inlined as before.
+THEME_CSS_PATH = pathlib.Path(__file__).parent / "static" / "theme.css"
 
-/* Help tooltip icon */
-[data-testid="stTooltipIcon"] {
-    width: 22px !important;
-    height: 22px !important;
-    min-width: 22px !important;
-    min-height: 22px !important;
-    border-radius: 50% !important;
-    background: var(--paper) !important;
-    border: 2px solid var(--navy) !important;
-    display: inline-flex !important;
-    align-items: center !important;
-    justify-content: center !important;
-}
-[data-testid="stTooltipIcon"] svg {
-    width: 12px !important;
-    height: 12px !important;
-    color: var(--navy) !important;
-    fill: var(--navy) !important;
-}
-
-/* Tabs */
-div[data-testid="stTabs"] {
-    margin-top: 6px;
-}
-div[data-testid="stTabs"] button[role="tab"] {
-    background: var(--tab-bg) !important;
-    color: var(--tab-text) !important;
-    border: 1px solid var(--tab-border) !important;
-    border-bottom: 0 !important;
-    border-radius: 12px 12px 0 0 !important;
-    padding: 10px 18px !important;
-    margin-right: 8px !important;
-    box-shadow: var(--tab-shadow) !important;
-    font-weight: 600 !important;
-    letter-spacing: 0.2px !important;
-}
-div[data-testid="stTabs"] button[role="tab"][aria-selected="true"] {
-    background: var(--tab-bg-active) !important;
-    color: var(--tab-text-active) !important;
-    border-bottom-color: transparent !important;
-    box-shadow: none !important;
-}
-div[data-testid="stTabs"] div[role="tablist"] {
-    gap: 6px !important;
-    border-bottom: 1px solid var(--border) !important;
-    padding-bottom: 4px !important;
-}
+@st.cache_resource
+def theme_stylesheet_tag(static_serving: bool) -> str:
+    css = THEME_CSS_PATH.read_bytes()
+    if static_serving:
+        version = hashlib.sha256(css).hexdigest()[:12]
+        return f'<link rel="stylesheet" href="app/static/theme.css?v={version}">'
+    return f"<style>\n{css.decode('utf-8')}</style>"
 
-/* Expand sidebar/background if present */
-section[data-testid="stSidebar"] {
-    background: var(--paper) !important;
-}
-</style>
-"""
-st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+st.markdown(theme_stylesheet_tag(bool(st.get_option("server.enableStaticServing"))), unsafe_allow_html=True)
 
 
 BASE_DIR = pathlib.Path(__file__).parent
 CITY_LOOKUP_PATH = BASE_DIR / "Data" / "pinellas_county_cities_lookup.json"
+OVERLAY_DIR = BASE_DIR / "Data" / "overlays"
+PROPOSAL_STORE_PATH = pathlib.Path(os.environ.get("PROPOSAL_STORE_PATH", BASE_DIR / "Data" / "proposals.db"))
+SESSION_SPILL_DIR = pathlib.Path(os.environ.get("SESSION_SPILL_DIR", BASE_DIR / "Data" / "session_spill"))
+SESSION_IDLE_SPILL_SECONDS = float(os.environ.get("SESSION_IDLE_SPILL_SECONDS", "900"))
+# Admin panels are shown when the URL carries ?admin=<PROPOSAL_ADMIN_TOKEN>.
+ADMIN_TOKEN = os.environ.get("PROPOSAL_ADMIN_TOKEN", "")
+# Parcel lookups and jurisdiction data are cached across worker processes:
+# "sqlite" (default, shared file), "redis" (PROPOSAL_CACHE_REDIS_URL) or "lru" (per process).
+CACHE_BACKEND = os.environ.get("PROPOSAL_CACHE_BACKEND", "sqlite")
+CACHE_PATH = pathlib.Path(os.environ.get("PROPOSAL_CACHE_PATH", BASE_DIR / "Data" / "cache.db"))
+CACHE_REDIS_URL = os.environ.get("PROPOSAL_CACHE_REDIS_URL", "redis://localhost:6379/0")
+PARCEL_CACHE_TTL_SECONDS = float(os.environ.get("PARCEL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Fingerprints outlive the records so expired parcels can be revalidated cheaply.
+PARCEL_FINGERPRINT_TTL_SECONDS = float(os.environ.get("PARCEL_FINGERPRINT_TTL_SECONDS", str(90 * 24 * 3600)))
+
+# Fees and rates (all versions); edits are picked up by running workers within seconds.
+RATE_CARD_PATH = pathlib.Path(os.environ.get("PROPOSAL_RATE_CARD_PATH", BASE_DIR / "Data" / "rate_card.json"))
+# Consistency checks run on every save (`python proposal_rules.py scan` checks the whole store).
+PROPOSAL_RULES_PATH = pathlib.Path(os.environ.get("PROPOSAL_RULES_PATH", BASE_DIR / "Data" / "proposal_rules.json"))
+
+# Host-wide budget for pcpao.gov requests, shared by all workers and batch jobs.
+PCPAO_RATE_PER_SECOND = float(os.environ.get("PCPAO_RATE_PER_SECOND", "2"))
+PCPAO_RATE_BURST = float(os.environ.get("PCPAO_RATE_BURST", "5"))
+PCPAO_RATE_STATE_PATH = pathlib.Path(os.environ.get("PCPAO_RATE_STATE_PATH", BASE_DIR / "Data" / "pcpao_rate.json"))
+# Lookups that cannot reach pcpao.gov are queued here and replayed in the background.
+# For PCPAO_OFFLINE_SECONDS after a failed lookup, Tab 1 queues without trying the network.
+LOOKUP_QUEUE_PATH = pathlib.Path(os.environ.get("LOOKUP_QUEUE_PATH", BASE_DIR / "Data" / "lookup_queue.db"))
+PCPAO_OFFLINE_SECONDS = float(os.environ.get("PCPAO_OFFLINE_SECONDS", "60"))
+LOOKUP_REPLAY_POLL_SECONDS = float(os.environ.get("LOOKUP_REPLAY_POLL_SECONDS", "10"))
+# Raw pcpao.gov responses, kept for offline re-extraction (`python pcpao.py reextract`).
+# Set RESPONSE_ARCHIVE_DIR to an empty string to turn archiving off.
+RESPONSE_ARCHIVE_DIR = os.environ.get("RESPONSE_ARCHIVE_DIR", str(BASE_DIR / "Data" / "response_archive"))
+RESPONSE_ARCHIVE_COMPRESSION = os.environ.get("RESPONSE_ARCHIVE_COMPRESSION", "zlib")
+# Tracing spans go to <dir>/trace-<pid>.json (Chrome trace format) when set.
+TRACE_DIR = os.environ.get("PROPOSAL_TRACE_DIR", "")
+TRACE_MAX_BYTES = int(os.environ.get("PROPOSAL_TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Admin "Write .prof files" saves each profiled rerun under <dir>/<time>-<session>/.
+PROFILE_DIR = pathlib.Path(os.environ.get("PROPOSAL_PROFILE_DIR", BASE_DIR / "Data" / "profiles"))
+# Stages run in the background once per worker process after its first page load:
+# comma-separated subset of jurisdiction,parsers,templates,connections,parcels ("off" for none).
+WARMUP_STAGES = os.environ.get("PROPOSAL_WARMUP", "jurisdiction,parsers,templates,connections,parcels")
+WARMUP_PARCELS = int(os.environ.get("PROPOSAL_WARMUP_PARCELS", "20"))
+
+# Getters reached from the warm-up and lookup replayer threads set show_spinner=False:
+# a cache miss there has no page to draw a spinner on (no ScriptRunContext).
+@st.cache_resource(show_spinner=False)
+def get_tracer() -> Tracer:
+    return Tracer(pathlib.Path(TRACE_DIR) if TRACE_DIR else None, max_bytes=TRACE_MAX_BYTES)
+
+@st.cache_resource(show_spinner=False)
+def get_shared_cache() -> TieredCache:
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    return make_cache(CACHE_BACKEND, sqlite_path=str(CACHE_PATH), redis_url=CACHE_REDIS_URL)
 
 # -----------------------------------------------------------------------------
 # City lookup + map button helpers (from your Tab 1 code)
 # -----------------------------------------------------------------------------
-PINELLAS_CITY_MAP = {
-    'SP': 'St. Petersburg',
-    'ST PETERSBURG': 'St. Petersburg',
-    'ST. PETERSBURG': 'St. Petersburg',
-    'CLEARWATER': 'Clearwater',
-    'CW': 'Clearwater',
-    'CWD': 'Clearwater',
-    'LARGO': 'Largo',
-    'LA': 'Largo',
-    'PINELLAS PARK': 'Pinellas Park',
-    'PP': 'Pinellas Park',
-    'PPW': 'Pinellas Park',
-    'DUNEDIN': 'Dunedin',
-    'TARPON SPRINGS': 'Tarpon Springs',
-    'TS': 'Tarpon Springs',
-    'SEMINOLE': 'Seminole',
-    'KENNETH CITY': 'Kenneth City',
-    'GULFPORT': 'Gulfport',
-    'MB': 'Madeira Beach',
-    'MADEIRA BEACH': 'Madeira Beach',
-    'REDINGTON BEACH': 'Redington Beach',
-    'TREASURE ISLAND': 'Treasure Island',
-    'ST PETE BEACH': 'St. Pete Beach',
-    'SOUTH PASADENA': 'South Pasadena',
-    'BELLEAIR': 'Belleair',
-    'BELLEAIR BEACH': 'Belleair Beach',
-    'BELLEAIR BLUFFS': 'Belleair Bluffs',
-    'INDIAN ROCKS BEACH': 'Indian Rocks Beach',
-    'INDIAN SHORES': 'Indian Shores',
-    'NORTH REDINGTON BEACH': 'North Redington Beach',
-    'OLDSMAR': 'Oldsmar',
-    'SAFETY HARBOR': 'Safety Harbor',
-    'LFPW': 'Unincorporated Pinellas (Lealman)',
-    'LEALMAN': 'Unincorporated Pinellas (Lealman)',
-    'UNINCORPORATED': 'Unincorporated Pinellas',
-    'COUNTY': 'Unincorporated Pinellas'
-}
-
 def _load_city_lookup() -> Dict[str, Any]:
     try:
         with open(CITY_LOOKUP_PATH, "r", encoding="utf-8") as f:
@@ -422,22 +166,22 @@ def _load_city_lookup() -> Dict[str, Any]:
     except Exception:
         return {}
 
-CITY_LOOKUP = _load_city_lookup()
-CITY_LOOKUP_BY_NAME = {k.strip().lower(): v for k, v in CITY_LOOKUP.items() if isinstance(v, dict)}
+def get_city_lookup() -> Dict[str, Any]:
+    """City lookup JSON, shared between workers; reload with invalidate("jurisdiction")."""
+    return get_shared_cache().get_or_set("jurisdiction", "pinellas_city_lookup", _load_city_lookup, cache_if=bool)
 
-CITY_NAMES_FROM_LOOKUP = {
-    name.strip().upper()
-    for name, meta in CITY_LOOKUP.items()
-    if isinstance(meta, dict) and meta.get("type") == "city_app"
-}
-for city_name in CITY_NAMES_FROM_LOOKUP:
-    PINELLAS_CITY_MAP.setdefault(city_name, city_name.title())
+CITY_LOOKUP = get_city_lookup()
+
+register_city_names(CITY_LOOKUP)
 
 def _get_city_map_url(city_name: str) -> Optional[str]:
     if not city_name:
         return None
     key = city_name.strip().lower()
-    meta = CITY_LOOKUP_BY_NAME.get(key)
+    meta = next(
+        (v for k, v in get_city_lookup().items() if isinstance(v, dict) and k.strip().lower() == key),
+        None,
+    )
     if not meta:
         return None
     for k in (
@@ -479,12 +223,6 @@ def _build_map_url_with_address(map_url: Optional[str], address: str, city: str,
     new_query = urlencode(query, doseq=True, quote_via=quote)
     return urlunparse(parsed._replace(query=new_query))
 
-def expand_city_name(city_abbr: str) -> str:
-    if not city_abbr:
-        return "Unincorporated Pinellas"
-    city_upper = city_abbr.strip().upper()
-    return PINELLAS_CITY_MAP.get(city_upper, city_abbr)
-
 def validate_parcel_id(parcel_id: str):
     if not parcel_id:
         return False, "Parcel ID cannot be empty"
@@ -494,16 +232,6 @@ def validate_parcel_id(parcel_id: str):
         return False, "Invalid characters in parcel ID"
     return True, ""
 
-def strip_dor_code(land_use_text: str) -> str:
-    if not land_use_text:
-        return ""
-    t = land_use_text.strip()
-    if t and t[0].isdigit():
-        parts = t.split(" ", 1)
-        if len(parts) > 1:
-            return parts[1].strip()
-    return t
-
 def _slug(s: str) -> str:
     return re.sub(r"[^a-z0-9]+", "-", s.lower()).strip("-")
 
@@ -515,119 +243,481 @@ def format_currency(value: Optional[float]) -> str:
     except (TypeError, ValueError):
         return ""
 
+# -----------------------------------------------------------------------------
+# Metrics (Prometheus text format on PROPOSAL_METRICS_HOST:PROPOSAL_METRICS_PORT/metrics)
+# -----------------------------------------------------------------------------
+METRICS_HOST = os.environ.get("PROPOSAL_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("PROPOSAL_METRICS_PORT", "9464"))  # 0 turns the endpoint off
+
+PCPAO_LOOKUPS = REGISTRY.counter(
+    "pcpao_lookups_total",
+    "Parcel lookups by outcome (cache_hit, full_fetch, changed, row_unchanged, not_modified, failed, offline).",
+    ["outcome"],
+)
+PCPAO_LOOKUP_SECONDS = REGISTRY.histogram("pcpao_lookup_seconds", "Wall time of parcel lookups that went to pcpao.gov.", ["outcome"])
+UPSTREAM_RESPONSES = REGISTRY.counter("http_upstream_responses_total", "Upstream HTTP responses by host and status.", ["host", "status"])
+UPSTREAM_ERRORS = REGISTRY.counter("http_upstream_errors_total", "Upstream HTTP requests that got no response.", ["host", "error"])
+UPSTREAM_RETRIES = REGISTRY.counter("http_upstream_retries_total", "Retries made by the urllib3 Retry layer.", ["host", "method", "reason"])
+APP_RERUNS = REGISTRY.counter("app_reruns_total", "Streamlit script reruns.")
+APP_RERUN_SECONDS = REGISTRY.histogram("app_rerun_seconds", "Wall time of one script rerun.")
+
+class CountingRetry(Retry):
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # super() raises MaxRetryError once retries are used up, so only real retries are counted.
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        reason = str(response.status) if response is not None else type(error).__name__ if error else "unknown"
+        UPSTREAM_RETRIES.labels(host=getattr(_pool, "host", "") or "", method=method or "", reason=reason).inc()
+        return retry
+
+class InstrumentedAdapter(HTTPAdapter):
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname or ""
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            UPSTREAM_ERRORS.labels(host=host, error=type(e).__name__).inc()
+            raise
+        UPSTREAM_RESPONSES.labels(host=host, status=str(response.status_code)).inc()
+        return response
+
 @st.cache_resource
+def get_metrics_server():
+    """Start the /metrics endpoint once per process and register scrape-time collectors."""
+    cache, limiter, spiller = get_shared_cache(), get_pcpao_limiter(), get_session_spiller()
+
+    def collect():
+        for tier, stats in cache.stats().items():
+            yield "proposal_cache_hits_total", "counter", "Shared cache hits by tier.", {"tier": tier}, stats["hits"]
+            yield "proposal_cache_misses_total", "counter", "Shared cache misses by tier.", {"tier": tier}, stats["misses"]
+        for outcome, count in get_revalidation_counters().snapshot().items():
+            if outcome in RevalidationCounters.OUTCOMES:
+                yield "pcpao_revalidations_total", "counter", "Fingerprint revalidation outcomes.", {"outcome": outcome}, count
+        for lane, lane_stats in limiter.metrics()["lanes"].items():
+            yield "pcpao_rate_limit_queue_depth", "gauge", "Requests waiting for a pcpao.gov token (host-wide).", {"lane": lane}, lane_stats["queue_depth"]
+            yield "pcpao_rate_limit_wait_seconds_total", "counter", "Time spent waiting for pcpao.gov tokens.", {"lane": lane}, lane_stats["wait_seconds"]
+            yield "pcpao_rate_limit_timeouts_total", "counter", "Requests that gave up waiting for a token.", {"lane": lane}, lane_stats["timeouts"]
+        yield "app_sessions_tracked", "gauge", "Browser sessions seen by this worker.", {}, len(spiller.last_seen)
+        yield "app_sessions_spilled", "gauge", "Idle sessions whose state is on disk.", {}, len(spiller.spilled)
+        for event in ("spilled", "rehydrated", "failed"):
+            yield "app_session_spills_total", "counter", "Session spill events.", {"event": event}, spiller.stats[event]
+        for status, count in get_lookup_queue().counts().items():
+            yield "pcpao_lookup_queue_entries", "gauge", "Offline lookup queue entries by status (host-wide).", {"status": status}, count
+
+    REGISTRY.add_collector("app", collect)
+    if not METRICS_PORT:
+        return None
+    return start_http_server(REGISTRY, METRICS_HOST, METRICS_PORT)
+
+@st.cache_resource(show_spinner=False)
 def get_resilient_session():
     session = requests.Session()
-    retry_strategy = Retry(
+    retry_strategy = CountingRetry(
         total=3,
         backoff_factor=1.0,
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["GET", "POST"],
     )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = InstrumentedAdapter(max_retries=retry_strategy)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
 
-def scrape_pinellas_property(parcel_id: str) -> Dict[str, Any]:
+@st.cache_resource(show_spinner=False)
+def get_pcpao_limiter() -> TokenBucket:
+    return TokenBucket(PCPAO_RATE_STATE_PATH, rate=PCPAO_RATE_PER_SECOND, burst=PCPAO_RATE_BURST)
+
+def upstream_unreachable(error: Exception) -> bool:
+    """
+    True when pcpao.gov did not answer usefully: no connection, a timeout,
+    retries used up, or a 5xx/429. A 4xx, a parse error or a local rate
+    limiter timeout is about this lookup, not the upstream.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+def fetch_pinellas_property(
+    parcel_id: str,
+    lane: str = "interactive",
+    known: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], str]:
     """
     Pinellas County Property Appraiser quicksearch backend.
+
+    Each request first takes a token from the shared pcpao.gov rate limiter;
+    batch callers pass lane="batch" so interactive lookups go first. Raw
+    responses go to the response archive so parsers can be rerun offline.
+
+    `known` is a fingerprint from an earlier lookup ({etag, last_modified,
+    row, parser, record}). If the quicksearch answers 304, or its row hashes the
+    same, the known record is returned without fetching or parsing the
+    details page. Returns (record, new fingerprint or None, outcome).
     """
     session = get_resilient_session()
-    url = "https://www.pcpao.gov/dal/quicksearch/searchProperty"
-
-    normalized_parcel = parcel_id.strip()
-    if "-" not in normalized_parcel and len(normalized_parcel) == 18:
-        normalized_parcel = f"{normalized_parcel[0:2]}-{normalized_parcel[2:4]}-{normalized_parcel[4:6]}-{normalized_parcel[6:11]}-{normalized_parcel[11:14]}-{normalized_parcel[14:18]}"
-
-    payload = {
-        "draw": "1",
-        "start": "0",
-        "length": "10",
-        "search[value]": "",
-        "search[regex]": "false",
-        "input": normalized_parcel,
-        "searchsort": "parcel_number",
-        "url": "https://www.pcpao.gov",
-    }
-    for i in range(11):
-        payload[f"columns[{i}][data]"] = str(i)
-        payload[f"columns[{i}][name]"] = ""
-        payload[f"columns[{i}][searchable]"] = "true"
-        payload[f"columns[{i}][orderable]"] = "true" if i >= 2 else "false"
-        payload[f"columns[{i}][search][value]"] = ""
-        payload[f"columns[{i}][search][regex]"] = "false"
-
+    limiter = get_pcpao_limiter()
+    normalized_parcel = normalize_parcel_id(parcel_id)
+    headers = {}
+    if known and known.get("etag"):
+        headers["If-None-Match"] = known["etag"]
+    if known and known.get("last_modified"):
+        headers["If-Modified-Since"] = known["last_modified"]
+
+    tracer = get_tracer()
     try:
-        response = session.post(url, data=payload, timeout=15)
+        with tracer.span("pcpao.rate_limit_wait", lane=lane):
+            limiter.acquire(lane)
+        with tracer.span("pcpao.quicksearch_post") as span:
+            response = session.post(QUICKSEARCH_URL, data=quicksearch_payload(normalized_parcel), headers=headers, timeout=15)
+            span.set(status=response.status_code)
+        if response.status_code == 304 and known:
+            return known["record"], known, "not_modified"
         response.raise_for_status()
+        archive_response(normalized_parcel, "quicksearch", response)
         data = response.json()
 
-        if data.get("recordsTotal", 0) == 0:
-            return {"success": False, "error": "Parcel not found in PCPAO database"}
+        row = quicksearch_row(data)[0]
+        fingerprint = None
+        if row is not None:
+            fingerprint = {
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+                "row": row_fingerprint(row),
+                "parser": PARSER_VERSION,
+            }
+            if known and known.get("row") == fingerprint["row"]:
+                return known["record"], dict(fingerprint, record=known["record"]), "row_unchanged"
+
+        details_html = None
+        if row is not None:
+            # A failed details fetch fails the lookup: a record without zip and
+            # site area must not be fingerprinted and served as complete.
+            with tracer.span("pcpao.rate_limit_wait", lane=lane):
+                limiter.acquire(lane)
+            with tracer.span("pcpao.details_get") as span:
+                details = session.get(details_url(normalized_parcel), timeout=30)
+                span.set(status=details.status_code)
+            details.raise_for_status()
+            archive_response(normalized_parcel, "details", details)
+            details_html = details.text
+
+        with tracer.span("pcpao.parse"):
+            record = extract_record(normalized_parcel, data, details_html)
+        if fingerprint is not None:
+            fingerprint["record"] = record
+        return record, fingerprint, "changed" if known else "full_fetch"
+    except Exception as e:
+        record = {"success": False, "error": f"Error querying PCPAO API: {str(e)}"}
+        if upstream_unreachable(e):
+            record["unreachable"] = True
+        elif isinstance(e, RateLimitTimeout):
+            # Our own limiter was busy: worth retrying, but says nothing about pcpao.gov.
+            record["retry"] = True
+        return record, None, "failed"
+
+def scrape_pinellas_property(parcel_id: str, lane: str = "interactive") -> Dict[str, Any]:
+    return fetch_pinellas_property(parcel_id, lane)[0]
+
+@st.cache_resource(show_spinner=False)
+def get_response_archive() -> Optional[ResponseArchive]:
+    if not RESPONSE_ARCHIVE_DIR:
+        return None
+    return ResponseArchive(pathlib.Path(RESPONSE_ARCHIVE_DIR), compression=RESPONSE_ARCHIVE_COMPRESSION)
+
+def archive_response(normalized_parcel: str, kind: str, response: requests.Response) -> None:
+    archive = get_response_archive()
+    if archive is None or not response.ok:
+        return
+    try:
+        archive.put(parcel_key(normalized_parcel), normalized_parcel, kind, response.url, response.content, response.encoding or "")
+    except OSError:
+        # A full or read-only disk must not break lookups.
+        pass
+
+@st.cache_resource(show_spinner=False)
+def get_revalidation_counters() -> RevalidationCounters:
+    return RevalidationCounters()
+
+def lookup_pinellas_property(
+    parcel_id: str, refresh: bool = False, lane: str = "interactive", report_health: bool = True
+) -> Dict[str, Any]:
+    """
+    Parcel record through the shared cache. On a miss (expired, cleared or
+    refresh=True) a previously seen parcel is revalidated against its
+    fingerprint instead of being fetched and parsed from scratch.
+
+    A record with "unreachable" set means pcpao.gov did not answer; "retry"
+    means the local rate limiter had no slot in time. Shortly
+    after such a failure, interactive lookups return one straight away
+    instead of waiting on the retry layer again; batch lookups still go out.
+    With report_health=False the outcome does not count toward that.
+    """
+    cache = get_shared_cache()
+    key = parcel_key(parcel_id)
+    if not refresh:
+        entry = cache.get("parcel", key)
+        if entry is not None:
+            PCPAO_LOOKUPS.labels(outcome="cache_hit").inc()
+            return entry[0]
+    queue = get_lookup_queue()
+    down = queue.upstream_down(PCPAO_OFFLINE_SECONDS) if lane == "interactive" else None
+    if down:
+        PCPAO_LOOKUPS.labels(outcome="offline").inc()
+        since = time.strftime("%H:%M", time.localtime(down["failed_at"]))
+        return {"success": False, "unreachable": True, "error": f"pcpao.gov is not responding (last failure {since}): {down['error']}"}
+    known = cache.get("parcel_fingerprint", key)
+    if known is not None and known[0].get("parser") != PARSER_VERSION:
+        # Its record came from an older extract_record; fetch and parse afresh.
+        known = None
+    started = time.perf_counter()
+    with get_tracer().span("scrape_pinellas_property", parcel=key) as span:
+        record, fingerprint, outcome = fetch_pinellas_property(parcel_id, lane, known[0] if known else None)
+        span.set(outcome=outcome)
+    PCPAO_LOOKUP_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - started)
+    PCPAO_LOOKUPS.labels(outcome=outcome).inc()
+    get_revalidation_counters().count(outcome)
+    # Other failures (bad parcel, parser bug) say nothing about whether pcpao.gov is up.
+    if report_health and (record.get("success") or record.get("unreachable")):
+        queue.note_upstream(bool(record.get("success")), record.get("error", ""))
+    if record.get("success"):
+        # Invalidate first so other workers drop their local copies too.
+        cache.invalidate("parcel", key)
+        cache.set("parcel", key, record, ttl=PARCEL_CACHE_TTL_SECONDS)
+        if fingerprint is not None:
+            cache.invalidate("parcel_fingerprint", key)
+            cache.set("parcel_fingerprint", key, fingerprint, ttl=PARCEL_FINGERPRINT_TTL_SECONDS)
+    return record
 
-        if not data.get("data"):
-            return {"success": False, "error": "No property data returned"}
+# -----------------------------------------------------------------------------
+# Offline zoning / future land use (Data/overlays)
+# -----------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def get_jurisdiction_overlays(jurisdiction: str) -> JurisdictionOverlays:
+    return load_jurisdiction_overlays(OVERLAY_DIR, jurisdiction)
 
-        row = data["data"][0]
+@st.cache_resource(show_spinner=False)
+def get_parcel_locator(county: str) -> ParcelLocator:
+    return load_parcel_locator(OVERLAY_DIR, county)
 
-        owner = BeautifulSoup(row[2] if len(row) > 2 else "", "lxml").get_text(strip=True)
-        address = BeautifulSoup(row[5] if len(row) > 5 else "", "lxml").get_text(strip=True)
-        tax_district = BeautifulSoup(row[6] if len(row) > 6 else "", "lxml").get_text(strip=True)
-        city = expand_city_name(tax_district)
-        property_use = BeautifulSoup(row[7] if len(row) > 7 else "", "lxml").get_text(strip=True)
-        legal_desc = BeautifulSoup(row[8] if len(row) > 8 else "", "lxml").get_text(strip=True)
+def resolve_zoning_flu(county: str, city: str, *parcel_ids: str) -> Dict[str, str]:
+    """
+    Zoning / FLU for a parcel from locally stored polygon layers.
+    Tries the city's layers first, then the county's unincorporated layers.
+    Returns {} when the parcel point or the layers are not available.
+    """
+    point = get_parcel_locator(county).locate(*parcel_ids)
+    if point is None:
+        return {}
+    for jurisdiction in (city, f"Unincorporated {county}"):
+        overlays = get_jurisdiction_overlays(jurisdiction)
+        if overlays:
+            found = overlays.resolve(*point)
+            if found:
+                return found
+    return {}
+
+def autofill_zoning_flu(intake: Dict[str, Any], strap: str = "") -> bool:
+    found = resolve_zoning_flu(
+        intake.get("county", "") or "",
+        intake.get("city", "") or "",
+        intake.get("parcel_id", "") or "",
+        strap,
+    )
+    for field in ("zoning", "future_land_use"):
+        value = found.get(field)
+        if not value:
+            continue
+        current = intake.get(field, "") or ""
+        # Only overwrite blanks or values we filled in ourselves last time.
+        if not current or current == intake.get(f"{field}_auto", ""):
+            intake[field] = value
+            intake[f"{field}_auto"] = value
+    return bool(found)
+
+@st.cache_resource(show_spinner=False)
+def get_environmental_overlays(county: str) -> EnvironmentalOverlays:
+    return load_environmental_overlays(OVERLAY_DIR, county)
+
+@st.cache_data(max_entries=1000)
+def suggest_overlay_selections(county: str, parcel_id: str, strap: str = "") -> Dict[str, Any]:
+    """
+    Permit flags (Tab 4) and assumption values (Tab 2) suggested by the flood
+    zone, wetland and state-road layers at the parcel. Cached per parcel.
+    """
+    suggestions: Dict[str, Any] = {"permit_flags": {}, "assumptions": {}, "reasons": []}
+    point = get_parcel_locator(county).locate(parcel_id, strap)
+    overlays = get_environmental_overlays(county)
+    if point is None or not overlays:
+        return suggestions
+    findings = overlays.findings(*point)
+    permit_flags = suggestions["permit_flags"]
+    assumptions = suggestions["assumptions"]
+    reasons = suggestions["reasons"]
+
+    if "flood_zone" in findings:
+        if findings["sfha"]:
+            permit_flags["permit_floodplain"] = True
+            permit_flags["permit_fema"] = True
+            assumptions["assump_no_flood_comp"] = False
+            reasons.append(f"Parcel is in FEMA flood zone {findings['flood_zone']}")
+        else:
+            assumptions["assump_no_flood_comp"] = True
+    if "wetland" in findings:
+        assumptions["assump_no_wetlands"] = not findings["wetland"]
+        if findings["wetland"]:
+            reasons.append(f"Parcel intersects mapped wetland ({findings['wetland']})")
+    if findings.get("state_road"):
+        permit_flags["permit_fdot_driveway"] = True
+        permit_flags["permit_fdot_drainage"] = True
+        permit_flags["permit_fdot_utility"] = True
+        reasons.append(f"Parcel fronts state road {findings['state_road']}")
+    return suggestions
+
+def apply_overlay_suggestions(
+    proposal: Dict[str, Any], suggestions: Dict[str, Any], baseline: Optional[Dict[str, bool]] = None
+) -> None:
+    """
+    Push suggestions into the proposal. Keyed widgets ignore value= once created,
+    so their state is dropped and they re-read the proposal on the next run.
+    Permits and assumptions are only ever switched on. An assumption is left
+    alone if earlier suggestions left it on, or `baseline` (its values when a
+    lookup was queued) has it on: it is off now because the user unticked it.
+    """
+    permit_flags = proposal["permits"].setdefault("permit_flags", {})
+    for key, value in suggestions.get("permit_flags", {}).items():
+        if value:
+            permit_flags[key] = True
+            st.session_state.pop(key, None)
+    previous = proposal["permits"].get("overlay_suggestions", {}).get("applied", {})
+    baseline = baseline or {}
+    checked = proposal["project"].setdefault("assumptions_checked", {})
+    for aid, value in suggestions.get("assumptions", {}).items():
+        if value and not (checked.get(aid) or previous.get(aid) or baseline.get(aid)):
+            checked[aid] = True
+            st.session_state.pop(f"tab2_{aid}", None)
+    applied = dict(previous)
+    applied.update((aid, bool(checked.get(aid))) for aid in suggestions.get("assumptions", {}))
+    proposal["permits"]["overlay_suggestions"] = dict(suggestions, applied=applied)
 
-        sqft = None
-        acres = None
-        zip_code = None
-        strap = None
+# -----------------------------------------------------------------------------
+# Offline lookup queue (pcpao.gov unreachable)
+# -----------------------------------------------------------------------------
+LOOKUP_INTAKE_FIELDS = (
+    "address", "city", "zip", "owner", "land_use", "site_area_sqft", "site_area_acres",
+    "municipality", "jurisdiction_display",
+)
 
-        try:
-            parts = normalized_parcel.split("-")
-            if len(parts) == 6:
-                parts[0], parts[2] = parts[2], parts[0]
-                strap = "".join(parts)
-            else:
-                strap = normalized_parcel.replace("-", "")
+@st.cache_resource(show_spinner=False)
+def get_lookup_queue() -> LookupQueue:
+    return LookupQueue(str(LOOKUP_QUEUE_PATH))
 
-            detail_url = (
-                f"https://www.pcpao.gov/property-details"
-                f"?s={strap}&input={normalized_parcel}&search_option=parcel_number"
-            )
-            html = session.get(detail_url, timeout=30).text
-            soup = BeautifulSoup(html, "html.parser")
-            txt = soup.get_text(" ", strip=True)
-
-            m = re.search(
-                r"Land Area:\s*[^\d]*([\d,]+)\s*sf\s*\|\s*[^\d]*([\d.]+)\s*acres",
-                txt,
-                flags=re.IGNORECASE,
-            )
-            if m:
-                sqft = int(m.group(1).replace(",", ""))
-                acres = float(m.group(2))
-
-            z = re.search(r"FL\s*(\d{5})", txt)
-            if z:
-                zip_code = z.group(1)
-        except Exception:
-            pass
-
-        return {
-            "success": True,
-            "address": address,
-            "city": city,
-            "zip": zip_code or "",
-            "owner": owner,
-            "land_use": strip_dor_code(property_use),
-            "site_area_sqft": f"{sqft:,}" if sqft else "",
-            "site_area_acres": f"{acres:.2f}" if acres else "",
-            "legal_description": legal_desc,
-            "strap": strap or "",
-        }
-    except Exception as e:
-        return {"success": False, "error": f"Error querying PCPAO API: {str(e)}"}
+@st.cache_resource
+def get_lookup_replayer() -> LookupReplayer:
+    return LookupReplayer(
+        get_lookup_queue(),
+        lambda parcel_id: lookup_pinellas_property(parcel_id, lane="batch"),
+        poll_seconds=LOOKUP_REPLAY_POLL_SECONDS,
+    ).start()
+
+def lookup_intake_fields(result: Dict[str, Any]) -> Dict[str, str]:
+    """Intake fields (LOOKUP_INTAKE_FIELDS) filled from a parcel record."""
+    city = expand_city_name(result.get("city", "") or "")
+    return {
+        "address": result.get("address", "") or "",
+        "city": city,
+        "zip": result.get("zip", "") or "",
+        "owner": result.get("owner", "") or "",
+        "land_use": result.get("land_use", "") or "",
+        "site_area_sqft": result.get("site_area_sqft", "") or "",
+        "site_area_acres": result.get("site_area_acres", "") or "",
+        "municipality": city,
+        "jurisdiction_display": city,
+    }
+
+def queue_lookup(proposal: Dict[str, Any], county: str, parcel_id: str, error: str) -> Dict[str, Any]:
+    """
+    Queue a lookup that could not reach pcpao.gov. The proposal remembers
+    the intake fields and assumptions as they are now, so the merge can
+    tell which ones the user has edited in the meantime.
+    """
+    entry = get_lookup_queue().enqueue(parcel_key(parcel_id), parcel_id, county, error)
+    intake = proposal["intake"]
+    intake["county"] = county
+    intake["parcel_id"] = parcel_id
+    intake["queued_lookup"] = {
+        "key": entry["key"],
+        "parcel_id": parcel_id,
+        "queued_at": entry["queued_at"],
+        "baseline": {field: intake.get(field, "") or "" for field in LOOKUP_INTAKE_FIELDS},
+        "assumptions": dict(proposal["project"].get("assumptions_checked", {})),
+    }
+    get_lookup_replayer()
+    return entry
+
+def merge_queued_lookup(proposal: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Merge a finished queued lookup into the proposal. Fields and assumptions
+    still at their value from when the lookup was queued take the fetched
+    value; ones the user has changed since are kept and listed in "kept".
+    Returns the queue entry (None if nothing is queued).
+    """
+    intake = proposal["intake"]
+    pending = intake.get("queued_lookup")
+    if not pending:
+        return None
+    entry = get_lookup_queue().get(pending["key"])
+    if entry is None or entry["status"] == "queued":
+        if entry is None:
+            intake.pop("queued_lookup", None)
+        return entry
+    intake.pop("queued_lookup", None)
+    if entry["status"] != "done":
+        return entry
+
+    record = entry["record"]
+    filled, kept = [], []
+    for field, value in lookup_intake_fields(record).items():
+        current = intake.get(field, "") or ""
+        if current == pending["baseline"].get(field, ""):
+            if value != current:
+                intake[field] = value
+                filled.append(field)
+        elif current != value:
+            kept.append(field)
+    strap = record.get("strap", "") or ""
+    autofill_zoning_flu(intake, strap)
+    suggestions = suggest_overlay_selections(intake.get("county", "") or "Pinellas", pending["parcel_id"], strap)
+    apply_overlay_suggestions(proposal, suggestions, baseline=pending.get("assumptions", {}))
+    return dict(entry, filled=filled, kept=kept)
+
+@st.fragment(run_every=LOOKUP_REPLAY_POLL_SECONDS)
+def _watch_queued_lookup(key: str) -> None:
+    entry = get_lookup_queue().get(key)
+    if entry is not None and entry["status"] != "queued":
+        # Merged by the full rerun, which also redraws the other tabs.
+        st.rerun(scope="app")
+    if entry is not None:
+        st.info(
+            f"Lookup for {entry['parcel_id']} is queued until pcpao.gov answers "
+            f"({entry['attempts']} attempt(s) so far). Fields you fill in meanwhile are kept."
+        )
+
+def render_queued_lookup():
+    queued = "queued_lookup" in st.session_state.proposal["intake"]
+    entry = merge_queued_lookup(st.session_state.proposal)
+    if queued and (entry is None or entry["status"] != "queued"):
+        # Merged (or dropped) outside any widget.
+        note_edit("intake", "project", "permits")
+    if entry is None:
+        return
+    if entry["status"] == "queued":
+        _watch_queued_lookup(entry["key"])
+    elif entry["status"] == "rejected":
+        st.error(f"Queued lookup for {entry['parcel_id']} failed: {entry['last_error']}")
+    else:
+        kept = f"; kept your edits to {', '.join(entry['kept'])}" if entry["kept"] else ""
+        st.success(f"Queued lookup for {entry['parcel_id']} came through: filled {len(entry['filled'])} field(s){kept}.")
 
 # -----------------------------------------------------------------------------
 # Proposal state
@@ -635,6 +725,9 @@ def scrape_pinellas_property(parcel_id: str) -> Dict[str, Any]:
 def init_proposal_state() -> None:
     if "proposal" not in st.session_state:
         st.session_state.proposal = {
+            "meta": {
+                "proposal_id": uuid.uuid4().hex,
+            },
             "intake": {
                 "county": "Pinellas",
                 "municipality": "",
@@ -697,36 +790,35 @@ def init_proposal_state() -> None:
 # Totals
 # -----------------------------------------------------------------------------
 def compute_total_proposal_cost() -> int:
-    scope = st.session_state.proposal.get("scope", {})
-    permits = st.session_state.proposal.get("permits", {})
-    selected_tasks = scope.get("selected_tasks", {})
-
-    total = 0
-    for task_num, task in selected_tasks.items():
-        total += int(task.get("fee", 0) or 0)
-        if task_num == "310":
-            svc_total = task.get("services_total_cost")
-            if svc_total is None:
-                services = task.get("services", {}) or {}
-                svc_total = sum(int(s.get("cost", 0) or 0) for s in services.values())
-            total += int(svc_total or 0)
+    with get_tracer().span("compute_total_proposal_cost"):
+        scope = st.session_state.proposal.get("scope", {})
+        permits = st.session_state.proposal.get("permits", {})
+        selected_tasks = scope.get("selected_tasks", {})
+
+        total = 0
+        for task_num, task in selected_tasks.items():
+            total += int(task.get("fee", 0) or 0)
+            if task_num == "310":
+                svc_total = task.get("services_total_cost")
+                if svc_total is None:
+                    services = task.get("services", {}) or {}
+                    svc_total = sum(int(s.get("cost", 0) or 0) for s in services.values())
+                total += int(svc_total or 0)
 
-    addl = permits.get("included_additional_services_with_fees", {}) or {}
-    total += sum(int(v or 0) for v in addl.values())
-    return total
+        addl = permits.get("included_additional_services_with_fees", {}) or {}
+        total += sum(int(v or 0) for v in addl.values())
+        return total
 
 # -----------------------------------------------------------------------------
 # Tab 3/4/5 data (from New-Proposal-App)
 # -----------------------------------------------------------------------------
-DEFAULT_FEES = {
-    "110": {"name": "Civil Engineering Design", "amount": 40000, "type": "Hourly, Not-to-Exceed"},
-    "120": {"name": "Civil Schematic Design", "amount": 35000, "type": "Hourly, Not-to-Exceed"},
-    "130": {"name": "Civil Design Development", "amount": 45000, "type": "Hourly, Not-to-Exceed"},
-    "140": {"name": "Civil Construction Documents", "amount": 50000, "type": "Hourly, Not-to-Exceed"},
-    "150": {"name": "Civil Permitting", "amount": 40000, "type": "Hourly, Not-to-Exceed"},
-    "210": {"name": "Meetings and Coordination", "amount": 20000, "type": "Hourly, Not-to-Exceed"},
-    "310": {"name": "Civil Construction Phase Services", "amount": 35000, "type": "Lump Sum"},
-}
+@st.cache_resource
+def get_rate_card_watcher() -> RateCardWatcher:
+    return RateCardWatcher(RATE_CARD_PATH)
+
+# Taken once per run, so every fee default in a rerun comes from the same card version.
+RATE_CARD = get_rate_card_watcher().current()
+DEFAULT_FEES = RATE_CARD.default_fees
 
 TASK_DESCRIPTIONS = {
     "110": [
@@ -817,44 +909,518 @@ PERMIT_MAPPING = {
     },
 }
 
-ADDITIONAL_SERVICES_LIST = [
-    ("offsite_roadway", "Off-site roadway, traffic signal design or utility improvements", False, 25000),
-    ("offsite_utility", "Off-site utility capacity analysis and extensions", False, 15000),
-    ("utility_relocation", "Utility relocation design and plans", False, 12000),
-    ("cost_opinions", "Preparation of opinions of probable construction costs", False, 5000),
-    ("dewatering", "Dewatering permitting (to be provided by Contractor)", False, 3000),
-    ("site_lighting", "Site lighting, photometric, and site electrical plan", False, 8000),
-    ("dry_utility", "Dry utility coordination and design", False, 10000),
-    ("landscape", "Landscape, irrigation, hardscape design and tree mitigation", False, 20000),
-    ("fire_line", "Fire line design", False, 6000),
-    ("row_permitting", "Right-of-way permitting", False, 8000),
-    ("concurrency", "Concurrency application assistance", False, 5000),
-    ("3d_modeling", "3D modeling and graphic/presentations", False, 8000),
-    ("leed", "LEED certification and review", False, 20000),
-    ("schematic_dd", "Schematic and design development plans", False, 15000),
-    ("extra_meetings", "Meetings other than those described in the tasks above", False, 5000),
-    ("surveying", "Boundary, topographic and tree surveying, platting and subsurface utility exploration", False, 25000),
-    ("platting", "Platting or easement assistance", False, 8000),
-    ("traffic_studies", "Traffic studies, analysis, property share agreement", False, 30000),
-    ("mot_plans", "Maintenance of traffic plans", False, 12000),
-    ("structural", "Structural engineering (including retaining walls)", False, 35000),
-    ("signage", "Signage design", False, 4000),
-    ("extra_design", "Design elements beyond those outlined in the above project understanding", False, 10000),
-    ("peer_review", "Responding to comments from third-party peer review", False, 8000),
+ADDITIONAL_SERVICES_LIST = RATE_CARD.additional_services
+ADDITIONAL_SERVICE_KEYS = {name: key for key, name, _, _ in ADDITIONAL_SERVICES_LIST}
+
+PERMIT_COLUMNS = ["Local / Utilities", "State / Regional", "FDOT"]
+
+# (flag key, label, Tab 4 column, PERMIT_MAPPING default_permits key)
+# Labels may use {ahj_name} and {wmd_name}. Order is display order within a column.
+PERMIT_REGISTRY = [
+    ("permit_ahj", "{ahj_name}", "Local / Utilities", "ahj"),
+    ("permit_sewer", "Sewer Provider", "Local / Utilities", "sewer"),
+    ("permit_water", "Water Provider", "Local / Utilities", "water"),
+    ("permit_site_plan_review", "Site Plan / Development Review", "Local / Utilities", None),
+    ("permit_site_eng_grading", "Site Engineering, Grading & Drainage", "Local / Utilities", None),
+    ("permit_row_utilization", "Right-of-Way Utilization Permit", "Local / Utilities", None),
+    ("permit_zoning_clearance", "Zoning Clearance", "Local / Utilities", None),
+    ("permit_wmd_erp", "{wmd_name} ERP", "State / Regional", "wmd_erp"),
+    ("permit_fdep", "FDEP Potable Water/Wastewater", "State / Regional", None),
+    ("permit_fdot_drainage", "FDOT Drainage Connection", "State / Regional", None),
+    ("permit_floodplain", "Floodplain / Construction in Flood Zone", "State / Regional", None),
+    ("permit_utilities_conn", "Utilities Connection Request", "State / Regional", None),
+    ("permit_reclaimed_water", "Reclaimed Water Connection + Inspection", "State / Regional", None),
+    ("permit_fdot_driveway", "FDOT Driveway Connection", "FDOT", None),
+    ("permit_fdot_utility", "FDOT Utility Connection", "FDOT", None),
+    ("permit_fdot_general_use", "FDOT General Use Permit", "FDOT", None),
+    ("permit_fdot_construction", "FDOT Construction Agreement", "FDOT", None),
+    ("permit_fema", "FEMA", "FDOT", None),
 ]
 
-TASK_310_SERVICES = [
-    ("shop_drawings", "Shop Drawing Review", 30, 165, 4950),
-    ("rfi", "RFI Response", 50, 165, 8250),
-    ("oac", "OAC Meetings", 24, 0, 3000),
-    ("site_visits", "Site Visits (2 hrs each)", 4, 0, 1000),
-    ("asbuilt", "As-Built Reviews", 2, 0, 500),
-    ("inspection_tv", "Inspection & TV Reports", 0, 165, 0),
-    ("record_drawings", "Record Drawings (Water/Sewer)", 40, 165, 6600),
-    ("fdep", "FDEP Clearance Submittals", 0, 0, 0),
-    ("compliance", "Letter of General Compliance", 0, 0, 0),
-    ("wmd", "WMD Certification", 0, 0, 0),
-]
+# Bit positions in stored proposals: append new keys at the end, never reorder.
+PERMIT_BITS = BitRegistry(key for key, _, _, _ in PERMIT_REGISTRY)
+SERVICE_BITS = BitRegistry(key for key, _, _, _ in ADDITIONAL_SERVICES_LIST)
+
+def permit_label(label: str, ahj_name: str, wmd_name: str) -> str:
+    return label.format(ahj_name=ahj_name, wmd_name=wmd_name)
+
+def encode_selections(proposal: Dict[str, Any]) -> Dict[str, int]:
+    permits = proposal.get("permits", {})
+    flags = permits.get("permit_flags", {}) or {}
+    services = permits.get("included_additional_services", []) or []
+    return {
+        "permit_bits": PERMIT_BITS.encode(k for k, v in flags.items() if v),
+        "service_bits": SERVICE_BITS.encode(ADDITIONAL_SERVICE_KEYS.get(name, "") for name in services),
+    }
+
+TASK_310_SERVICES = RATE_CARD.task_310_services
+TASK_310_COLUMNS = ["included", "service", "hours", "rate", "cost"]
+TASK_310_DEFAULT_INCLUDED = RATE_CARD.task_310_default_included
+TASK_310_HOURLY = RATE_CARD.task_310_hourly
+
+def task_310_frame(services: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Typed Task 310 grid (index = service key) from TASK_310_SERVICES and any
+    stored selections, with cost recomputed.
+    """
+    rows = []
+    for svc_key, svc_name, _, default_rate, _ in TASK_310_SERVICES:
+        existing = services.get(svc_key, {}) or {}
+        included = existing.get("included")
+        if included is None:
+            included = svc_key in TASK_310_DEFAULT_INCLUDED
+        rate = existing.get("rate")
+        if not isinstance(rate, (int, float)):
+            rate_allowed = default_rate > 0 or svc_key in TASK_310_HOURLY
+            rate = (default_rate or RATE_CARD.default_hourly_rate) if rate_allowed and included else 0
+        hours = existing.get("hours")
+        rows.append({
+            "key": svc_key,
+            "included": bool(included),
+            "service": svc_name,
+            "hours": int(hours) if isinstance(hours, (int, float)) else 0,
+            "rate": float(rate),
+        })
+    frame = pd.DataFrame(rows).set_index("key")
+    frame = frame.astype({"included": bool, "hours": "int64", "rate": "float64"})
+    return compute_task_310_costs(frame)
+
+def compute_task_310_costs(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["hours"] = frame["hours"].fillna(0).clip(lower=0).astype("int64")
+    frame["rate"] = frame["rate"].fillna(0.0).clip(lower=0.0)
+    frame["cost"] = (frame["hours"] * frame["rate"]).where(frame["included"], 0.0)
+    return frame
+
+def task_310_services(frame: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Grid -> selected_tasks["310"]["services"] (excluded rows store zero hours/rate)."""
+    included = frame["included"]
+    stored = pd.DataFrame({
+        "included": included,
+        "name": frame["service"],
+        "hours": frame["hours"].where(included, 0),
+        "rate": frame["rate"].where(included, 0.0),
+        "cost": frame["cost"].astype(int),
+    })
+    # object dtype so the stored dict holds plain Python numbers (JSON-safe).
+    return stored.astype(object).to_dict("index")
+
+def _apply_task_310_grid_edits() -> None:
+    # on_change runs before the rerun, so the grid is redrawn with fresh costs
+    # from the same single round trip.
+    note_edit("scope")
+    task_310 = st.session_state.proposal["scope"].get("selected_tasks", {}).get("310")
+    if task_310 is None:
+        return
+    frame = task_310_frame(task_310.get("services", {}))
+    for pos, changes in st.session_state["cps_grid"].get("edited_rows", {}).items():
+        for col, value in changes.items():
+            if col in ("included", "hours", "rate"):
+                frame.iloc[int(pos), frame.columns.get_loc(col)] = value if value is not None else 0
+    frame = compute_task_310_costs(frame)
+    task_310["services"] = task_310_services(frame)
+    task_310["services_total_cost"] = int(frame["cost"].astype(int).sum())
+# -----------------------------------------------------------------------------
+# Saved proposals
+# -----------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def get_proposal_store() -> ProposalStore:
+    PROPOSAL_STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    return ProposalStore(PROPOSAL_STORE_PATH)
+
+@st.cache_resource(max_entries=1)
+def get_selection_index(rate_card_version: int) -> BitmapIndex:
+    # One bitmap per service on the card: a reload that adds services builds a
+    # new index (from the store) instead of answering 0 for the new bits.
+    return BitmapIndex(get_proposal_store(), len(PERMIT_BITS), len(SERVICE_BITS))
+
+@st.cache_resource
+def get_proposal_rules() -> RuleSet:
+    try:
+        return load_rules(PROPOSAL_RULES_PATH)
+    except RuleError as e:
+        # A broken rules file must not stop saves; the admin panel shows why.
+        return RuleSet({"rules": []}, error=str(e))
+
+def save_current_proposal() -> str:
+    proposal = st.session_state.proposal
+    meta = proposal.setdefault("meta", {})
+    proposal_id = meta.setdefault("proposal_id", uuid.uuid4().hex)
+    total_fee = compute_total_proposal_cost()
+    scope_text = generated_scope_text(proposal)
+    get_proposal_store().save(
+        proposal_id,
+        # Stamped on the stored copy only (not an undoable edit); python rate_card.py
+        # reprice compares stored fees against this card's defaults.
+        dict(proposal, meta=dict(meta, rate_card_version=RATE_CARD.version)),
+        total_fee=total_fee,
+        scope_text=scope_text,
+        **encode_selections(proposal),
+    )
+    get_selection_index(RATE_CARD.version).refresh()
+    get_similarity_index().refresh()
+    # Warnings only: the proposal is saved either way.
+    st.session_state.consistency_issues = get_proposal_rules().check(
+        proposal, scope_text=scope_text, total_fee=total_fee
+    )
+    return proposal_id
+
+def render_consistency_issues(issues: List[Dict[str, str]]):
+    errors = sum(1 for issue in issues if issue["severity"] != "warning")
+    with st.expander(
+        f"Consistency check: {errors} error(s), {len(issues) - errors} warning(s)", expanded=True
+    ):
+        for issue in issues:
+            (st.warning if issue["severity"] == "warning" else st.error)(issue["message"])
+        st.caption("The proposal was saved. Fix these and save again to clear the list.")
+
+@st.cache_resource
+def get_similarity_index() -> SimilarityIndex:
+    return SimilarityIndex(get_proposal_store())
+
+@st.cache_resource
+def get_fee_suggester() -> FeeSuggester:
+    return FeeSuggester(get_proposal_store())
+
+def fee_hint(column: str) -> str:
+    """Caption with the historical fee range for task_<num> / svc_<name>, or ""."""
+    proposal = st.session_state.proposal
+    intake = proposal["intake"]
+    suggestion = get_fee_suggester().current().suggest(
+        column,
+        county=intake.get("county", ""),
+        land_use=intake.get("land_use", ""),
+        acres=intake.get("site_area_acres", ""),
+        permit_bits=encode_selections(proposal)["permit_bits"],
+    )
+    if not suggestion:
+        return ""
+    return (
+        f"Typical: {format_currency(suggestion['low'])} – {format_currency(suggestion['high'])} "
+        f"(median {format_currency(suggestion['median'])}, n={suggestion['n']})"
+    )
+
+# Keyed widgets hold their own state and ignore value= once created; these are
+# dropped when a different proposal is loaded so they re-read the proposal.
+PROPOSAL_WIDGET_PREFIXES = (
+    "check_", "fee_", "cps_", "total_construction_hours", "permit_", "addl_", "tab2_",
+    "property_", "entity_address_", "last_intake_",
+)
+
+def reset_proposal_widgets() -> None:
+    for key in list(st.session_state.keys()):
+        if str(key).startswith(PROPOSAL_WIDGET_PREFIXES):
+            del st.session_state[key]
+
+def open_saved_proposal(proposal_id: str) -> bool:
+    proposal = get_proposal_store().load(proposal_id)
+    if proposal is None:
+        return False
+    meta = proposal.setdefault("meta", {})
+    meta["proposal_id"] = proposal_id
+    # Re-stamped with the live card on the next save.
+    meta.pop("rate_card_version", None)
+    st.session_state.proposal = proposal
+    st.session_state.pop("consistency_issues", None)
+    reset_proposal_widgets()
+    return True
+
+def render_proposal_search():
+    with st.sidebar.expander("Search saved proposals", expanded=False):
+        text = st.text_input("Search", placeholder="Parcel, address, owner, client, project...", key="search_text")
+        county = st.selectbox("County", options=["", "Pinellas", "Hillsborough", "Pasco"], key="search_county")
+        date_col1, date_col2 = st.columns(2)
+        with date_col1:
+            date_from = st.text_input("Saved from", placeholder="YYYY-MM-DD", key="search_date_from")
+        with date_col2:
+            date_to = st.text_input("Saved to", placeholder="YYYY-MM-DD", key="search_date_to")
+        fee_col1, fee_col2 = st.columns(2)
+        with fee_col1:
+            min_fee_text = st.text_input("Min total fee", key="search_min_fee")
+        with fee_col2:
+            max_fee_text = st.text_input("Max total fee", key="search_max_fee")
+        min_fee = re.sub(r"[^\d]", "", min_fee_text or "")
+        max_fee = re.sub(r"[^\d]", "", max_fee_text or "")
+        if not any((text, county, date_from, date_to, min_fee, max_fee)):
+            return
+        rows = get_proposal_store().search(
+            text,
+            county=county,
+            date_from=date_from.strip(),
+            date_to=date_to.strip(),
+            min_fee=int(min_fee) if min_fee else None,
+            max_fee=int(max_fee) if max_fee else None,
+        )
+        st.caption(f"{len(rows)} result(s)" + (" (showing first 50)" if len(rows) == 50 else ""))
+        for row in rows:
+            label = f"{row['project_name'] or row['id'][:8]} — {row['county']}, {row['saved_at'][:10]}, {format_currency(row['total_fee'])}"
+            if st.button(label, key=f"open_{row['id']}", use_container_width=True):
+                if open_saved_proposal(row["id"]):
+                    st.rerun()
+
+def render_portfolio_query():
+    with st.sidebar.expander("Portfolio query"):
+        permit_keys = st.multiselect(
+            "Permits (all of)",
+            options=PERMIT_BITS.keys,
+            format_func=lambda k: permit_label(
+                next(label for key, label, _, _ in PERMIT_REGISTRY if key == k), "AHJ", "WMD"
+            ),
+        )
+        service_keys = st.multiselect(
+            "Additional services included (all of)",
+            options=SERVICE_BITS.keys,
+            format_func=lambda k: next(name for key, name, _, _ in ADDITIONAL_SERVICES_LIST if key == k),
+        )
+        year_text = st.text_input("Saved in year(s)", placeholder="e.g. 2026 or 2025, 2026")
+        years = [int(y) for y in re.findall(r"\d{4}", year_text or "")]
+        if not (permit_keys or service_keys or years):
+            return
+        index = get_selection_index(RATE_CARD.version)
+        ids = index.query(PERMIT_BITS.encode(permit_keys), SERVICE_BITS.encode(service_keys), years)
+        st.caption(f"{len(ids)} matching proposals ({index.last_query_ms:.1f} ms)")
+        for row in get_proposal_store().summaries(ids[:50]):
+            st.write(f"- {row['project_name'] or row['id'][:8]} ({row['county']}, {row['saved_at'][:10]}) - {format_currency(row['total_fee'])}")
+
+# -----------------------------------------------------------------------------
+# Revision history (undo / redo / checkpoints)
+# -----------------------------------------------------------------------------
+def get_revision_history() -> RevisionHistory:
+    """History for the open proposal; restarts when a different proposal is opened."""
+    proposal = st.session_state.proposal
+    proposal_id = proposal.get("meta", {}).get("proposal_id", "")
+    history = st.session_state.get("revision_history")
+    if history is None or history.proposal_id != proposal_id:
+        history = st.session_state.revision_history = RevisionHistory(proposal, proposal_id)
+        st.session_state.revision_history_run = st.session_state.get("rerun_stats", {}).get("total", 0)
+    return history
+
+def note_edit(*sections: str) -> None:
+    """
+    Mark proposal sections as edited in this run. Widgets pass it as on_change;
+    code that changes the proposal outside a widget calls it directly. Only
+    marked sections are compared when the revision is recorded.
+    """
+    st.session_state.setdefault("revision_edits", set()).update((section,) for section in sections)
+
+def _take_edits() -> set:
+    return st.session_state.pop("revision_edits", None) or set()
+
+def record_revision() -> None:
+    history = get_revision_history()
+    edits = _take_edits()
+    if st.session_state.get("revision_history_run") == st.session_state.get("rerun_stats", {}).get("total", 0):
+        # The renderers fill defaults into a newly opened proposal on its first
+        # run; that filled-in state is revision 0, not an undoable edit.
+        history.reset(st.session_state.proposal)
+    elif edits:
+        history.record(st.session_state.proposal, edits)
+
+def _move_history(action) -> None:
+    history = get_revision_history()
+    # Edits applied by widget callbacks before this run are not recorded yet.
+    history.record(st.session_state.proposal, _take_edits())
+    if action(history, st.session_state.proposal):
+        reset_proposal_widgets()
+        st.rerun()
+
+def render_revision_history():
+    with st.sidebar.expander("History", expanded=False):
+        history = get_revision_history()
+        undo_col, redo_col = st.columns(2)
+        with undo_col:
+            if st.button("Undo", type="primary", use_container_width=True, key="undo_revision", disabled=not history.can_undo()):
+                _move_history(lambda h, p: h.undo(p))
+        with redo_col:
+            if st.button("Redo", type="primary", use_container_width=True, key="redo_revision", disabled=not history.can_redo()):
+                _move_history(lambda h, p: h.redo(p))
+        st.caption(
+            f"Revision {history.cursor} of {history.head}"
+            + (f" (oldest kept: {history.base})" if history.base else "")
+        )
+
+        name = st.text_input("Checkpoint name", key="checkpoint_name", placeholder="e.g. Sent to client")
+        if st.button("Save checkpoint", key="save_checkpoint", use_container_width=True) and name.strip():
+            # Left marked: the tabs below may still write this run's edits to those sections.
+            history.record(st.session_state.proposal, set(st.session_state.get("revision_edits") or ()))
+            history.checkpoint(name.strip())
+        if history.checkpoints:
+            restore_name = st.selectbox(
+                "Checkpoints",
+                options=sorted(history.checkpoints, key=history.checkpoints.get),
+                format_func=lambda n: f"{n} (rev {history.checkpoints[n]})",
+                key="restore_checkpoint_name",
+            )
+            if st.button("Restore checkpoint", key="restore_checkpoint", use_container_width=True):
+                _move_history(lambda h, p: h.restore(p, restore_name))
+
+        if history.head > history.base:
+            revisions = list(range(history.base, history.head + 1))
+            a, b = st.select_slider(
+                "Compare revisions",
+                options=revisions,
+                value=(max(history.base, history.cursor - 1), history.cursor) if history.cursor > history.base else (history.base, history.base + 1),
+            )
+            changes = history.diff(a, b)
+            st.caption(f"{len(changes)} change(s) from rev {a} to rev {b}")
+            for change in changes[:50]:
+                st.text(describe_change(change))
+
+# -----------------------------------------------------------------------------
+# Session memory: idle sessions spill their proposal state to disk
+# -----------------------------------------------------------------------------
+@st.cache_resource
+def get_session_spiller() -> SessionSpiller:
+    return SessionSpiller(
+        SESSION_SPILL_DIR,
+        idle_seconds=SESSION_IDLE_SPILL_SECONDS,
+        widget_prefixes=PROPOSAL_WIDGET_PREFIXES,
+    ).start()
+
+def rehydrate_session() -> None:
+    """Record this session as active and bring back its state if it was spilled."""
+    ctx = get_script_run_ctx()
+    if ctx is not None and get_session_spiller().touch(ctx.session_id, st.session_state):
+        st.toast("Restored your proposal from the idle-session store.")
+
+def is_admin() -> bool:
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(st.query_params.get("admin", ""), ADMIN_TOKEN)
+
+def render_admin_sessions():
+    with st.sidebar.expander("Sessions (admin)", expanded=False):
+        spiller = get_session_spiller()
+        own = session_footprint(st.session_state, PROPOSAL_WIDGET_PREFIXES)
+        st.caption(
+            f"This session: {own['total'] / 1024:.1f} KB "
+            f"(proposal {own['proposal'] / 1024:.1f}, history {own['history'] / 1024:.1f}, "
+            f"widgets {own['widgets'] / 1024:.1f}, other {own['other'] / 1024:.1f})"
+        )
+        stats = spiller.stats
+        st.caption(
+            f"Spilled {stats['spilled']} ({stats['bytes_spilled'] / 1024:.1f} KB), "
+            f"rehydrated {stats['rehydrated']}, failed {stats['failed']}; "
+            f"idle threshold {spiller.idle_seconds:.0f} s"
+        )
+        rows = spiller.sessions()
+        if spiller.unsupported:
+            st.warning(f"Idle sessions are not being spilled: {spiller.unsupported}.")
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        if st.button("Spill idle sessions now", key="admin_spill_sweep", use_container_width=True):
+            st.toast(f"Spilled {spiller.sweep()} session(s).")
+
+def render_admin_cache():
+    with st.sidebar.expander("Shared cache (admin)", expanded=False):
+        cache = get_shared_cache()
+        rows = [
+            {"tier": tier, "hits": s["hits"], "misses": s["misses"], "hit ratio": f"{s['ratio']:.0%}"}
+            for tier, s in cache.stats().items()
+        ]
+        st.caption(f"Backend: {CACHE_BACKEND} (this worker's counters)")
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        revalidation = get_revalidation_counters().snapshot()
+        st.caption(
+            f"Parcel refreshes short-circuited: {revalidation['short_circuited']} "
+            f"({revalidation['not_modified']} not modified, {revalidation['row_unchanged']} unchanged row) "
+            f"of {revalidation['short_circuited'] + revalidation['changed']} revalidations "
+            f"({revalidation['short_circuit_ratio']:.0%}); changed {revalidation['changed']}, "
+            f"new {revalidation['full_fetch']}, failed {revalidation['failed']}"
+        )
+        if st.button("Clear parcel lookups", key="admin_clear_parcel_cache", use_container_width=True):
+            cache.invalidate("parcel")
+            st.toast("Parcel lookups cleared in every worker.")
+        if st.button("Reload jurisdiction data", key="admin_reload_jurisdiction", use_container_width=True):
+            cache.invalidate("jurisdiction")
+            st.toast("Jurisdiction data will be reloaded by every worker.")
+
+def render_admin_rate_limit():
+    with st.sidebar.expander("pcpao.gov rate limit (admin)", expanded=False):
+        metrics = get_pcpao_limiter().metrics()
+        st.caption(
+            f"{metrics['tokens']:.1f} of {metrics['burst']:g} tokens available, "
+            f"refill {metrics['rate']:g}/s (shared by all workers)"
+        )
+        rows = [
+            {
+                "lane": lane,
+                "queued": m["queue_depth"],
+                "requests": int(m["acquired"]),
+                "timeouts": int(m["timeouts"]),
+                "mean wait (s)": round(m["mean_wait_seconds"], 3),
+                "max wait (s)": round(m["max_wait_seconds"], 3),
+            }
+            for lane, m in metrics["lanes"].items()
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+# -----------------------------------------------------------------------------
+# Form mode: Tab 1 field groups commit on submit (one rerun per block)
+# -----------------------------------------------------------------------------
+FORM_MODE_DEFAULT = os.environ.get("PROPOSAL_FORM_MODE", "").lower() in ("1", "true", "yes")
+
+NUMBER_RE = re.compile(r"^\d[\d,]*(\.\d+)?$")
+CITY_STATE_ZIP_RE = re.compile(r"^[^,]+,\s*[A-Za-z]{2}(\s+\d{5}(-\d{4})?)?$")
+
+FIELD_VALIDATORS = {
+    "site_area_acres": (NUMBER_RE, "Site Area (acres) must be a number."),
+    "site_area_sqft": (NUMBER_RE, "Site Area (sf) must be a number."),
+    "property_address_city_state_zip": (CITY_STATE_ZIP_RE, "Property City, State, ZIP should look like 'Clearwater, FL 33755'."),
+    "entity_address_city_state_zip": (CITY_STATE_ZIP_RE, "Entity City, State, ZIP should look like 'Tampa, FL 33602'."),
+}
+
+def validate_fields(values: Dict[str, str]) -> List[str]:
+    errors = []
+    for field, value in values.items():
+        rule = FIELD_VALIDATORS.get(field)
+        if rule and value and value.strip() and not rule[0].match(value.strip()):
+            errors.append(rule[1])
+    return errors
+
+def field_block(form_key: str, form_mode: bool):
+    return st.form(form_key, border=False) if form_mode else st.container()
+
+def block_submitted(form_mode: bool, label: str) -> bool:
+    # Outside form mode every widget commits on its own, so every run "submits".
+    if not form_mode:
+        return True
+    return st.form_submit_button(label, type="primary", use_container_width=True)
+
+def commit_field_block(section: str, values: Dict[str, str], submitted: bool, form_mode: bool) -> None:
+    """Write a block's values into a proposal section; in form mode only valid submissions."""
+    if not submitted:
+        return
+    if form_mode:
+        errors = validate_fields(values)
+        if errors:
+            for error in errors:
+                st.error(error)
+            return
+    target = st.session_state.proposal[section]
+    # Widgets inside st.form cannot take on_change, so the block marks its own edits.
+    if any(target.get(field) != value for field, value in values.items()):
+        note_edit(section)
+    target.update(values)
+
+def count_rerun() -> None:
+    """Reruns in this browser session, overall and per proposal."""
+    stats = st.session_state.setdefault("rerun_stats", {"total": 0, "by_proposal": {}})
+    stats["total"] += 1
+    proposal_id = st.session_state.proposal.get("meta", {}).get("proposal_id", "")
+    stats["by_proposal"][proposal_id] = stats["by_proposal"].get(proposal_id, 0) + 1
+
+def render_session_controls():
+    st.sidebar.toggle(
+        "Batch edits (form mode)",
+        value=FORM_MODE_DEFAULT,
+        key="form_mode",
+        help="Group the Project Info fields into blocks that apply together, so typing does not rerun the app on every field.",
+    )
+    stats = st.session_state.get("rerun_stats", {})
+    proposal_id = st.session_state.proposal.get("meta", {}).get("proposal_id", "")
+    st.sidebar.caption(
+        f"Reruns this session: {stats.get('total', 0)} "
+        f"(this proposal: {stats.get('by_proposal', {}).get(proposal_id, 0)})"
+    )
+
 # -----------------------------------------------------------------------------
 # UI renderers
 # -----------------------------------------------------------------------------
@@ -863,6 +1429,7 @@ def render_tab1():
     left, right = st.columns([1, 1])
 
     intake = st.session_state.proposal["intake"]
+    form_mode = bool(st.session_state.get("form_mode", FORM_MODE_DEFAULT))
 
     with left:
         st.markdown("**Property Lookup**")
@@ -878,9 +1445,12 @@ def render_tab1():
             county_options = ["Pinellas", "Hillsborough", "Pasco"]
             current_county = intake.get("county", "Pinellas") or "Pinellas"
             county_index = county_options.index(current_county) if current_county in county_options else 0
-            county_input = st.selectbox("County", options=county_options, index=county_index)
+            county_input = st.selectbox(
+                "County", options=county_options, index=county_index, on_change=note_edit, args=("intake",)
+            )
             intake["county"] = county_input
 
+        st.checkbox("Refresh from PCPAO (skip cached lookup)", key="lookup_refresh")
         if st.button("Lookup Property Data", type="primary", use_container_width=True, key="lookup_property"):
             if not parcel_id_input:
                 st.error("Please enter a parcel ID.")
@@ -891,27 +1461,37 @@ def render_tab1():
                 elif county_input != "Pinellas":
                     intake["county"] = county_input
                     intake["parcel_id"] = parcel_id_input
+                    note_edit("intake")
                     st.error("Property lookup is only implemented for Pinellas County right now.")
                 else:
                     with st.spinner("Fetching property data from PCPAO API..."):
-                        result = scrape_pinellas_property(parcel_id_input)
+                        result = lookup_pinellas_property(
+                            parcel_id_input, refresh=bool(st.session_state.get("lookup_refresh"))
+                        )
 
                     if result.get("success"):
                         intake["county"] = county_input
                         intake["parcel_id"] = parcel_id_input
-                        intake["address"] = result.get("address", "") or ""
-                        intake["city"] = expand_city_name(result.get("city", "") or "")
-                        intake["zip"] = result.get("zip", "") or ""
-                        intake["owner"] = result.get("owner", "") or ""
-                        intake["land_use"] = result.get("land_use", "") or ""
-                        intake["site_area_sqft"] = result.get("site_area_sqft", "") or ""
-                        intake["site_area_acres"] = result.get("site_area_acres", "") or ""
-                        intake["municipality"] = intake["city"]
-                        intake["jurisdiction_display"] = intake["city"]
+                        intake.update(lookup_intake_fields(result))
+                        intake.pop("queued_lookup", None)
+                        autofill_zoning_flu(intake, result.get("strap", "") or "")
+                        apply_overlay_suggestions(
+                            st.session_state.proposal,
+                            suggest_overlay_selections(county_input, parcel_id_input, result.get("strap", "") or ""),
+                        )
+                        note_edit("intake", "project", "permits")
                         st.success("Property data retrieved.")
                         st.rerun()
+                    elif result.get("unreachable"):
+                        queue_lookup(st.session_state.proposal, county_input, parcel_id_input, result.get("error", ""))
+                        note_edit("intake")
+                        st.warning(
+                            "pcpao.gov is not answering, so this lookup has been queued. Carry on with the "
+                            "fields below; the lookup fills in whatever you leave untouched once it goes through."
+                        )
                     else:
                         st.error(result.get("error", "Lookup failed"))
+        render_queued_lookup()
 
         intake["county"] = county_input
         city = expand_city_name(intake.get("city", "") or "")
@@ -934,15 +1514,20 @@ def render_tab1():
             st.info("No city map link found for this municipality.")
 
         st.markdown("**Lookup Summary (Auto-fills tokens)**")
-        intake["county"] = st.text_input("County", value=intake.get("county", ""))
-        intake["city"] = st.text_input("City", value=intake.get("city", ""))
-        intake["address"] = st.text_input("Address", value=intake.get("address", ""))
-        intake["owner"] = st.text_input("Owner", value=intake.get("owner", ""))
-        intake["land_use"] = st.text_input("Land Use", value=intake.get("land_use", ""))
-        intake["zoning"] = st.text_input("Zoning (full)", value=intake.get("zoning", ""))
-        intake["future_land_use"] = st.text_input("Future Land Use (full)", value=intake.get("future_land_use", ""))
-        intake["site_area_acres"] = st.text_input("Site Area (acres)", value=intake.get("site_area_acres", ""))
-        intake["site_area_sqft"] = st.text_input("Site Area (sf)", value=intake.get("site_area_sqft", ""))
+        with field_block("intake_summary_form", form_mode):
+            summary = {
+                "county": st.text_input("County", value=intake.get("county", "")),
+                "city": st.text_input("City", value=intake.get("city", "")),
+                "address": st.text_input("Address", value=intake.get("address", "")),
+                "owner": st.text_input("Owner", value=intake.get("owner", "")),
+                "land_use": st.text_input("Land Use", value=intake.get("land_use", "")),
+                "zoning": st.text_input("Zoning (full)", value=intake.get("zoning", "")),
+                "future_land_use": st.text_input("Future Land Use (full)", value=intake.get("future_land_use", "")),
+                "site_area_acres": st.text_input("Site Area (acres)", value=intake.get("site_area_acres", "")),
+                "site_area_sqft": st.text_input("Site Area (sf)", value=intake.get("site_area_sqft", "")),
+            }
+            submitted = block_submitted(form_mode, "Apply lookup summary")
+        commit_field_block("intake", summary, submitted, form_mode)
 
     with right:
         project = st.session_state.proposal["project"]
@@ -967,24 +1552,38 @@ def render_tab1():
             st.session_state["last_intake_csz"] = csz
         st.session_state["last_intake_address"] = current_addr
 
-        st.markdown("**Project (Tokens)**")
-        project["project_name"] = st.text_input("Project Name", value=project.get("project_name", ""))
-        st.markdown("**Property Address**")
-        project["property_name"] = st.text_input("Name", value=project.get("property_name", ""), key="property_name")
-        project["property_address_line1"] = st.text_input("Address", key=prop_addr_key)
-        project["property_address_line2"] = st.text_input("Apt / Unit / Suite", value=project.get("property_address_line2", ""), key="property_address_line2")
-        project["property_address_city_state_zip"] = st.text_input("City, State, ZIP", key=prop_csz_key)
-        project["proposal_date"] = st.text_input("Proposal Date (optional)", value=project.get("proposal_date", ""))
-
-        st.markdown("**Client / Entity (Tokens)**")
-        client["client_name"] = st.text_input("Client Name", value=client.get("client_name", ""))
-        client["client_contact_name"] = st.text_input("Client Contact Name", value=client.get("client_contact_name", ""))
-        client["entity_name"] = st.text_input("Client Legal Entity (Sunbiz)", value=client.get("entity_name", ""))
-        st.markdown("**Entity Address**")
-        client["entity_address_name"] = st.text_input("Name", value=client.get("entity_address_name", ""), key="entity_address_name")
-        client["entity_address_line1"] = st.text_input("Address", value=client.get("entity_address_line1", ""), key="entity_address_line1")
-        client["entity_address_line2"] = st.text_input("Apt / Unit / Suite", value=client.get("entity_address_line2", ""), key="entity_address_line2")
-        client["entity_address_city_state_zip"] = st.text_input("City, State, ZIP", value=client.get("entity_address_city_state_zip", ""), key="entity_address_city_state_zip")
+        with field_block("project_tokens_form", form_mode):
+            st.markdown("**Project (Tokens)**")
+            project_fields = {
+                "project_name": st.text_input("Project Name", value=project.get("project_name", "")),
+            }
+            st.markdown("**Property Address**")
+            project_fields.update({
+                "property_name": st.text_input("Name", value=project.get("property_name", ""), key="property_name"),
+                "property_address_line1": st.text_input("Address", key=prop_addr_key),
+                "property_address_line2": st.text_input("Apt / Unit / Suite", value=project.get("property_address_line2", ""), key="property_address_line2"),
+                "property_address_city_state_zip": st.text_input("City, State, ZIP", key=prop_csz_key),
+                "proposal_date": st.text_input("Proposal Date (optional)", value=project.get("proposal_date", "")),
+            })
+            submitted = block_submitted(form_mode, "Apply project")
+        commit_field_block("project", project_fields, submitted, form_mode)
+
+        with field_block("client_tokens_form", form_mode):
+            st.markdown("**Client / Entity (Tokens)**")
+            client_fields = {
+                "client_name": st.text_input("Client Name", value=client.get("client_name", "")),
+                "client_contact_name": st.text_input("Client Contact Name", value=client.get("client_contact_name", "")),
+                "entity_name": st.text_input("Client Legal Entity (Sunbiz)", value=client.get("entity_name", "")),
+            }
+            st.markdown("**Entity Address**")
+            client_fields.update({
+                "entity_address_name": st.text_input("Name", value=client.get("entity_address_name", ""), key="entity_address_name"),
+                "entity_address_line1": st.text_input("Address", value=client.get("entity_address_line1", ""), key="entity_address_line1"),
+                "entity_address_line2": st.text_input("Apt / Unit / Suite", value=client.get("entity_address_line2", ""), key="entity_address_line2"),
+                "entity_address_city_state_zip": st.text_input("City, State, ZIP", value=client.get("entity_address_city_state_zip", ""), key="entity_address_city_state_zip"),
+            })
+            submitted = block_submitted(form_mode, "Apply client")
+        commit_field_block("client", client_fields, submitted, form_mode)
 
 def render_tab2():
     st.subheader("Project Understanding")
@@ -998,6 +1597,8 @@ def render_tab2():
         value=proj.get("project_description_short", ""),
         height=120,
         placeholder="Example: Client plans to develop ...",
+        on_change=note_edit,
+        args=("project",),
     )
 
     st.markdown("### Project Assumptions (check all that apply)")
@@ -1023,7 +1624,9 @@ def render_tab2():
     ]
     checked = proj.setdefault("assumptions_checked", {})
     for aid, label in assumptions:
-        checked[aid] = st.checkbox(label, value=bool(checked.get(aid, False)), key=f"tab2_{aid}")
+        checked[aid] = st.checkbox(
+            label, value=bool(checked.get(aid, False)), key=f"tab2_{aid}", on_change=note_edit, args=("project",)
+        )
 
     st.markdown("### Additional Project Assumptions (optional)")
     proj["assumptions_other"] = st.text_area(
@@ -1031,8 +1634,12 @@ def render_tab2():
         value=proj.get("assumptions_other", ""),
         height=100,
         placeholder="Enter any additional assumptions, exclusions, phasing notes, etc.",
+        on_change=note_edit,
+        args=("project",),
     )
 
+    render_similar_proposals(proj)
+
     st.markdown("### Project Understanding (auto-generated)")
     parts = []
     desc = proj.get("project_description_short", "").strip()
@@ -1075,6 +1682,9 @@ def render_tab2():
     current_text = proj.get("project_understanding", "")
     last_auto = proj.get("project_understanding_auto", "")
     if not current_text or current_text == last_auto:
+        if paragraph != current_text or paragraph != last_auto:
+            # Follows intake edits made elsewhere.
+            note_edit("project")
         proj["project_understanding"] = paragraph
         proj["project_understanding_auto"] = paragraph
 
@@ -1082,6 +1692,8 @@ def render_tab2():
         "Project Understanding (auto-generated)",
         value=proj.get("project_understanding", paragraph),
         height=110,
+        on_change=note_edit,
+        args=("project",),
     )
 
     # Simple preview of what will be inserted
@@ -1095,6 +1707,41 @@ def render_tab2():
     else:
         st.write(proj.get("project_description_short","").strip())
 
+def render_similar_proposals(proj: Dict[str, Any]):
+    proposal = st.session_state.proposal
+    if not (proj.get("project_description_short") or proj.get("assumptions_other")):
+        return
+    index = get_similarity_index()
+    matches = index.query(proposal, k=5, exclude=[proposal.get("meta", {}).get("proposal_id", "")])
+    if not matches:
+        return
+    with st.expander(f"Similar past proposals ({len(matches)})"):
+        st.caption(f"Searched {len(index)} saved proposals in {index.last_query_ms:.0f} ms.")
+        store = get_proposal_store()
+        for proposal_id, score in matches:
+            other = store.load(proposal_id) or {}
+            other_proj = other.get("project", {})
+            title = other_proj.get("project_name") or other.get("intake", {}).get("address") or proposal_id[:8]
+            st.markdown(f"**{title}** — similarity {score:.2f}")
+            desc = other_proj.get("project_description_short", "")
+            other_assumptions = other_proj.get("assumptions_other", "")
+            if desc:
+                st.write(desc)
+            if other_assumptions:
+                st.caption(other_assumptions)
+            use_desc, use_assump = st.columns(2)
+            with use_desc:
+                if desc and st.button("Use description", type="primary", key=f"similar_desc_{proposal_id}", use_container_width=True):
+                    proj["project_description_short"] = desc
+                    note_edit("project")
+                    st.rerun()
+            with use_assump:
+                if other_assumptions and st.button("Append assumptions", type="primary", key=f"similar_assump_{proposal_id}", use_container_width=True):
+                    current = (proj.get("assumptions_other", "") or "").rstrip()
+                    proj["assumptions_other"] = f"{current}\n{other_assumptions}".strip()
+                    note_edit("project")
+                    st.rerun()
+
 def render_tab3():
     st.subheader("Scope of Services")
     st.markdown("Select the tasks to include and enter the fee for each task.")
@@ -1115,6 +1762,8 @@ def render_tab3():
                     value=bool(existing) or task_num == "310",
                     key=f"check_{task_num}",
                     label_visibility="collapsed",
+                    on_change=note_edit,
+                    args=("scope",),
                 )
 
             with col_name:
@@ -1137,13 +1786,20 @@ def render_tab3():
                     placeholder=format_currency(task["amount"]),
                     key=f"fee_{task_num}",
                     label_visibility="collapsed",
+                    on_change=note_edit,
+                    args=("scope",),
                 )
+                hint = fee_hint(f"task_{task_num}")
+                if hint:
+                    st.caption(hint)
 
         
             if task_selected:
                 cleaned = re.sub(r"[^\d.]", "", str(fee_text or "")).strip()
                 final_fee = int(float(cleaned)) if cleaned else task["amount"]
+                # Keeps Task 310's services and hours, which the widgets below re-read.
                 selected_tasks[task_num] = {
+                    **existing,
                     "name": task["name"],
                     "fee": final_fee,
                 }
@@ -1153,149 +1809,46 @@ def render_tab3():
             if task_selected and task_num == "310":
                 st.markdown("**Construction Phase Services:**")
                 st.caption("Select services, enter hours/count, rate, and cost")
-                default_included = {"shop_drawings", "rfi", "oac", "site_visits", "asbuilt", "fdep", "compliance", "wmd"}
-                existing_services = selected_tasks.get("310", {}).get("services", {})
-                rows = []
-                svc_keys = []
-                for svc_key, svc_name, default_hrs, default_rate, default_cost in TASK_310_SERVICES:
-                    svc_keys.append(svc_key)
-                    existing = existing_services.get(svc_key, {})
-                    included = existing.get("included")
-                    if included is None:
-                        included = svc_key in default_included
-                    prev_hours = existing.get("hours")
-                    hrs_allowed = default_hrs > 0 or svc_key in ["inspection_tv", "record_drawings"]
-                    if isinstance(prev_hours, (int, float)):
-                        hrs_value = prev_hours
-                    else:
-                        hrs_value = None if hrs_allowed else None
-                    prev_rate = existing.get("rate")
-                    rate_allowed = default_rate > 0 or svc_key in ["inspection_tv", "record_drawings"]
-                    if isinstance(prev_rate, (int, float)):
-                        rate_value = prev_rate
-                    else:
-                        if rate_allowed and included:
-                            rate_value = default_rate if default_rate > 0 else 165
-                        else:
-                            rate_value = None
-                    cost_value = (hrs_value or 0) * (rate_value or 0) if included else 0
-                    rows.append({
-                        "included": bool(included),
-                        "service": svc_name,
-                        "hrs_count": hrs_value,
-                        "rate": rate_value,
-                        "cost": cost_value,
-                    })
-                # Manual column layout for perfect alignment
-                # Header row with fixed column widths
-                col_check, col_service, col_hrs, col_rate, col_cost = st.columns([0.6, 2.5, 1, 1, 1])
-                with col_check:
-                    st.markdown("**Select**")
-                with col_service:
-                    st.markdown("**Service**")
-                with col_hrs:
-                    st.markdown("**Hrs/Count**")
-                with col_rate:
-                    st.markdown("**$/hr**")
-                with col_cost:
-                    st.markdown("**Cost**")
-                
-                service_data = {}
-                for idx, row_data in enumerate(rows):
-                    svc_key = svc_keys[idx]
-                    svc_name = row_data["service"]
-                    
-                    # Create row with same column widths
-                    col_check, col_service, col_hrs, col_rate, col_cost = st.columns([0.6, 2.5, 1, 1, 1])
-                    
-                    with col_check:
-                        included = st.checkbox(
-                            "Include",
-                            value=row_data["included"],
-                            key=f"cps_check_{svc_key}",
-                            label_visibility="collapsed"
-                        )
-                    
-                    with col_service:
-                        st.text_input(
-                            "Service Name",
-                            value=svc_name,
-                            key=f"cps_service_{svc_key}",
-                            label_visibility="collapsed"
-                        )
-                    
-                    with col_hrs:
-                        hrs_val = row_data["hrs_count"]
-                        hrs_str = st.text_input(
-                            "Hours",
-                            value=str(int(hrs_val)) if hrs_val is not None and hrs_val != 0 else "",
-                            key=f"cps_hrs_{svc_key}",
-                            label_visibility="collapsed",
-                            placeholder="0"
-                        )
-                        # Convert to int, default to 0 if invalid
-                        hrs_input = int(hrs_str) if hrs_str and hrs_str.isdigit() else 0
-                    
-                    with col_rate:
-                        rate_val = row_data["rate"]
-                        rate_str = st.text_input(
-                            "Rate",
-                            value=f"{float(rate_val):.2f}" if rate_val is not None and rate_val != 0 else "",
-                            key=f"cps_rate_{svc_key}",
-                            label_visibility="collapsed",
-                            placeholder="$0.00"
-                        )
-                        # Convert to float, default to 0 if invalid
-                        try:
-                            rate_input = float(rate_str.replace('$', '').replace(',', '')) if rate_str else 0.0
-                        except ValueError:
-                            rate_input = 0.0
-                    
-                    with col_cost:
-                        cost_num = (hrs_input * rate_input) if included else 0
-                        st.text_input(
-                            "Cost",
-                            value=f"${cost_num:,.2f}",
-                            key=f"cps_cost_{svc_key}",
-                            label_visibility="collapsed",
-                            disabled=True,
-                            placeholder="$0.00"
-                        )
-                    
-                    service_data[svc_key] = {
-                        "included": included,
-                        "name": svc_name,
-                        "hours": hrs_input if included else 0,
-                        "rate": rate_input if included else 0,
-                        "cost": int(cost_num) if cost_num else 0,
-                    }
-                selected_tasks["310"]["services"] = service_data
-                selected_tasks["310"]["services_total_cost"] = sum(
-                    svc.get("cost", 0) for svc in service_data.values()
+                task_310 = selected_tasks["310"]
+                frame = task_310_frame(task_310.get("services", {}))
+                edited = st.data_editor(
+                    frame,
+                    key="cps_grid",
+                    on_change=_apply_task_310_grid_edits,
+                    hide_index=True,
+                    num_rows="fixed",
+                    use_container_width=True,
+                    column_order=TASK_310_COLUMNS,
+                    column_config={
+                        "included": st.column_config.CheckboxColumn("Select", width="small"),
+                        "service": st.column_config.TextColumn("Service", disabled=True, width="large"),
+                        "hours": st.column_config.NumberColumn("Hrs/Count", min_value=0, step=1, format="%d"),
+                        "rate": st.column_config.NumberColumn("$/hr", min_value=0.0, format="$%.2f"),
+                        "cost": st.column_config.NumberColumn("Cost", disabled=True, format="$%.2f"),
+                    },
                 )
+                frame = compute_task_310_costs(edited)
+                service_data = task_310_services(frame)
 
                 st.markdown("---")
                 total_hrs_text = st.text_input(
                     "**Total Task 310 Hours**",
-                    value=str(selected_tasks.get("310", {}).get("total_hours", 180)),
+                    value=str(task_310.get("total_hours", 180)),
                     key="total_construction_hours",
+                    on_change=note_edit,
+                    args=("scope",),
                 )
                 cleaned = re.sub(r"[^\d.]", "", str(total_hrs_text or "")).strip()
                 total_hrs = int(float(cleaned)) if cleaned else 0
 
-                selected_tasks["310"]["services"] = service_data
-                selected_tasks["310"]["services_total_cost"] = sum(
-                    svc.get("cost", 0) for svc in service_data.values()
-                )
-                selected_tasks["310"]["total_hours"] = total_hrs
-                selected_tasks["310"]["hours"] = {
-                    "shop_drawing": service_data["shop_drawings"]["hours"],
-                    "rfi": service_data["rfi"]["hours"],
-                    "oac_meetings": service_data["oac"]["hours"],
-                    "site_visits": service_data["site_visits"]["hours"],
-                    "record_drawing": service_data["record_drawings"]["hours"],
-                    "total": total_hrs,
+                task_310["services"] = service_data
+                task_310["services_total_cost"] = int(frame["cost"].astype(int).sum())
+                task_310["total_hours"] = total_hrs
+                # RateCard rejects a version without these services.
+                task_310["hours"] = {
+                    name: service_data[key]["hours"] for key, name in TASK_310_HOURS_KEYS.items()
                 }
+                task_310["hours"]["total"] = total_hrs
 
 
 def render_tab4():
@@ -1313,59 +1866,24 @@ def render_tab4():
     ahj_name = permit_config.get("ahj_name", "Authority Having Jurisdiction")
     wmd_name = permit_config.get("wmd_short", "Water Management District")
 
-    col_permit1, col_permit2, col_permit3 = st.columns(3)
-
-    with col_permit1:
-        st.markdown("**Local / Utilities**")
-    with col_permit2:
-        st.markdown("**State / Regional**")
-    with col_permit3:
-        st.markdown("**FDOT**")
-
-    with col_permit1:
-        permit_ahj = st.checkbox(f"{ahj_name}", value=permit_flags.get("permit_ahj", "ahj" in default_permits), key="permit_ahj")
-        permit_sewer = st.checkbox("Sewer Provider", value=permit_flags.get("permit_sewer", "sewer" in default_permits), key="permit_sewer")
-        permit_water = st.checkbox("Water Provider", value=permit_flags.get("permit_water", "water" in default_permits), key="permit_water")
-        permit_site_plan_review = st.checkbox("Site Plan / Development Review", value=permit_flags.get("permit_site_plan_review", False), key="permit_site_plan_review")
-        permit_site_eng_grading = st.checkbox("Site Engineering, Grading & Drainage", value=permit_flags.get("permit_site_eng_grading", False), key="permit_site_eng_grading")
-        permit_row_utilization = st.checkbox("Right-of-Way Utilization Permit", value=permit_flags.get("permit_row_utilization", False), key="permit_row_utilization")
-        permit_zoning_clearance = st.checkbox("Zoning Clearance", value=permit_flags.get("permit_zoning_clearance", False), key="permit_zoning_clearance")
-
-    with col_permit2:
-        permit_wmd_erp = st.checkbox(f"{wmd_name} ERP", value=permit_flags.get("permit_wmd_erp", "wmd_erp" in default_permits), key="permit_wmd_erp")
-        permit_fdep = st.checkbox("FDEP Potable Water/Wastewater", value=permit_flags.get("permit_fdep", False), key="permit_fdep")
-        permit_fdot_drainage = st.checkbox("FDOT Drainage Connection", value=permit_flags.get("permit_fdot_drainage", False), key="permit_fdot_drainage")
-        permit_floodplain = st.checkbox("Floodplain / Construction in Flood Zone", value=permit_flags.get("permit_floodplain", False), key="permit_floodplain")
-        permit_utilities_conn = st.checkbox("Utilities Connection Request", value=permit_flags.get("permit_utilities_conn", False), key="permit_utilities_conn")
-        permit_reclaimed_water = st.checkbox("Reclaimed Water Connection + Inspection", value=permit_flags.get("permit_reclaimed_water", False), key="permit_reclaimed_water")
-
-    with col_permit3:
-        permit_fdot_driveway = st.checkbox("FDOT Driveway Connection", value=permit_flags.get("permit_fdot_driveway", False), key="permit_fdot_driveway")
-        permit_fdot_utility = st.checkbox("FDOT Utility Connection", value=permit_flags.get("permit_fdot_utility", False), key="permit_fdot_utility")
-        permit_fdot_general_use = st.checkbox("FDOT General Use Permit", value=permit_flags.get("permit_fdot_general_use", False), key="permit_fdot_general_use")
-        permit_fdot_construction = st.checkbox("FDOT Construction Agreement", value=permit_flags.get("permit_fdot_construction", False), key="permit_fdot_construction")
-        permit_fema = st.checkbox("FEMA", value=permit_flags.get("permit_fema", False), key="permit_fema")
-
-    permit_flags.update({
-        "permit_ahj": permit_ahj,
-        "permit_sewer": permit_sewer,
-        "permit_water": permit_water,
-        "permit_wmd_erp": permit_wmd_erp,
-        "permit_fdep": permit_fdep,
-        "permit_fdot_drainage": permit_fdot_drainage,
-        "permit_fdot_driveway": permit_fdot_driveway,
-        "permit_fdot_utility": permit_fdot_utility,
-        "permit_fdot_general_use": permit_fdot_general_use,
-        "permit_fdot_construction": permit_fdot_construction,
-        "permit_site_plan_review": permit_site_plan_review,
-        "permit_site_eng_grading": permit_site_eng_grading,
-        "permit_row_utilization": permit_row_utilization,
-        "permit_zoning_clearance": permit_zoning_clearance,
-        "permit_floodplain": permit_floodplain,
-        "permit_utilities_conn": permit_utilities_conn,
-        "permit_reclaimed_water": permit_reclaimed_water,
-        "permit_fema": permit_fema,
-    })
+    overlay_reasons = permits.get("overlay_suggestions", {}).get("reasons", [])
+    if overlay_reasons:
+        st.caption("Pre-selected from local overlay data: " + "; ".join(overlay_reasons) + ".")
+
+    permit_cols = dict(zip(PERMIT_COLUMNS, st.columns(len(PERMIT_COLUMNS))))
+    for title, col in permit_cols.items():
+        with col:
+            st.markdown(f"**{title}**")
+
+    for key, label, column, default_key in PERMIT_REGISTRY:
+        with permit_cols[column]:
+            permit_flags[key] = st.checkbox(
+                permit_label(label, ahj_name, wmd_name),
+                value=permit_flags.get(key, default_key in default_permits),
+                key=key,
+                on_change=note_edit,
+                args=("permits",),
+            )
 
     st.markdown("---")
     st.subheader("Additional Services")
@@ -1389,6 +1907,8 @@ def render_tab4():
                 value=bool(permits.get("included_additional_services_with_fees", {}).get(service_name)) if service_name in permits.get("included_additional_services_with_fees", {}) else default_checked,
                 key=f"addl_svc_{key}",
                 label_visibility="collapsed",
+                on_change=note_edit,
+                args=("permits",),
             )
         with cols[1]:
             st.markdown(f'<div class="svc-label">{service_name}</div>', unsafe_allow_html=True)
@@ -1399,7 +1919,12 @@ def render_tab4():
                 placeholder=format_currency(default_fee),
                 key=f"addl_fee_{key}",
                 label_visibility="collapsed",
+                on_change=note_edit,
+                args=("permits",),
             )
+            hint = fee_hint(f"svc_{service_name}")
+            if hint:
+                st.caption(hint)
 
         if is_checked_left:
             cleaned = re.sub(r"[^\d.]", "", str(fee_text or "")).strip()
@@ -1418,6 +1943,8 @@ def render_tab4():
                     value=bool(permits.get("included_additional_services_with_fees", {}).get(service_name)) if service_name in permits.get("included_additional_services_with_fees", {}) else default_checked,
                     key=f"addl_svc_{key}",
                     label_visibility="collapsed",
+                    on_change=note_edit,
+                    args=("permits",),
                 )
             with cols[3]:
                 st.markdown(f'<div class="svc-label">{service_name}</div>', unsafe_allow_html=True)
@@ -1428,7 +1955,12 @@ def render_tab4():
                     placeholder=format_currency(default_fee),
                     key=f"addl_fee_{key}",
                     label_visibility="collapsed",
+                    on_change=note_edit,
+                    args=("permits",),
                 )
+                hint = fee_hint(f"svc_{service_name}")
+                if hint:
+                    st.caption(hint)
 
             if is_checked_right:
                 cleaned = re.sub(r"[^\d.]", "", str(fee_text or "")).strip()
@@ -1478,6 +2010,41 @@ def render_tab4():
         st.info("Select at least one task in the Scope of Services tab")
 
 
+def scope_task_lines(task_num: str, task: Dict[str, Any]) -> List[str]:
+    descs = TASK_DESCRIPTIONS.get(task_num, [])
+    if task_num == "310":
+        hours = task.get("hours", {})
+        fmt = {
+            "shop_drawing_hours": hours.get("shop_drawing", 0),
+            "rfi_hours": hours.get("rfi", 0),
+            "oac_meetings": hours.get("oac_meetings", 0),
+            "site_visits": hours.get("site_visits", 0),
+            "record_drawing_hours": hours.get("record_drawing", 0),
+            "total_hours": task.get("total_hours", 0),
+        }
+        descs = [d.format(**fmt) for d in descs]
+    return descs
+
+def generated_scope_text(proposal: Dict[str, Any]) -> str:
+    """Plain-text version of the Tab 5 scope output (used for search)."""
+    lines = []
+    selected_tasks = proposal.get("scope", {}).get("selected_tasks", {})
+    for task_num in sorted(selected_tasks.keys()):
+        task = selected_tasks[task_num]
+        lines.append(f"Task {task_num}: {task.get('name', '')}")
+        lines.extend(scope_task_lines(task_num, task))
+    permit_config = PERMIT_MAPPING.get(proposal.get("intake", {}).get("county", ""), {})
+    ahj_name = permit_config.get("ahj_name", "Authority Having Jurisdiction")
+    wmd_name = permit_config.get("wmd_short", "Water Management District")
+    permit_flags = proposal.get("permits", {}).get("permit_flags", {})
+    lines.extend(
+        permit_label(label, ahj_name, wmd_name)
+        for key, label, _, _ in PERMIT_REGISTRY
+        if permit_flags.get(key)
+    )
+    lines.extend(proposal.get("permits", {}).get("included_additional_services", []) or [])
+    return "\n".join(lines)
+
 def render_tab5():
     st.subheader("Invoice & Billing Information")
 
@@ -1493,15 +2060,21 @@ def render_tab5():
             "Invoice Email Address",
             value=invoice.get("invoice_email", ""),
             placeholder="e.g., accounting@company.com",
+            on_change=note_edit,
+            args=("invoice",),
         )
         invoice["kh_signer_name"] = st.text_input(
             "Kimley-Horn Signer Name",
             value=invoice.get("kh_signer_name", ""),
             placeholder="e.g., John Smith, PE",
+            on_change=note_edit,
+            args=("invoice",),
         )
         invoice["use_retainer"] = st.checkbox(
             "Require Retainer",
             value=bool(invoice.get("use_retainer", False)),
+            on_change=note_edit,
+            args=("invoice",),
         )
 
     with col_inv2:
@@ -1509,16 +2082,22 @@ def render_tab5():
             "CC Email (optional)",
             value=invoice.get("invoice_cc_email", ""),
             placeholder="e.g., manager@company.com",
+            on_change=note_edit,
+            args=("invoice",),
         )
         invoice["kh_signer_title"] = st.text_input(
             "Kimley-Horn Signer Title",
             value=invoice.get("kh_signer_title", ""),
             placeholder="e.g., Senior Project Manager",
+            on_change=note_edit,
+            args=("invoice",),
         )
         retainer_text = st.text_input(
             "Retainer Amount ($)",
             value=format_currency(invoice.get("retainer_amount")) if invoice.get("retainer_amount") is not None else "",
             placeholder=format_currency(0),
+            on_change=note_edit,
+            args=("invoice",),
         )
         cleaned = re.sub(r"[^\d.]", "", str(retainer_text or "")).strip()
         invoice["retainer_amount"] = int(float(cleaned)) if cleaned else 0
@@ -1532,19 +2111,7 @@ def render_tab5():
         for task_num in sorted(selected_tasks.keys()):
             task = selected_tasks[task_num]
             st.markdown(f"### Task {task_num}: {task['name']} - {format_currency(task['fee'])}")
-            descs = TASK_DESCRIPTIONS.get(task_num, [])
-            if task_num == "310":
-                hours = task.get("hours", {})
-                fmt = {
-                    "shop_drawing_hours": hours.get("shop_drawing", 0),
-                    "rfi_hours": hours.get("rfi", 0),
-                    "oac_meetings": hours.get("oac_meetings", 0),
-                    "site_visits": hours.get("site_visits", 0),
-                    "record_drawing_hours": hours.get("record_drawing", 0),
-                    "total_hours": task.get("total_hours", 0),
-                }
-                descs = [d.format(**fmt) for d in descs]
-            for line in descs:
+            for line in scope_task_lines(task_num, task):
                 st.write(f"- {line}")
     else:
         st.info("Select tasks in Tab 3 to see the generated scope output.")
@@ -1554,43 +2121,11 @@ def render_tab5():
     wmd_name = permit_config.get("wmd_short", "Water Management District")
 
     permit_flags = permits.get("permit_flags", {})
-    permit_list = []
-    if permit_flags.get("permit_ahj"):
-        permit_list.append(ahj_name)
-    if permit_flags.get("permit_sewer"):
-        permit_list.append("Sewer Provider")
-    if permit_flags.get("permit_water"):
-        permit_list.append("Water Provider")
-    if permit_flags.get("permit_site_plan_review"):
-        permit_list.append("Site Plan / Development Review")
-    if permit_flags.get("permit_site_eng_grading"):
-        permit_list.append("Site Engineering, Grading & Drainage")
-    if permit_flags.get("permit_row_utilization"):
-        permit_list.append("Right-of-Way Utilization Permit")
-    if permit_flags.get("permit_zoning_clearance"):
-        permit_list.append("Zoning Clearance")
-    if permit_flags.get("permit_wmd_erp"):
-        permit_list.append(f"{wmd_name} ERP")
-    if permit_flags.get("permit_fdep"):
-        permit_list.append("FDEP Potable Water/Wastewater")
-    if permit_flags.get("permit_fdot_drainage"):
-        permit_list.append("FDOT Drainage Connection")
-    if permit_flags.get("permit_floodplain"):
-        permit_list.append("Floodplain / Construction in Flood Zone")
-    if permit_flags.get("permit_utilities_conn"):
-        permit_list.append("Utilities Connection Request")
-    if permit_flags.get("permit_reclaimed_water"):
-        permit_list.append("Reclaimed Water Connection + Inspection")
-    if permit_flags.get("permit_fdot_driveway"):
-        permit_list.append("FDOT Driveway Connection")
-    if permit_flags.get("permit_fdot_utility"):
-        permit_list.append("FDOT Utility Connection")
-    if permit_flags.get("permit_fdot_general_use"):
-        permit_list.append("FDOT General Use Permit")
-    if permit_flags.get("permit_fdot_construction"):
-        permit_list.append("FDOT Construction Agreement")
-    if permit_flags.get("permit_fema"):
-        permit_list.append("FEMA")
+    permit_list = [
+        permit_label(label, ahj_name, wmd_name)
+        for key, label, _, _ in PERMIT_REGISTRY
+        if permit_flags.get(key)
+    ]
 
     if permit_list:
         st.markdown("## Permitting Requirements (selected)")
@@ -1621,32 +2156,333 @@ def render_tab5():
         st.write("Retainer: Not required")
 
 
+# -----------------------------------------------------------------------------
+# Warm-up (once per worker process)
+# -----------------------------------------------------------------------------
+def _warm_jurisdiction() -> str:
+    lookup = get_city_lookup()
+    names = set(PINELLAS_CITY_MAP.values())
+    for county in PERMIT_MAPPING:
+        get_parcel_locator(county)
+        get_environmental_overlays(county)
+        names.add(f"Unincorporated {county}")
+    loaded = sum(1 for name in sorted(names) if get_jurisdiction_overlays(name))
+    return f"{len(lookup)} city entries, {loaded} of {len(names)} jurisdictions with overlay layers"
+
+def _warm_parsers() -> str:
+    # First use builds the lxml/html.parser tree builders and compiles the parsing regexes.
+    row = ["", "", "<span>OWNER</span>", "", "", "<span>1 MAIN ST</span>", "SP", "0110 Single Family", "LOT 1", "", ""]
+    record = extract_record(
+        normalize_parcel_id("193117731660010010"),
+        {"recordsTotal": 1, "data": [row]},
+        "<div>Land Area: 1,000 sf | 0.02 acres</div><div>FL 33701</div>",
+    )
+    validate_parcel_id("19-31-17-73166-001-0010")
+    return "ok" if record.get("success") else record.get("error", "")
+
+def _warm_templates() -> str:
+    selected = {num: {"name": task["name"], "fee": task["amount"]} for num, task in DEFAULT_FEES.items()}
+    frame = task_310_frame({})
+    selected["310"]["services"] = task_310_services(frame)
+    proposal = {"scope": {"selected_tasks": selected}, "intake": {"county": "Pinellas"}, "permits": {}}
+    return f"{len(generated_scope_text(proposal).splitlines())} scope lines"
+
+def _warm_connections() -> str:
+    get_response_archive()
+    get_proposal_store().max_seq()
+    # Opens a pooled keep-alive connection (TLS handshake included) to pcpao.gov.
+    get_pcpao_limiter().acquire("batch", timeout=10)
+    response = get_resilient_session().head(PCPAO_BASE_URL, timeout=10, allow_redirects=False)
+    return f"{urlparse(PCPAO_BASE_URL).hostname} {response.status_code}"
+
+def _warm_parcels() -> str:
+    cache = get_shared_cache()
+    archive = get_response_archive()
+    recent = (archive.recent_parcel_ids(WARMUP_PARCELS) if archive is not None else []) + get_proposal_store().recent_parcel_ids(WARMUP_PARCELS)
+    unique: Dict[str, str] = {}
+    for parcel_id in recent:
+        unique.setdefault(parcel_key(parcel_id), parcel_id)
+    parcels = list(unique.values())[:WARMUP_PARCELS]
+    cached = fetched = 0
+    for parcel_id in parcels:
+        # A shared-tier hit is copied into this worker's local tier; misses are revalidated in the batch lane.
+        # A failed warm-up fetch must not mark pcpao.gov down for interactive lookups.
+        if cache.get("parcel", parcel_key(parcel_id)) is not None:
+            cached += 1
+        elif lookup_pinellas_property(parcel_id, lane="batch", report_health=False).get("success"):
+            fetched += 1
+    return f"{len(parcels)} recent parcels: {cached} from the shared cache, {fetched} fetched"
+
+WARMUP_STAGE_FUNCTIONS = {
+    "jurisdiction": _warm_jurisdiction,
+    "parsers": _warm_parsers,
+    "templates": _warm_templates,
+    "connections": _warm_connections,
+    "parcels": _warm_parcels,
+}
+
+@st.cache_resource
+def get_warmup() -> Warmup:
+    names = [n.strip() for n in WARMUP_STAGES.split(",") if n.strip() and n.strip().lower() != "off"]
+    return Warmup([(name, WARMUP_STAGE_FUNCTIONS[name]) for name in names if name in WARMUP_STAGE_FUNCTIONS]).start()
+
+@st.cache_resource
+def get_cold_start() -> ColdStart:
+    return ColdStart()
+
+def render_admin_rate_card():
+    with st.sidebar.expander("Rate card (admin)", expanded=False):
+        watcher = get_rate_card_watcher()
+        card = watcher.current()
+        st.caption(
+            f"Version {card.version} (effective {card.effective or '-'}), loaded "
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(watcher.loaded_at))}; "
+            f"{watcher.reloads} reload(s) in this worker. Versions on file: "
+            f"{', '.join(str(v) for v in sorted(watcher.cards))}"
+        )
+        if watcher.error:
+            st.error(f"Last edit not loaded: {watcher.error}")
+        st.caption("Re-price stored proposals with `python rate_card.py reprice` (dry run unless --apply).")
+
+def render_admin_rules():
+    with st.sidebar.expander("Consistency rules (admin)", expanded=False):
+        rules = get_proposal_rules()
+        if rules.error:
+            st.error(f"Rules not loaded: {rules.error}")
+        st.caption(f"{len(rules)} rules from {PROPOSAL_RULES_PATH.name}, compiled in {rules.compile_seconds * 1000:.1f} ms.")
+        if len(rules):
+            st.dataframe(
+                pd.DataFrame([{"rule": r.id, "severity": r.severity, "checks": r.description} for r in rules.rules]),
+                hide_index=True, use_container_width=True,
+            )
+        st.caption("Check every stored proposal with `python proposal_rules.py scan`.")
+
+def render_admin_lookup_queue():
+    with st.sidebar.expander("Lookup queue (admin)", expanded=False):
+        queue = get_lookup_queue()
+        down = queue.upstream_down(PCPAO_OFFLINE_SECONDS)
+        if down:
+            st.caption(f"pcpao.gov marked down at {time.strftime('%H:%M:%S', time.localtime(down['failed_at']))}: {down['error']}")
+        counts = queue.counts()
+        replayer = get_lookup_replayer()
+        st.caption(
+            f"{counts['queued']} queued, {counts['done']} done, {counts['rejected']} rejected (all workers); "
+            f"this worker replayed {replayer.stats['replayed']}, retried {replayer.stats['retried']}, "
+            f"rejected {replayer.stats['rejected']}"
+        )
+        rows = [
+            {
+                "parcel": e["parcel_id"],
+                "queued": time.strftime("%m-%d %H:%M", time.localtime(e["queued_at"])),
+                "attempts": e["attempts"],
+                "next try in (s)": max(round(e["next_attempt_at"] - time.time()), 0),
+                "last error": e["last_error"],
+            }
+            for e in queue.pending()
+        ]
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        if st.button("Retry queued lookups now", key="admin_retry_lookups", use_container_width=True):
+            st.toast(f"{queue.retry_all_now()} lookup(s) due now.")
+
+def render_admin_warmup():
+    with st.sidebar.expander("Warm-up (admin)", expanded=False):
+        warmup = get_warmup()
+        cold = get_cold_start().snapshot()
+
+        def ms(seconds: Optional[float]) -> str:
+            return f"{seconds * 1000:.0f} ms" if seconds is not None else "not yet"
+
+        st.caption(
+            f"This worker's first page load {ms(cold['first_load'])}, "
+            f"first interaction {ms(cold['first_interaction'])}"
+        )
+        if not warmup.stages:
+            st.caption("Warm-up is off (PROPOSAL_WARMUP).")
+            return
+        st.caption(f"Warm-up {'finished in ' + ms(warmup.seconds) if warmup.done else 'running'}")
+        st.dataframe(pd.DataFrame(warmup.report()), hide_index=True, use_container_width=True)
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
-def main():
+def render_app(profile=NULL_PROFILE):
+    rehydrate_session()
     init_proposal_state()
+    count_rerun()
+    render_session_controls()
+    render_revision_history()
 
     total_cost = compute_total_proposal_cost()
-    _, total_col = st.columns([5, 2])
+    save_col, _, total_col = st.columns([1.5, 3.5, 2])
+    with save_col:
+        # Secondary buttons inside column blocks are hidden by static/theme.css.
+        save_clicked = st.button("Save Proposal", type="primary", use_container_width=True, key="save_proposal")
     with total_col:
         st.markdown(
             f"<div class='total-proposal-badge'>Total Proposal Cost: {format_currency(total_cost)}</div>",
             unsafe_allow_html=True,
         )
 
+    # Filled at the end of the run, after a save in this run has been checked.
+    issues_slot = st.empty()
+
     tabs = st.tabs(["Project Info", "Project Understanding", "Scope of Services", "Permitting & Summary", "Invoice & Billing"])
 
-    with tabs[0]:
-        render_tab1()
-    with tabs[1]:
-        render_tab2()
-    with tabs[2]:
-        render_tab3()
-    with tabs[3]:
-        render_tab4()
-    with tabs[4]:
-        render_tab5()
+    tracer = get_tracer()
+    for tab, render in zip(tabs, (render_tab1, render_tab2, render_tab3, render_tab4, render_tab5)):
+        with tab, tracer.span(render.__name__, cat="render"), profile.section(render.__name__):
+            render()
+
+    render_proposal_search()
+    render_portfolio_query()
+    if is_admin():
+        render_admin_sessions()
+        render_admin_cache()
+        render_admin_rate_limit()
+        render_admin_lookup_queue()
+        render_admin_rate_card()
+        render_admin_rules()
+        render_admin_warmup()
+        st.sidebar.toggle("Show rerun waterfall", key="trace_waterfall")
+        st.sidebar.toggle("Profile reruns (cProfile)", key="profile_reruns")
+        if st.session_state.get("profile_reruns"):
+            st.sidebar.toggle("Write .prof files", key="profile_dump")
+    # Saved after the tabs so this run's edits are included.
+    if save_clicked:
+        with tracer.span("save_current_proposal"):
+            save_current_proposal()
+        st.toast("Proposal saved.")
+    issues = st.session_state.get("consistency_issues")
+    if issues:
+        with issues_slot.container():
+            render_consistency_issues(issues)
+    record_revision()
+
+def render_trace_waterfall(events: List[Dict[str, Any]]):
+    rows = waterfall_rows(events)
+    with st.expander(f"Rerun waterfall ({len(rows)} spans)", expanded=True):
+        if not rows:
+            st.caption("No spans recorded in this rerun.")
+            return
+        frame = pd.DataFrame(rows)
+        chart = alt.Chart(frame).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since rerun start"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=None, title=None),
+            color=alt.Color("depth:O", legend=None),
+            tooltip=["span", "start_ms", "duration_ms"],
+        )
+        st.altair_chart(chart, use_container_width=True)
+        st.dataframe(frame.drop(columns=["depth"]), hide_index=True, use_container_width=True)
+
+@st.cache_resource(show_spinner=False)
+def _report_widget_count_unavailable() -> bool:
+    # Cached so the warning is logged once per process, not once per rerun.
+    logging.getLogger(__name__).warning(
+        "Rerun profiles will count 0 widgets: Streamlit %s has no ScriptRunContext.shared.widget_ids_this_run",
+        st.__version__,
+    )
+    return True
+
+def widgets_this_run() -> int:
+    # Private Streamlit state (checked against 1.66); profiling only, so a
+    # missing attribute costs the widget count, not the run.
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return 0
+    ids = getattr(getattr(ctx, "shared", None), "widget_ids_this_run", None)
+    if not callable(getattr(ids, "snapshot", None)):
+        _report_widget_count_unavailable()
+        return 0
+    return len(ids.snapshot())
+
+def track_rerun_cascade(seconds: float, rerun: Optional[RerunException] = None) -> Optional[Dict[str, Any]]:
+    """Add up runs that end in st.rerun(); the run that settles gets the whole cascade back."""
+    pending = st.session_state.get("rerun_cascade")
+    if rerun is not None:
+        if pending is None:
+            frames = [f for f in traceback.extract_tb(rerun.__traceback__) if f.filename == __file__]
+            names = [f.name for f in frames]
+            callers = names[names.index("render_app") + 1:-1] if "render_app" in names else []
+            origin = " > ".join(callers + [f"{frames[-1].name}:{frames[-1].lineno}"]) if frames else "unknown"
+            pending = {"origin": origin, "runs": 0, "seconds": 0.0}
+        pending["runs"] += 1
+        pending["seconds"] += seconds
+        st.session_state["rerun_cascade"] = pending
+        return None
+    if pending is None:
+        return None
+    del st.session_state["rerun_cascade"]
+    return dict(pending, runs=pending["runs"] + 1, seconds=pending["seconds"] + seconds)
+
+def render_rerun_profile(profile: RerunProfile, cascade: Optional[Dict[str, Any]]):
+    with st.expander(f"Rerun profile ({profile.seconds * 1000:.0f} ms under cProfile)", expanded=True):
+        if cascade:
+            st.caption(
+                f"This run settled an st.rerun() cascade started at {cascade['origin']}: "
+                f"{cascade['runs']} runs, {cascade['seconds'] * 1000:.0f} ms in total."
+            )
+        rows = [
+            {
+                "section": name,
+                "ms": round(profile.section_seconds[name] * 1000, 1),
+                "widgets": profile.section_counts[name].get("widgets", 0),
+            }
+            for name in profile.sections
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        options = ["whole rerun"] + profile.sections
+        choice = st.selectbox("Top functions by cumulative time", options, key="profile_section")
+        section = None if choice == "whole rerun" else choice
+        st.dataframe(pd.DataFrame(profile.top(section, limit=25)), hide_index=True, use_container_width=True)
+        st.download_button(
+            f"Download {section or 'rerun'}.prof",
+            profile.to_bytes(section),
+            file_name=f"{section or 'rerun'}.prof",
+            mime="application/octet-stream",
+            on_click="ignore",
+            key="profile_download",
+        )
+        if st.session_state.get("profile_dump"):
+            ctx = get_script_run_ctx()
+            session = re.sub(r"\W", "", ctx.session_id)[:8] if ctx is not None else "bare"
+            directory = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{session}"
+            profile.dump(directory)
+            st.caption(f"Wrote {len(profile.sections) + 1} .prof files to {directory}")
+
+def main():
+    get_metrics_server()
+    APP_RERUNS.inc()
+    started = time.perf_counter()
+    interaction = "rerun_stats" in st.session_state
+    tracer = get_tracer()
+    admin = is_admin()
+    show_waterfall = admin and bool(st.session_state.get("trace_waterfall"))
+    profiling = admin and bool(st.session_state.get("profile_reruns"))
+    profile = RerunProfile(counters={"widgets": widgets_this_run}) if profiling else NULL_PROFILE
+    if show_waterfall or tracer.directory is not None:
+        tracer.begin_run()
+    try:
+        with tracer.span("rerun", cat="rerun"), profile.running():
+            render_app(profile)
+    except RerunException as e:
+        if profiling:
+            track_rerun_cascade(time.perf_counter() - started, e)
+        raise
+    finally:
+        # st.rerun() leaves through here too; its spans and timing are still recorded.
+        events = tracer.end_run()
+        elapsed = time.perf_counter() - started
+        APP_RERUN_SECONDS.observe(elapsed)
+        get_cold_start().observe(elapsed, interaction)
+        # Started after the first run so the first page load does not wait on them.
+        get_warmup()
+        get_lookup_replayer()
+    if show_waterfall:
+        render_trace_waterfall(events)
+    if profiling:
+        render_rerun_profile(profile, track_rerun_cascade(elapsed))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,95 @@
+"""
+Time to first interaction on a fresh worker, with and without warm-up.
+
+Each trial starts a new process and runs app.py under AppTest. It records
+the first page load, waits --think-time seconds the way a person reads the
+page, then looks up a parcel in Tab 1. That parcel is the one on the most
+recently saved proposal, so the warm-up's "parcels" stage has something to
+preload. Lookups go to the same local pcpao.gov stand-in as
+load_sessions.py. Usage:
+
+    python benchmarks/cold_start.py [--repeats 3] [--think-time 3]
+                                    [--stub-latency-ms 150]
+"""
+
+import argparse
+import multiprocessing
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from load_sessions import APP_PATH, start_pcpao_stub, stub_parcel_id  # noqa: E402
+
+MODES = {"off": "off", "on": "jurisdiction,parsers,templates,connections,parcels"}
+
+
+def run_trial(think_time: float) -> Dict[str, float]:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=120)
+    started = time.perf_counter()
+    at.run()
+    first_load = time.perf_counter() - started
+    time.sleep(think_time)
+    next(w for w in at.text_input if w.label == "Parcel ID").set_value(stub_parcel_id(0))
+    started = time.perf_counter()
+    at.button(key="lookup_property").click().run()
+    first_interaction = time.perf_counter() - started
+    errors = [e.value for e in at.exception]
+    if errors or not at.session_state["proposal"]["intake"].get("address"):
+        raise RuntimeError(f"lookup failed: {errors}")
+    return {"first_load": first_load, "first_interaction": first_interaction}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--think-time", type=float, default=3.0, help="Seconds between page load and the first click")
+    parser.add_argument("--stub-latency-ms", type=float, default=150.0)
+    args = parser.parse_args(argv)
+
+    from proposal_store import ProposalStore
+
+    stub = start_pcpao_stub(args.stub_latency_ms / 1000)
+    results = {mode: [] for mode in MODES}
+    for _ in range(args.repeats):
+        for mode, stages in MODES.items():
+            work = pathlib.Path(tempfile.mkdtemp(prefix="cold-start-"))
+            ProposalStore(str(work / "proposals.db")).save(
+                "recent", {"intake": {"county": "Pinellas", "parcel_id": stub_parcel_id(0)}}
+            )
+            os.environ.update({
+                "PROPOSAL_WARMUP": stages,
+                "PCPAO_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}",
+                "PCPAO_RATE_PER_SECOND": "1000",
+                "PCPAO_RATE_BURST": "1000",
+                "PCPAO_RATE_STATE_PATH": str(work / "pcpao_rate.json"),
+                "PROPOSAL_STORE_PATH": str(work / "proposals.db"),
+                "PROPOSAL_CACHE_PATH": str(work / "cache.db"),
+                "SESSION_SPILL_DIR": str(work / "session_spill"),
+                "RESPONSE_ARCHIVE_DIR": str(work / "response_archive"),
+                "PROPOSAL_METRICS_PORT": "0",
+            })
+            # A new spawned process per trial, so every run starts cold.
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                results[mode].append(pool.apply(run_trial, (args.think_time,)))
+    stub.shutdown()
+
+    print(f"{'warm-up':<10}{'first load ms':>15}{'first interaction ms':>22}")
+    for mode, trials in results.items():
+        load = statistics.median(t["first_load"] for t in trials) * 1000
+        interaction = statistics.median(t["first_interaction"] for t in trials) * 1000
+        print(f"{mode:<10}{load:>15.0f}{interaction:>22.0f}")
+    print(f"(medians of {args.repeats} fresh processes each, {args.think_time:g} s between load and click)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Consistency rules on save and across the stored portfolio.
+
+Fills a temporary store with --proposals saved proposals, a known share of
+them with planted contradictions (Task 310 hours over the task total, a
+FEMA permit with the no-floodplain-compensation assumption, Task 150 text
+naming Tampa agencies for a Pasco site), and times:
+
+- the per-save check (scope_text and total fee as the app passes them),
+  as p50/p99 over every seeded proposal
+- proposal_rules.scan() with one worker and with --workers
+
+Both scans must report exactly the violations the in-process check found,
+and each planted contradiction must be reported for exactly the proposals
+it was planted in. Usage:
+
+    python benchmarks/consistency_scan.py [--proposals 20000] [--workers N]
+"""
+
+import argparse
+import copy
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from regression import _full_proposal, _import_app  # noqa: E402
+
+PLANTED = {
+    "task_310_hours_over_total": 3,
+    "flood_permit_vs_no_flood_comp": 4,
+    "task_150_other_county": 5,
+}
+
+
+def plant(proposal: dict, i: int) -> None:
+    if i % PLANTED["task_310_hours_over_total"] == 0:
+        proposal["scope"]["selected_tasks"]["310"]["total_hours"] = 10
+    if i % PLANTED["flood_permit_vs_no_flood_comp"] == 0:
+        proposal["project"]["assumptions_checked"]["assump_no_flood_comp"] = True
+    if i % PLANTED["task_150_other_county"] == 0:
+        proposal["intake"]["county"] = "Pasco"
+
+
+def scan_all(proposal_rules, db: str, workers) -> tuple:
+    started = time.perf_counter()
+    found, total = set(), 0
+    for checked, violations in proposal_rules.scan(db, proposal_rules.DEFAULT_RULES_PATH, workers=workers):
+        total += checked
+        found.update((v["proposal"], v["rule"], v["message"]) for v in violations)
+    return total, found, time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--proposals", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    app = _import_app()
+    import proposal_rules
+    from proposal_store import ProposalStore
+
+    db = str(pathlib.Path(app.PROPOSAL_STORE_PATH).parent / "rules.db")
+    store = ProposalStore(db)
+    rules = app.get_proposal_rules()
+    base = _full_proposal(app)
+    base["scope"]["selected_tasks"]["310"]["total_hours"] = 500
+    base["project"]["assumptions_checked"] = {"assump_no_flood_comp": False}
+    # Task 150's agency text is written for Hillsborough; Pinellas would trip the rule everywhere.
+    base["intake"]["county"] = "Hillsborough"
+
+    expected, timings = set(), []
+    started = time.perf_counter()
+    for i in range(args.proposals):
+        proposal = copy.deepcopy(base)
+        proposal["meta"] = {"proposal_id": f"bench-{i}"}
+        plant(proposal, i)
+        app.st.session_state.proposal = proposal
+        total_fee = app.compute_total_proposal_cost()
+        scope_text = app.generated_scope_text(proposal)
+        store.save(
+            f"bench-{i}", proposal, total_fee=total_fee, scope_text=scope_text, **app.encode_selections(proposal)
+        )
+        check_started = time.perf_counter()
+        violations = rules.check(proposal, scope_text=scope_text, total_fee=total_fee)
+        timings.append(time.perf_counter() - check_started)
+        expected.update((f"bench-{i}", v["rule"], v["message"]) for v in violations)
+    print(f"seeded {args.proposals} proposals in {time.perf_counter() - started:.1f} s")
+    timings.sort()
+    print(
+        f"check on save: p50 {statistics.median(timings) * 1e6:.0f} us, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} us ({len(rules)} rules)"
+    )
+
+    failures = []
+    for label, workers in (("1 worker", 1), ("parallel", args.workers)):
+        total, found, seconds = scan_all(proposal_rules, db, workers)
+        print(f"scan ({label}): {total} proposals in {seconds:.2f} s ({total / seconds:,.0f}/s), {len(found)} violations")
+        if total != args.proposals:
+            failures.append(f"{label} scan checked {total} of {args.proposals} proposals")
+        if found != expected:
+            failures.append(f"{label} scan differs from the save-time check: {len(found ^ expected)} violations")
+
+    for rule_id, every in PLANTED.items():
+        flagged = {proposal_id for proposal_id, rule, _ in expected if rule == rule_id}
+        planted = {f"bench-{i}" for i in range(0, args.proposals, every)}
+        if flagged != planted:
+            failures.append(f"{rule_id}: flagged {len(flagged)} proposals, planted in {len(planted)}")
+    for failure in failures:
+        print(f"error: {failure}")
+    print("scan matches the save-time check and the planted contradictions" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Concurrent-session load benchmark for app.py.
+
+Drives the app headlessly with Streamlit's AppTest through a scripted
+session: first load, a Tab 1 parcel lookup against a local pcpao.gov
+stand-in, task selection in Tab 3, permit toggles in Tab 4 and invoice
+edits that redraw the Tab 5 preview. Usage:
+
+    python benchmarks/load_sessions.py [--sessions 8] [--workers 4]
+                                       [--rounds 3] [--stub-latency-ms 150]
+                                       [--json results.json]
+
+AppTest swaps a process-global Runtime in and out around each run, so
+sessions cannot share a process concurrently. Each worker process instead
+serves its share of the sessions interleaved step by step, the way one
+Streamlit server interleaves reruns under the GIL, and the workers run in
+parallel like server processes behind a load balancer. They share the
+SQLite cache and rate limiter state as production workers do.
+
+Reported per interaction: rerun latency percentiles (wall time of the
+interaction, including any st.rerun() it triggers) and CPU per rerun
+(process CPU time, exact since a worker runs one rerun at a time). Per
+session: session_state footprint and the worker's RSS growth divided by
+its sessions.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+APP_PATH = pathlib.Path(__file__).resolve().parent.parent / "app.py"
+sys.path.insert(0, str(APP_PATH.parent))
+
+TASKS = ("110", "150", "210")
+PERMITS = ("permit_fdot_driveway", "permit_fema", "permit_floodplain")
+
+
+# -----------------------------------------------------------------------------
+# pcpao.gov stand-in
+# -----------------------------------------------------------------------------
+def stub_parcel_id(n: int) -> str:
+    return f"19-31-17-{73166 + n:05d}-001-0010"
+
+
+def start_pcpao_stub(latency: float) -> ThreadingHTTPServer:
+    """Serve quicksearch JSON and a details page shaped like pcpao.gov's, after `latency` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, body: bytes, content_type: str) -> None:
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            form = self.rfile.read(length).decode("utf-8")
+            parcel = next((v for k, _, v in (p.partition("=") for p in form.split("&")) if k == "input"), "")
+            row = [
+                "", f"<a>{parcel}</a>", "<span>BENCHMARK HOLDINGS LLC</span>", "", "",
+                "<span>100 CENTRAL AVE</span>", "SP", "1130 Stores, One Story",
+                "LOT 1 BLOCK 2 BENCHMARK SUB", "", "",
+            ]
+            body = json.dumps({"draw": 1, "recordsTotal": 1, "recordsFiltered": 1, "data": [row]})
+            self._reply(body.encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            html = (
+                "<html><body><div>Site Address 100 CENTRAL AVE ST PETERSBURG FL 33701</div>"
+                "<div>Land Area: &asymp; 21,780 sf | &asymp; 0.50 acres</div></body></html>"
+            )
+            self._reply(html.encode("utf-8"), "text/html; charset=utf-8")
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -----------------------------------------------------------------------------
+# Session script
+# -----------------------------------------------------------------------------
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _by_label(widgets, label: str):
+    return next(w for w in widgets if w.label == label)
+
+
+def session_steps(session: int, rounds: int) -> List[tuple]:
+    """(interaction name, action(at)) pairs for one simulated user."""
+    steps = [("first_load", lambda at: at.run())]
+
+    def lookup(at):
+        _by_label(at.text_input, "Parcel ID").set_value(stub_parcel_id(session))
+        at.button(key="lookup_property").click().run()
+
+    steps.append(("lookup", lookup))
+    for r in range(rounds):
+        on = r % 2 == 0
+        for task in TASKS:
+            steps.append(("task_select", lambda at, task=task, on=on: at.checkbox(key=f"check_{task}").set_value(on).run()))
+        steps.append(("task_fee", lambda at, r=r: at.text_input(key="fee_110").input(f"{40000 + 1000 * r}").run()))
+        for permit in PERMITS:
+            steps.append(("permit_toggle", lambda at, permit=permit, on=on: at.checkbox(key=permit).set_value(on).run()))
+        steps.append((
+            "tab5_preview",
+            lambda at, r=r: _by_label(at.text_input, "Invoice Email Address").input(f"ap{r}@example.com").run(),
+        ))
+    return steps
+
+
+def run_worker(args) -> Dict[str, Any]:
+    sessions, rounds = args
+    from streamlit.testing.v1 import AppTest
+    from session_spill import session_footprint
+
+    # One unmeasured run loads the app's imports and shared resources, as in a running server.
+    warm = AppTest.from_file(str(APP_PATH), default_timeout=120).run()
+    errors: List[str] = [f"warm-up: {e.value}" for e in warm.exception]
+    rss_before = _rss_bytes()
+    apps = {s: AppTest.from_file(str(APP_PATH), default_timeout=120) for s in sessions}
+    scripts = {s: session_steps(s, rounds) for s in sessions}
+    samples: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    for i in range(max(len(steps) for steps in scripts.values())):
+        for s in sessions:
+            if i >= len(scripts[s]):
+                continue
+            name, action = scripts[s][i]
+            at = apps[s]
+            cpu, wall = time.process_time(), time.perf_counter()
+            try:
+                action(at)
+            except Exception as e:
+                errors.append(f"session {s} {name}: {type(e).__name__}: {e}")
+                continue
+            samples.append({
+                "interaction": name,
+                "seconds": time.perf_counter() - wall,
+                "cpu_seconds": time.process_time() - cpu,
+            })
+            errors.extend(f"session {s} {name}: {e.value}" for e in at.exception)
+    active = time.perf_counter() - started
+    footprints = [session_footprint(at.session_state)["total"] for at in apps.values()]
+    if apps:
+        at = next(iter(apps.values()))
+        if not at.session_state["proposal"]["intake"].get("address"):
+            errors.append("lookup did not fill the address; is PCPAO_BASE_URL reaching the stand-in?")
+    return {
+        "samples": samples,
+        "errors": errors,
+        "state_bytes": footprints,
+        "rss_growth_bytes": max(_rss_bytes() - rss_before, 0),
+        "sessions": len(sessions),
+        "active_seconds": active,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Report
+# -----------------------------------------------------------------------------
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Workers start together once imports are done; the slowest one bounds the run.
+    wall_seconds = max(result["active_seconds"] for result in results)
+    samples = [sample for result in results for sample in result["samples"]]
+    interactions: Dict[str, Dict[str, float]] = {}
+    for name in dict.fromkeys(sample["interaction"] for sample in samples):
+        seconds = [s["seconds"] for s in samples if s["interaction"] == name]
+        cpu = [s["cpu_seconds"] for s in samples if s["interaction"] == name]
+        interactions[name] = {
+            "count": len(seconds),
+            "p50_ms": percentile(seconds, 50) * 1000,
+            "p90_ms": percentile(seconds, 90) * 1000,
+            "p99_ms": percentile(seconds, 99) * 1000,
+            "max_ms": max(seconds) * 1000,
+            "cpu_ms_per_rerun": sum(cpu) / len(cpu) * 1000,
+        }
+    sessions = sum(result["sessions"] for result in results)
+    state = [size for result in results for size in result["state_bytes"]]
+    return {
+        "sessions": sessions,
+        "workers": len(results),
+        "reruns": len(samples),
+        "wall_seconds": wall_seconds,
+        "reruns_per_second": len(samples) / wall_seconds if wall_seconds else 0.0,
+        "interactions": interactions,
+        "state_kb_per_session": sum(state) / len(state) / 1024 if state else 0.0,
+        "rss_mb_per_session": sum(r["rss_growth_bytes"] for r in results) / sessions / 2**20 if sessions else 0.0,
+        "errors": [error for result in results for error in result["errors"]],
+    }
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(
+        f"{summary['sessions']} sessions on {summary['workers']} workers: "
+        f"{summary['reruns']} reruns in {summary['wall_seconds']:.1f} s "
+        f"({summary['reruns_per_second']:.1f} reruns/s)"
+    )
+    print(f"{'interaction':<15}{'n':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'cpu ms':>10}")
+    for name, row in summary["interactions"].items():
+        print(
+            f"{name:<15}{row['count']:>6}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}{row['cpu_ms_per_rerun']:>10.1f}"
+        )
+    print(f"session_state per session: {summary['state_kb_per_session']:.1f} KB")
+    print(f"worker RSS growth per session: {summary['rss_mb_per_session']:.1f} MB")
+    for error in summary["errors"][:10]:
+        print(f"error: {error}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--rounds", type=int, default=3, help="Tab 3/4/5 edit rounds per session")
+    parser.add_argument("--stub-latency-ms", type=float, default=150.0, help="pcpao.gov stand-in response delay")
+    parser.add_argument("--json", type=pathlib.Path, help="Also write the summary here")
+    args = parser.parse_args(argv)
+
+    stub = start_pcpao_stub(args.stub_latency_ms / 1000)
+    work = pathlib.Path(tempfile.mkdtemp(prefix="load-sessions-"))
+    os.environ.update({
+        "PCPAO_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}",
+        "PCPAO_RATE_PER_SECOND": "1000",
+        "PCPAO_RATE_BURST": "1000",
+        "PCPAO_RATE_STATE_PATH": str(work / "pcpao_rate.json"),
+        "PROPOSAL_STORE_PATH": str(work / "proposals.db"),
+        "PROPOSAL_CACHE_PATH": str(work / "cache.db"),
+        "SESSION_SPILL_DIR": str(work / "session_spill"),
+        "RESPONSE_ARCHIVE_DIR": str(work / "response_archive"),
+        "PROPOSAL_METRICS_PORT": "0",
+    })
+
+    workers = max(1, min(args.workers, args.sessions))
+    shares = [(list(range(w, args.sessions, workers)), args.rounds) for w in range(workers)]
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.map(run_worker, shares)
+    summary = summarize(results)
+    stub.shutdown()
+
+    print_report(summary)
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
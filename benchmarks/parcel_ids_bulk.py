@@ -0,0 +1,106 @@
+"""
+Bulk parcel ID conversion throughput, checked against the scalar path.
+
+Generates random parcel IDs for each county in the spellings a bulk extract
+contains (dashed, compact, other separators, padded, mistyped), converts
+them with parcel_ids.bulk_convert() to every form and reports rows per
+second. A random sample of every run is also converted one by one with
+parcel_ids.convert() and must match, and every valid ID must survive a
+display -> strap -> display round trip. Usage:
+
+    python benchmarks/parcel_ids_bulk.py [--rows 1000000] [--check 20000] [--seed 0]
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import parcel_ids  # noqa: E402
+
+SPELLINGS = ("display", "compact", "spaced", "dotted", "padded", "mistyped", "short")
+
+
+def random_ids(fmt: parcel_ids.ParcelFormat, rows: int, rng: np.random.Generator) -> np.ndarray:
+    digits = rng.integers(0, 10, size=(rows, fmt.width)).astype(str)
+    segments, start = [], 0
+    for width in fmt.widths:
+        segments.append(np.array(["".join(row) for row in digits[:, start:start + width]]))
+        start += width
+    kinds = rng.integers(0, len(SPELLINGS), size=rows)
+    out = np.empty(rows, dtype=object)
+    for i in range(rows):
+        parts = [segment[i] for segment in segments]
+        kind = SPELLINGS[kinds[i]]
+        if kind == "compact":
+            out[i] = "".join(parts)
+        elif kind == "spaced":
+            out[i] = " ".join(parts)
+        elif kind == "dotted":
+            out[i] = ".".join(parts)
+        elif kind == "padded":
+            out[i] = f"  {'-'.join(parts)}\t"
+        elif kind == "mistyped":
+            text = "-".join(parts)
+            at = int(rng.integers(0, len(text)))
+            out[i] = text[:at] + "x" + text[at + 1:]
+        elif kind == "short":
+            out[i] = "-".join(parts)[:-1]
+        else:
+            out[i] = "-".join(parts)
+    return out
+
+
+def check(fmt: parcel_ids.ParcelFormat, ids: np.ndarray, sample: np.ndarray) -> int:
+    """Mismatches between bulk_convert() and convert() on the sampled rows."""
+    mismatches = 0
+    for to in parcel_ids.FORMS:
+        converted, valid = parcel_ids.bulk_convert(ids[sample], fmt.county, to)
+        for text, value, ok in zip(ids[sample], converted, valid):
+            try:
+                expected = parcel_ids.convert(text, fmt.county, to)
+            except parcel_ids.InvalidParcelId:
+                expected = ""
+            if value != expected or ok != bool(expected):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  mismatch {fmt.county} {to}: {text!r} bulk={value!r} scalar={expected!r}")
+    display, valid = parcel_ids.bulk_convert(ids[sample], fmt.county, "display")
+    strap, _ = parcel_ids.bulk_convert(display[valid], fmt.county, "strap")
+    back, _ = parcel_ids.bulk_convert(strap, fmt.county, "display", source="strap")
+    mismatches += int(np.count_nonzero(back != display[valid]))
+    return mismatches
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="IDs per county")
+    parser.add_argument("--check", type=int, default=20_000, help="Rows per county also converted one by one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+    print(f"{'county':<14}{'form':<12}{'rows':>10}{'valid':>10}{'seconds':>10}{'rows/s':>14}")
+    for fmt in parcel_ids.FORMATS.values():
+        ids = random_ids(fmt, args.rows, rng)
+        for to in parcel_ids.FORMS:
+            started = time.perf_counter()
+            _, valid = parcel_ids.bulk_convert(ids, fmt.county, to)
+            seconds = time.perf_counter() - started
+            print(
+                f"{fmt.county:<14}{to:<12}{len(ids):>10}{int(valid.sum()):>10}"
+                f"{seconds:>10.2f}{len(ids) / seconds:>14,.0f}"
+            )
+        sample = rng.choice(len(ids), size=min(args.check, len(ids)), replace=False)
+        failures += check(fmt, ids, sample)
+    print("bulk and scalar conversion agree" if not failures else f"{failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
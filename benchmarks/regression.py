@@ -0,0 +1,335 @@
+"""
+Micro-benchmarks with a stored baseline and a regression gate.
+
+Times the hot paths behind a lookup and a rerun, all offline:
+
+- pcpao_parse: extract_record over a quicksearch response and details page
+- total_proposal_cost: compute_total_proposal_cost on a full proposal
+- task_310_grid: building, costing and storing the Task 310 grid
+- tab5_scope_render: render_tab5 (Streamlit bare mode) plus the plain-text
+  scope used for search
+- proposal_rules: the consistency rules run on every save
+
+Usage:
+
+    python benchmarks/regression.py --update          # record the baseline
+    python benchmarks/regression.py                   # compare, exit 1 on regression
+    python benchmarks/regression.py --threshold 15 --threshold pcpao_parse=25
+
+Each benchmark is timed as --samples samples of a loop calibrated to take
+at least --min-time seconds. A benchmark counts as a regression only if its
+median per-call time is more than its threshold slower than the baseline
+median AND a one-sided Mann-Whitney U test on the two sample sets says the
+slowdown is significant (p < --alpha). Suspected regressions are measured
+again and must fail twice, which filters out one-off noise such as another
+process taking the CPU.
+
+The baseline file has a format version and records the machine, Python
+version and git commit it was taken on. Timings are only comparable on
+the same machine, so record the baseline where the gate runs.
+"""
+
+import argparse
+import json
+import math
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = pathlib.Path(__file__).resolve().parent / "baseline.json"
+
+
+# -----------------------------------------------------------------------------
+# Benchmarks
+# -----------------------------------------------------------------------------
+def _import_app():
+    """Import app.py in Streamlit bare mode, with its state files in a scratch directory."""
+    work = pathlib.Path(tempfile.mkdtemp(prefix="regression-"))
+    for name, value in {
+        "PROPOSAL_STORE_PATH": work / "proposals.db",
+        "PROPOSAL_CACHE_PATH": work / "cache.db",
+        "PROPOSAL_CACHE_BACKEND": "lru",
+        "SESSION_SPILL_DIR": work / "session_spill",
+        "RESPONSE_ARCHIVE_DIR": "",
+        "PCPAO_RATE_STATE_PATH": work / "pcpao_rate.json",
+        "PROPOSAL_METRICS_PORT": "0",
+    }.items():
+        os.environ[name] = str(value)
+    import app
+    from streamlit.logger import set_log_level
+
+    # Bare mode warns about the missing script run context on every st call.
+    set_log_level("error")
+    return app
+
+
+def _full_proposal(app) -> Dict[str, Any]:
+    app.init_proposal_state()
+    proposal = app.st.session_state.proposal
+    selected = {
+        num: {"name": task["name"], "fee": task["amount"]}
+        for num, task in app.DEFAULT_FEES.items()
+    }
+    frame = app.task_310_frame({key: {"hours": 12} for key, *_ in app.TASK_310_SERVICES})
+    selected["310"]["services"] = app.task_310_services(frame)
+    selected["310"]["services_total_cost"] = int(frame["cost"].astype(int).sum())
+    proposal["scope"]["selected_tasks"] = selected
+    permits = proposal["permits"]
+    permits["permit_flags"] = {key: True for key, *_ in app.PERMIT_REGISTRY}
+    services = [label for _, label, *_ in app.ADDITIONAL_SERVICES_LIST]
+    permits["included_additional_services_with_fees"] = {label: 5000 for label in services[::2]}
+    permits["excluded_additional_services"] = services[1::2]
+    proposal["intake"]["county"] = "Pinellas"
+    proposal["invoice"].update({"invoice_email": "ap@example.com", "kh_signer_name": "A. Engineer"})
+    return proposal
+
+
+def bench_pcpao_parse() -> Callable[[], Any]:
+    import pcpao
+
+    row = [
+        "", "<a href='#'>19-31-17-73166-001-0010</a>", "<span class='owner'>BENCHMARK HOLDINGS LLC</span>",
+        "", "", "<span>100 CENTRAL AVE</span>", "SP", "1130 Stores, One Story",
+        "<div>LOT 1 BLOCK 2 BENCHMARK SUBDIVISION PB 12 PG 34</div>", "", "",
+    ]
+    data = {"draw": 1, "recordsTotal": 1, "recordsFiltered": 1, "data": [row]}
+    # The live details page is mostly valuation and sales history tables.
+    history = "".join(
+        f"<tr><td>{2000 + i}</td><td>${150000 + 1000 * i:,}</td><td>${90000 + 800 * i:,}</td><td>Q</td></tr>"
+        for i in range(200)
+    )
+    html = (
+        "<html><body><div id='site'>100 CENTRAL AVE ST PETERSBURG FL 33701</div>"
+        f"<table>{history}</table>"
+        "<div>Land Area: &asymp; 21,780 sf | &asymp; 0.50 acres</div>"
+        f"<table>{history}</table></body></html>"
+    )
+    return lambda: pcpao.extract_record("19-31-17-73166-001-0010", data, html)
+
+
+def bench_total_proposal_cost() -> Callable[[], Any]:
+    app = _import_app()
+    _full_proposal(app)
+    return app.compute_total_proposal_cost
+
+
+def bench_task_310_grid() -> Callable[[], Any]:
+    app = _import_app()
+    services = _full_proposal(app)["scope"]["selected_tasks"]["310"]["services"]
+
+    def run():
+        frame = app.compute_task_310_costs(app.task_310_frame(services))
+        return app.task_310_services(frame), int(frame["cost"].astype(int).sum())
+
+    return run
+
+
+def bench_tab5_scope_render() -> Callable[[], Any]:
+    app = _import_app()
+    proposal = _full_proposal(app)
+
+    def run():
+        app.render_tab5()
+        return app.generated_scope_text(proposal)
+
+    return run
+
+
+def bench_proposal_rules() -> Callable[[], Any]:
+    app = _import_app()
+    proposal = _full_proposal(app)
+    rules = app.get_proposal_rules()
+    scope_text = app.generated_scope_text(proposal)
+    total_fee = app.compute_total_proposal_cost()
+    return lambda: rules.check(proposal, scope_text=scope_text, total_fee=total_fee)
+
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {
+    "pcpao_parse": bench_pcpao_parse,
+    "total_proposal_cost": bench_total_proposal_cost,
+    "task_310_grid": bench_task_310_grid,
+    "tab5_scope_render": bench_tab5_scope_render,
+    "proposal_rules": bench_proposal_rules,
+}
+
+
+# -----------------------------------------------------------------------------
+# Measurement
+# -----------------------------------------------------------------------------
+def measure(fn: Callable[[], Any], samples: int, min_time: float) -> List[float]:
+    """Per-call seconds for `samples` timed loops of at least min_time each."""
+    fn()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, math.ceil(min_time / elapsed)))
+    out = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        out.append((time.perf_counter() - started) / loops)
+    return out
+
+
+def mann_whitney_greater(new: List[float], old: List[float]) -> float:
+    """One-sided p-value that `new` tends to be larger than `old` (normal approximation, tie-corrected)."""
+    combined = sorted([(v, 0) for v in new] + [(v, 1) for v in old])
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    n1, n2 = len(new), len(old)
+    r1 = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "median": statistics.median(samples),
+        "iqr": quartiles[2] - quartiles[0],
+        "min": min(samples),
+        "samples": samples,
+    }
+
+
+def compare(name: str, new: List[float], old: Dict[str, Any], threshold: float, alpha: float) -> Dict[str, Any]:
+    change = statistics.median(new) / old["median"] - 1 if old["median"] else 0.0
+    p = mann_whitney_greater(new, old["samples"])
+    return {
+        "benchmark": name,
+        "baseline_us": old["median"] * 1e6,
+        "current_us": statistics.median(new) * 1e6,
+        "change": change,
+        "p": p,
+        "regressed": change > threshold and p < alpha,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Baseline file
+# -----------------------------------------------------------------------------
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def load_baseline(path: pathlib.Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    baseline = json.loads(path.read_text())
+    if baseline.get("version") != BASELINE_VERSION:
+        raise SystemExit(f"{path} has baseline format {baseline.get('version')}, expected {BASELINE_VERSION}; re-record it with --update")
+    return baseline
+
+
+def save_baseline(path: pathlib.Path, results: Dict[str, List[float]]) -> None:
+    path.write_text(json.dumps({
+        "version": BASELINE_VERSION,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "benchmarks": {name: summarize(samples) for name, samples in results.items()},
+    }, indent=2))
+
+
+def _parse_thresholds(values: List[str]) -> Dict[str, float]:
+    thresholds = {"": 10.0}
+    for value in values:
+        name, _, pct = value.rpartition("=")
+        thresholds[name] = float(pct)
+    return thresholds
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update", action="store_true", help="Record the baseline instead of comparing")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument(
+        "--threshold", action="append", default=[], metavar="[NAME=]PCT",
+        help="Allowed median slowdown in percent (default 10); NAME=PCT sets one benchmark",
+    )
+    parser.add_argument("--alpha", type=float, default=0.01, help="Significance level for the Mann-Whitney test")
+    parser.add_argument("--samples", type=int, default=15)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per timed sample")
+    args = parser.parse_args(argv)
+    thresholds = _parse_thresholds(args.threshold)
+
+    names = args.only or list(BENCHMARKS)
+    fns = {name: BENCHMARKS[name]() for name in names}
+    results = {name: measure(fns[name], args.samples, args.min_time) for name in names}
+
+    baseline = None if args.update else load_baseline(args.baseline)
+    if baseline is None:
+        save_baseline(args.baseline, results)
+        for name, samples in results.items():
+            print(f"{name:<22}{statistics.median(samples) * 1e6:>12.1f} us")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    print(f"Baseline: {baseline['commit'] or '?'} on {baseline['machine']}, {baseline['recorded_at']}")
+    print(f"{'benchmark':<22}{'baseline us':>12}{'current us':>12}{'change':>9}{'p':>9}")
+    failed = []
+    for name in names:
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            print(f"{name:<22}{'-':>12}{statistics.median(results[name]) * 1e6:>12.1f}   (not in baseline)")
+            continue
+        threshold = thresholds.get(name, thresholds[""]) / 100
+        row = compare(name, results[name], old, threshold, args.alpha)
+        if row["regressed"]:
+            # Confirm with a fresh measurement before failing.
+            row = compare(name, measure(fns[name], args.samples, args.min_time), old, threshold, args.alpha)
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(
+            f"{name:<22}{row['baseline_us']:>12.1f}{row['current_us']:>12.1f}"
+            f"{row['change']:>+9.1%}{row['p']:>9.3f}{flag}"
+        )
+        if row["regressed"]:
+            failed.append(name)
+    if failed:
+        print(f"Slower than the baseline beyond the threshold: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
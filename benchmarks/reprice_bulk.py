@@ -0,0 +1,120 @@
+"""
+Bulk re-pricing of stored proposals onto a new rate card.
+
+Fills a temporary store with --proposals saved proposals priced on the
+current card (some with hand-entered fees and rates), appends a version that
+raises a task fee and the hourly rate and renames an additional service, then
+times `rate_card.reprice` as a dry run and with --apply. Afterwards every
+stored total_fee must equal app.compute_total_proposal_cost() of its body,
+hand-entered values must be untouched, the search index must hold the
+scope text of the re-priced body (renamed service included), and a second
+pass must find nothing left to change. Usage:
+
+    python benchmarks/reprice_bulk.py [--proposals 10000]
+"""
+
+import argparse
+import copy
+import json
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from regression import _full_proposal, _import_app  # noqa: E402
+
+
+def next_version(card: dict) -> dict:
+    card = copy.deepcopy(card)
+    card["version"] += 1
+    card["default_hourly_rate"] += 10
+    card["tasks"]["110"]["amount"] += 2000
+    for service in card["task_310"]["services"]:
+        if service["rate"]:
+            service["rate"] += 10
+    first = card["additional_services"][0]
+    first["name"] += " (revised)"
+    first["fee"] += 2000
+    return card
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--proposals", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    app = _import_app()
+    import rate_card
+    from proposal_store import ProposalStore
+
+    work = pathlib.Path(app.PROPOSAL_STORE_PATH).parent
+    store = ProposalStore(str(work / "reprice.db"))
+    base = _full_proposal(app)
+    first_service = app.ADDITIONAL_SERVICES_LIST[0][1]
+    base["permits"]["included_additional_services_with_fees"][first_service] = app.ADDITIONAL_SERVICES_LIST[0][3]
+    base["permits"]["included_additional_services"] = list(base["permits"]["included_additional_services_with_fees"])
+    started = time.perf_counter()
+    for i in range(args.proposals):
+        proposal = copy.deepcopy(base)
+        proposal["meta"] = {"proposal_id": f"bench-{i}", "rate_card_version": app.RATE_CARD.version}
+        if i % 2:
+            proposal["scope"]["selected_tasks"]["110"]["fee"] = 41234
+        if i % 5 == 0:
+            proposal["scope"]["selected_tasks"]["310"]["services"]["rfi"]["rate"] = 150.0
+        app.st.session_state.proposal = proposal
+        store.save(
+            proposal["meta"]["proposal_id"], proposal,
+            total_fee=app.compute_total_proposal_cost(), scope_text=app.generated_scope_text(proposal),
+            **app.encode_selections(proposal),
+        )
+    print(f"seeded {args.proposals} proposals in {time.perf_counter() - started:.1f} s")
+
+    doc = json.loads(app.RATE_CARD_PATH.read_text(encoding="utf-8"))
+    doc["versions"].append(next_version(doc["versions"][-1]))
+    card_path = work / "rate_card.json"
+    card_path.write_text(json.dumps(doc), encoding="utf-8")
+    cards = rate_card.load_rate_cards(card_path)
+
+    started = time.perf_counter()
+    changes, totals = rate_card.reprice(store, cards)
+    dry_run = time.perf_counter() - started
+    rate_card.print_summary(changes, totals, max(cards), applied=False)
+    started = time.perf_counter()
+    rate_card.reprice(store, cards, apply=True)
+    applied = time.perf_counter() - started
+    print(f"dry run {dry_run:.2f} s, apply {applied:.2f} s ({args.proposals / applied:,.0f} proposals/s)")
+
+    failures = []
+    for row in store.rows():
+        body = row["body"]
+        app.st.session_state.proposal = body
+        if app.compute_total_proposal_cost() != row["total_fee"]:
+            failures.append(f"{row['id']}: total_fee {row['total_fee']} != {app.compute_total_proposal_cost()}")
+        n = int(row["id"].rsplit("-", 1)[1])
+        tasks = body["scope"]["selected_tasks"]
+        if n % 2 and tasks["110"]["fee"] != 41234:
+            failures.append(f"{row['id']}: hand-entered Task 110 fee was re-priced")
+        if n % 5 == 0 and tasks["310"]["services"]["rfi"]["rate"] != 150.0:
+            failures.append(f"{row['id']}: hand-entered RFI rate was re-priced")
+    for first, last in store.rowid_chunks(5000):
+        for row in store.rule_inputs(first, last):
+            body = json.loads(row["body"])
+            if row["scope_text"] != app.generated_scope_text(body):
+                failures.append(f"{row['id']}: indexed scope text does not match the re-priced body")
+    renamed = doc["versions"][-1]["additional_services"][0]["name"]
+    found = len(store.search(renamed, limit=args.proposals + 1))
+    if found != args.proposals:
+        failures.append(f"search for the renamed service finds {found} of {args.proposals} proposals")
+    leftover, _ = rate_card.reprice(store, cards)
+    if len(leftover):
+        failures.append(f"second pass still has {len(leftover)} changes")
+    for failure in failures[:10]:
+        print(f"error: {failure}")
+    print("re-priced totals match the app" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
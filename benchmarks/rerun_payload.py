@@ -0,0 +1,51 @@
+"""
+Per-rerun payload size of the app, with and without static theme serving.
+
+Runs app.py under Streamlit's AppTest harness and sums the serialized size of
+every element the script emits on one rerun. Usage:
+
+    python benchmarks/rerun_payload.py
+"""
+
+import os
+import pathlib
+import sys
+import tempfile
+
+from streamlit import config
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = pathlib.Path(__file__).resolve().parent.parent / "app.py"
+
+
+def _proto_bytes(node) -> int:
+    proto = getattr(node, "proto", None)
+    total = proto.ByteSize() if proto is not None and hasattr(proto, "ByteSize") else 0
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        total += sum(_proto_bytes(child) for child in children.values())
+    return total
+
+
+def rerun_payload(static_serving: bool) -> int:
+    config.set_option("server.enableStaticServing", static_serving)
+    at = AppTest.from_file(str(APP_PATH), default_timeout=60)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    at.run()
+    return _proto_bytes(at._tree)
+
+
+def main() -> int:
+    os.environ.setdefault("PROPOSAL_STORE_PATH", os.path.join(tempfile.mkdtemp(), "proposals.db"))
+    inline = rerun_payload(False)
+    linked = rerun_payload(True)
+    print(f"inline <style>:   {inline / 1024:7.1f} KB per rerun")
+    print(f"static <link>:    {linked / 1024:7.1f} KB per rerun")
+    print(f"saved per rerun:  {(inline - linked) / 1024:7.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
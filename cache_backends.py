@@ -0,0 +1,302 @@
+"""
+Pluggable caches shared between Streamlit worker processes.
+
+@st.cache_resource / @st.cache_data live in one process, so every worker
+behind the proxy warms its own copy of parcel lookups and jurisdiction data.
+TieredCache puts a small in-process LRU in front of a shared backend:
+
+- LRUBackend     in-process only (the old behaviour; no sharing)
+- SQLiteBackend  a WAL SQLite file on the local disk, shared by every worker
+- RedisBackend   optional; needs the `redis` package and a reachable server
+
+Values are stored as JSON. Invalidations are appended to a log in the
+shared backend with an increasing seq; each process polls the log (at most
+every `poll_interval` seconds) and drops the matching local entries, so an
+invalidate in one worker reaches the others. Every tier counts its own
+hits and misses.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # optional
+    redis = None
+
+# (value, expires_at epoch seconds or None)
+Entry = Tuple[Any, Optional[float]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    key TEXT
+);
+"""
+
+# Invalidation log entries kept; a process further behind than this clears its local tier.
+INVALIDATION_LOG_LIMIT = 10000
+
+
+def _live(entry: Optional[Entry]) -> bool:
+    return entry is not None and (entry[1] is None or entry[1] > time.time())
+
+
+class CacheBackend:
+    name = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, entry: Optional[Entry]) -> Optional[Entry]:
+        if _live(entry):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def get(self, namespace: str, key: str) -> Optional[Entry]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def invalidations_since(self, seq: int) -> Tuple[List[Tuple[str, Optional[str]]], int, bool]:
+        """(namespace, key) invalidated after seq, the new seq, and False if the log was trimmed past seq."""
+        return [], seq, True
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "ratio": self.hits / total if total else 0.0}
+
+
+class LRUBackend(CacheBackend):
+    name = "lru"
+
+    def __init__(self, max_entries: int = 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                self._entries.move_to_end((namespace, key))
+            return self._count(entry)
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[(namespace, key)] = (value, expires_at)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is not None:
+                self._entries.pop((namespace, key), None)
+            else:
+                for cache_key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[cache_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend(CacheBackend):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Entry]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return self._count((json.loads(row[0]), row[1]) if row else None)
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at),
+            )
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        conn = self._conn()
+        with conn:
+            if key is not None:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            else:
+                conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            seq = conn.execute("INSERT INTO invalidations (namespace, key) VALUES (?, ?)", (namespace, key)).lastrowid
+            conn.execute("DELETE FROM invalidations WHERE seq <= ?", (seq - INVALIDATION_LOG_LIMIT,))
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+
+    def invalidations_since(self, seq: int) -> Tuple[List[Tuple[str, Optional[str]]], int, bool]:
+        conn = self._conn()
+        oldest = conn.execute("SELECT MIN(seq) FROM invalidations").fetchone()[0]
+        rows = conn.execute(
+            "SELECT seq, namespace, key FROM invalidations WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+        complete = oldest is None or oldest <= seq + 1
+        return [(row[1], row[2]) for row in rows], (rows[-1][0] if rows else seq), complete
+
+
+class RedisBackend(CacheBackend):
+    name = "redis"
+    LOG_KEY = "proposal-cache:invalidations"
+    SEQ_KEY = "proposal-cache:invalidation-seq"
+
+    def __init__(self, url: str, prefix: str = "proposal-cache:"):
+        super().__init__()
+        if redis is None:
+            raise RuntimeError("The redis cache backend needs the 'redis' package (pip install redis).")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[Entry]:
+        raw = self.client.get(self._key(namespace, key))
+        if raw is None:
+            return self._count(None)
+        value, expires_at = json.loads(raw)
+        return self._count((value, expires_at))
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        ttl = max(1, int(expires_at - time.time())) if expires_at else None
+        self.client.set(self._key(namespace, key), json.dumps([value, expires_at]), ex=ttl)
+        self.client.sadd(f"{self.prefix}{namespace}", key)
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        members = f"{self.prefix}{namespace}"
+        if key is not None:
+            self.client.delete(self._key(namespace, key))
+            self.client.srem(members, key)
+        else:
+            keys = [self._key(namespace, k.decode()) for k in self.client.smembers(members)]
+            self.client.delete(members, *keys)
+        seq = self.client.incr(self.SEQ_KEY)
+        pipe = self.client.pipeline()
+        pipe.rpush(self.LOG_KEY, json.dumps([seq, namespace, key]))
+        pipe.ltrim(self.LOG_KEY, -INVALIDATION_LOG_LIMIT, -1)
+        pipe.execute()
+
+    def invalidations_since(self, seq: int) -> Tuple[List[Tuple[str, Optional[str]]], int, bool]:
+        log = [json.loads(raw) for raw in self.client.lrange(self.LOG_KEY, 0, -1)]
+        newer = [entry for entry in log if entry[0] > seq]
+        complete = not log or log[0][0] <= seq + 1
+        return [(entry[1], entry[2]) for entry in newer], (newer[-1][0] if newer else seq), complete
+
+
+class TieredCache:
+    """In-process LRU in front of an optional shared backend."""
+
+    def __init__(self, shared: Optional[CacheBackend] = None, local_entries: int = 1024, poll_interval: float = 1.0):
+        self.local = LRUBackend(local_entries)
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._seen = self.shared.invalidations_since(0)[1] if self.shared else 0
+        self._polled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        if self.shared is None or time.monotonic() - self._polled_at < self.poll_interval:
+            return
+        with self._lock:
+            self._polled_at = time.monotonic()
+            changes, self._seen, complete = self.shared.invalidations_since(self._seen)
+            if not complete:
+                self.local.clear()
+                return
+            for namespace, key in changes:
+                self.local.invalidate(namespace, key)
+
+    def get(self, namespace: str, key: str) -> Optional[Entry]:
+        self._sync()
+        entry = self.local.get(namespace, key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(namespace, key)
+            if entry is not None:
+                self.local.set(namespace, key, *entry)
+        return entry
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        self.local.set(namespace, key, value, expires_at)
+        if self.shared is not None:
+            self.shared.set(namespace, key, value, expires_at)
+
+    def get_or_set(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: Optional[float] = None,
+        cache_if: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        entry = self.get(namespace, key)
+        if entry is not None:
+            return entry[0]
+        value = loader()
+        if cache_if(value):
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        self.local.invalidate(namespace, key)
+        if self.shared is not None:
+            self.shared.invalidate(namespace, key)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        tiers = {"local": self.local.stats()}
+        if self.shared is not None:
+            tiers[self.shared.name] = self.shared.stats()
+        return tiers
+
+
+def make_cache(kind: str, sqlite_path: str = "", redis_url: str = "", local_entries: int = 1024) -> TieredCache:
+    """kind: "lru" (per process), "sqlite" (shared via sqlite_path) or "redis" (shared via redis_url)."""
+    kind = (kind or "sqlite").lower()
+    if kind == "lru":
+        return TieredCache(None, local_entries)
+    if kind == "redis":
+        return TieredCache(RedisBackend(redis_url), local_entries)
+    if kind == "sqlite":
+        return TieredCache(SQLiteBackend(sqlite_path), local_entries)
+    raise ValueError(f"Unknown cache backend {kind!r}; expected lru, sqlite or redis")
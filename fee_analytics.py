@@ -0,0 +1,167 @@
+"""
+Historical fee analytics over saved proposals.
+
+Saved proposals are flattened into one pandas frame (one row per proposal,
+one column per task / additional-service fee). Fee quantiles are
+precomputed per group at several levels of conditioning, from
+(county, land use, acreage bucket, permit set) down to "all proposals", so a
+suggestion at render time is a few dict lookups.
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from proposal_store import ProposalStore
+
+ACRE_BINS = [0, 1, 2.5, 5, 10, 25, np.inf]
+ACRE_LABELS = ["<1 ac", "1-2.5 ac", "2.5-5 ac", "5-10 ac", "10-25 ac", "25+ ac"]
+
+# Most specific first; the first level with enough samples wins.
+LEVELS: List[Tuple[str, ...]] = [
+    ("county", "land_use", "acre_bucket", "permit_bits"),
+    ("county", "land_use", "acre_bucket"),
+    ("county", "acre_bucket"),
+    ("county",),
+    (),
+]
+MIN_SAMPLES = 5
+
+
+def _acres(value: Any) -> float:
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def acre_bucket(acres: Any) -> str:
+    value = _acres(acres)
+    if np.isnan(value):
+        return ""
+    if value < 0:
+        return ""
+    return ACRE_LABELS[bisect.bisect_right(ACRE_BINS, value) - 1]
+
+
+def load_fee_frame(store: ProposalStore) -> pd.DataFrame:
+    """One row per saved proposal: conditioning columns + task_<num> / svc_<name> fees."""
+    records = []
+    for row in store.rows():
+        body = row["body"]
+        intake = body.get("intake", {})
+        record = {
+            "county": row["county"],
+            "land_use": (intake.get("land_use", "") or "").strip().lower(),
+            "acres": _acres(intake.get("site_area_acres")),
+            "permit_bits": row["permit_bits"],
+        }
+        for task_num, task in (body.get("scope", {}).get("selected_tasks", {}) or {}).items():
+            record[f"task_{task_num}"] = task.get("fee")
+        for name, fee in (body.get("permits", {}).get("included_additional_services_with_fees", {}) or {}).items():
+            record[f"svc_{name}"] = fee
+        records.append(record)
+    frame = pd.DataFrame.from_records(records)
+    if frame.empty:
+        return frame
+    frame["acre_bucket"] = pd.cut(frame["acres"], ACRE_BINS, labels=ACRE_LABELS, right=False).astype(str)
+    frame.loc[frame["acres"].isna(), "acre_bucket"] = ""
+    fee_cols = [c for c in frame.columns if c.startswith(("task_", "svc_"))]
+    frame[fee_cols] = frame[fee_cols].apply(pd.to_numeric, errors="coerce")
+    return frame
+
+
+class FeeModel:
+    """Precomputed p25/p50/p75/n per fee column for every group at every level."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.tables: List[Dict[Tuple, Dict[str, Tuple[float, float, float, int]]]] = []
+        self.size = len(frame)
+        fee_cols = [c for c in frame.columns if c.startswith(("task_", "svc_"))]
+        for level in LEVELS:
+            table: Dict[Tuple, Dict[str, Tuple[float, float, float, int]]] = {}
+            if fee_cols:
+                grouped = frame.groupby(list(level)) if level else frame.assign(_all=0).groupby("_all")
+                grouped = grouped[fee_cols]
+                low = grouped.quantile(0.25).to_dict("index")
+                median = grouped.quantile(0.5).to_dict("index")
+                high = grouped.quantile(0.75).to_dict("index")
+                for group_key, counts in grouped.count().to_dict("index").items():
+                    key = () if not level else group_key if isinstance(group_key, tuple) else (group_key,)
+                    table[key] = {
+                        col: (low[group_key][col], median[group_key][col], high[group_key][col], int(n))
+                        for col, n in counts.items()
+                        if n
+                    }
+            self.tables.append(table)
+
+    def suggest(
+        self,
+        column: str,
+        county: str = "",
+        land_use: str = "",
+        acres: Any = None,
+        permit_bits: int = 0,
+        min_samples: int = MIN_SAMPLES,
+    ) -> Optional[Dict[str, Any]]:
+        """{low, median, high, n, basis} for a fee column, or None without enough history."""
+        values = {
+            "county": county or "",
+            "land_use": (land_use or "").strip().lower(),
+            "acre_bucket": acre_bucket(acres),
+            "permit_bits": int(permit_bits or 0),
+        }
+        for level, table in zip(LEVELS, self.tables):
+            stats = table.get(tuple(values[name] for name in level), {}).get(column)
+            if stats and stats[3] >= min_samples:
+                low, median, high, n = stats
+                return {"low": low, "median": median, "high": high, "n": n, "basis": level}
+        return None
+
+
+class FeeSuggester:
+    """
+    Holds the current FeeModel. When the store has changed (checked at most
+    every min_interval seconds) a new model is built on a background thread;
+    callers keep getting the previous one until it is ready, so a rerun never
+    waits on decoding saved proposals.
+    """
+
+    def __init__(self, store: ProposalStore, min_interval: float = 60.0):
+        self.store = store
+        self.min_interval = min_interval
+        self.model = FeeModel(pd.DataFrame())
+        self.seq = -1
+        self.checked_at: Optional[float] = None
+        self._building: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> FeeModel:
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.min_interval:
+            return self.model
+        with self._lock:
+            if self._building is not None or (self.checked_at is not None and now - self.checked_at < self.min_interval):
+                return self.model
+            self.checked_at = now
+            seq = self.store.max_seq()
+            if seq != self.seq:
+                self._building = threading.Thread(target=self._rebuild, args=(seq,), name="fee-model", daemon=True)
+                self._building.start()
+        return self.model
+
+    def _rebuild(self, seq: int) -> None:
+        try:
+            model = FeeModel(load_fee_frame(self.store))
+            # One reference swap; a rerun that already took the old model keeps it.
+            self.model, self.seq = model, seq
+        except Exception:
+            # A locked or unreadable store is retried after min_interval.
+            pass
+        finally:
+            self._building = None
+
@@ -0,0 +1,269 @@
+"""
+Durable queue of parcel lookups that could not reach the property appraiser.
+
+When pcpao.gov is down, a Tab 1 lookup is queued in a local SQLite database
+instead of failing, and the estimator carries on with manual intake. A
+LookupReplayer thread in each worker replays due entries on the batch lane
+with exponential backoff; workers claim entries with a short lease so the
+same parcel is not fetched twice. Finished records stay in the queue for a
+while so the session that queued them (or whoever reopens the proposal) can
+merge them in.
+
+The queue also remembers whether the upstream was last seen failing. While
+it is, interactive lookups skip the network and queue straight away instead
+of sitting through the retry layer, and the first successful lookup after an
+outage makes every queued entry due again.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    key TEXT PRIMARY KEY,
+    parcel_id TEXT NOT NULL,
+    county TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'queued',
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT NOT NULL DEFAULT '',
+    completed_at REAL,
+    record TEXT
+);
+CREATE INDEX IF NOT EXISTS lookups_due ON lookups (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS upstream (
+    name TEXT PRIMARY KEY,
+    failed_at REAL,
+    succeeded_at REAL,
+    error TEXT NOT NULL DEFAULT ''
+);
+"""
+
+# queued: waiting for a (re)try; done: record fetched; rejected: the upstream
+# answered but had no record (bad or retired parcel), so retrying cannot help.
+STATUSES = ("queued", "done", "rejected")
+
+
+class LookupQueue:
+    def __init__(self, path: str, backoff: float = 30.0, max_backoff: float = 900.0, upstream: str = "pcpao"):
+        self.path = str(path)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.upstream = upstream
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _entry(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["record"] = json.loads(entry["record"]) if entry["record"] else None
+        return entry
+
+    def enqueue(self, key: str, parcel_id: str, county: str = "", error: str = "") -> Dict[str, Any]:
+        """Queue a lookup (or re-queue a finished one); an entry already queued keeps its schedule."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO lookups (key, parcel_id, county, queued_at, next_attempt_at, last_error)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    parcel_id = excluded.parcel_id, county = excluded.county, status = 'queued',
+                    queued_at = excluded.queued_at, attempts = 0,
+                    next_attempt_at = excluded.next_attempt_at, last_error = excluded.last_error,
+                    completed_at = NULL, record = NULL
+                WHERE lookups.status != 'queued'
+                """,
+                (key, parcel_id, county, now, now + self.backoff, error),
+            )
+        return self.get(key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entry(self._conn().execute("SELECT * FROM lookups WHERE key = ?", (key,)).fetchone())
+
+    def claim(self, limit: int = 5, lease: float = 60.0) -> List[Dict[str, Any]]:
+        """
+        Due entries for this worker to replay. Each is leased by pushing its
+        next attempt `lease` seconds out, so other workers skip it meanwhile.
+        """
+        now = time.time()
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT * FROM lookups WHERE status = 'queued' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        claimed = []
+        with conn:
+            for row in rows:
+                cursor = conn.execute(
+                    "UPDATE lookups SET next_attempt_at = ? WHERE key = ? AND status = 'queued' AND next_attempt_at = ?",
+                    (now + lease, row["key"], row["next_attempt_at"]),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(self._entry(row))
+        return claimed
+
+    def complete(self, key: str, record: Dict[str, Any]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE lookups SET status = 'done', attempts = attempts + 1, completed_at = ?, record = ?, last_error = '' WHERE key = ?",
+                (time.time(), json.dumps(record), key),
+            )
+
+    def reject(self, key: str, error: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE lookups SET status = 'rejected', attempts = attempts + 1, completed_at = ?, last_error = ? WHERE key = ?",
+                (time.time(), error, key),
+            )
+
+    def retry_later(self, key: str, error: str) -> float:
+        """Back off exponentially (with jitter, capped at max_backoff); returns the delay."""
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT attempts FROM lookups WHERE key = ?", (key,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            conn.execute(
+                "UPDATE lookups SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE key = ? AND status = 'queued'",
+                (attempts, time.time() + delay, error, key),
+            )
+        return delay
+
+    def retry_all_now(self) -> int:
+        conn = self._conn()
+        with conn:
+            return conn.execute(
+                "UPDATE lookups SET next_attempt_at = ? WHERE status = 'queued'", (time.time(),)
+            ).rowcount
+
+    def pending(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT * FROM lookups WHERE status = 'queued' ORDER BY queued_at LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(STATUSES, 0)
+        for row in self._conn().execute("SELECT status, COUNT(*) FROM lookups GROUP BY status"):
+            counts[row[0]] = row[1]
+        return counts
+
+    def purge(self, older_than: float) -> int:
+        """Drop finished entries completed more than `older_than` seconds ago."""
+        conn = self._conn()
+        with conn:
+            return conn.execute(
+                "DELETE FROM lookups WHERE status != 'queued' AND completed_at < ?", (time.time() - older_than,)
+            ).rowcount
+
+    # -- upstream health ------------------------------------------------------
+    def note_upstream(self, ok: bool, error: str = "") -> None:
+        """Record a lookup's outcome. The first success after a failure makes queued entries due now."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT failed_at, succeeded_at FROM upstream WHERE name = ?", (self.upstream,)).fetchone()
+            was_down = row is not None and (row["failed_at"] or 0) > (row["succeeded_at"] or 0)
+            if ok:
+                conn.execute(
+                    "INSERT INTO upstream (name, succeeded_at) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET succeeded_at = excluded.succeeded_at",
+                    (self.upstream, now),
+                )
+                if was_down:
+                    conn.execute("UPDATE lookups SET next_attempt_at = ? WHERE status = 'queued'", (now,))
+            else:
+                conn.execute(
+                    "INSERT INTO upstream (name, failed_at, error) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET failed_at = excluded.failed_at, error = excluded.error",
+                    (self.upstream, now, error),
+                )
+
+    def upstream_down(self, window: float) -> Optional[Dict[str, Any]]:
+        """{failed_at, error} if the last lookup failed less than `window` seconds ago, else None."""
+        row = self._conn().execute(
+            "SELECT failed_at, succeeded_at, error FROM upstream WHERE name = ?", (self.upstream,)
+        ).fetchone()
+        if row is None or not row["failed_at"] or (row["succeeded_at"] or 0) >= row["failed_at"]:
+            return None
+        if time.time() - row["failed_at"] > window:
+            return None
+        return {"failed_at": row["failed_at"], "error": row["error"]}
+
+
+class LookupReplayer:
+    """
+    Background thread that replays due entries. `lookup(parcel_id)` returns a
+    record dict: success -> done, "unreachable" or "retry" -> retry later,
+    anything else -> rejected.
+    """
+
+    def __init__(
+        self,
+        queue: LookupQueue,
+        lookup: Callable[[str], Dict[str, Any]],
+        poll_seconds: float = 10.0,
+        retention: float = 30 * 24 * 3600,
+    ):
+        self.queue = queue
+        self.lookup = lookup
+        self.poll_seconds = poll_seconds
+        self.retention = retention
+        self.stats = {"replayed": 0, "retried": 0, "rejected": 0}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "LookupReplayer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="lookup-replay", daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run_once()
+                self.queue.purge(self.retention)
+            except Exception:
+                # A locked or unreadable queue database is retried on the next poll.
+                pass
+            time.sleep(self.poll_seconds)
+
+    def run_once(self) -> int:
+        """Replay the entries due now; returns how many were attempted."""
+        entries = self.queue.claim()
+        for entry in entries:
+            try:
+                record = self.lookup(entry["parcel_id"])
+            except Exception as e:
+                record = {"success": False, "unreachable": True, "error": f"{type(e).__name__}: {e}"}
+            if record.get("success"):
+                self.queue.complete(entry["key"], record)
+                self.stats["replayed"] += 1
+            elif record.get("unreachable") or record.get("retry"):
+                self.queue.retry_later(entry["key"], record.get("error", ""))
+                self.stats["retried"] += 1
+            else:
+                self.queue.reject(entry["key"], record.get("error", "Lookup failed"))
+                self.stats["rejected"] += 1
+        return len(entries)
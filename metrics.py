@@ -0,0 +1,247 @@
+"""
+In-process metrics registry with a Prometheus text-format endpoint.
+
+    LOOKUPS = REGISTRY.counter("pcpao_lookups_total", "Parcel lookups.", ["outcome"])
+    LOOKUPS.labels(outcome="ok").inc()
+
+counter()/gauge()/histogram() are get-or-create, so app.py can declare its
+metrics at module level even though Streamlit re-executes the script on
+every rerun. Updates are a dict lookup and an add under a lock. Collectors
+registered with add_collector() are called at scrape time for values that
+already live elsewhere (cache hit counts, queue depths).
+
+start_http_server() serves GET /metrics from a daemon thread. Several
+worker processes on one host each take the first free port from `port`
+upward.
+"""
+
+import bisect
+import errno
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name suffix, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[Sample]:
+        out: List[Sample] = []
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.label_names, key))
+            out.extend((suffix, {**labels, **extra}, value) for suffix, extra, value in child._values())
+        return out
+
+
+class _CounterValue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def _values(self) -> List[Sample]:
+        return [("", {}, self.value)]
+
+
+class _GaugeValue(_CounterValue):
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def _values(self) -> List[Sample]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        out: List[Sample] = []
+        running = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            running += count
+            out.append(("_bucket", {"le": _format_value(bound)}, running))
+        out.append(("_sum", {}, total))
+        out.append(("_count", {}, running))
+        return out
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = {}
+
+    def _get_or_create(self, cls, name: str, help_text: str, label_names: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, cls(name, help_text, label_names, **kwargs))
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, label_names)
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def add_collector(self, key: str, collect: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+        """collect() yields (name, kind, help, labels, value) at scrape time; re-adding a key replaces it."""
+        with self._lock:
+            self._collectors[key] = collect
+
+    def exposition(self) -> str:
+        """All metrics in Prometheus text format 0.0.4."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        grouped: Dict[str, Tuple[str, str, List[str]]] = {}
+        for key, collect in list(self._collectors.items()):
+            try:
+                for name, kind, help_text, labels, value in collect():
+                    entry = grouped.setdefault(name, (kind, help_text, []))
+                    entry[2].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            except Exception:
+                logger.exception("Metrics collector %s failed", key)
+        for name, (kind, help_text, samples) in grouped.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def start_http_server(registry: Registry, host: str = "127.0.0.1", port: int = 9464, attempts: int = 16) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on the first free port in [port, port + attempts). None if none was free."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.exposition().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    for candidate in range(port, port + attempts):
+        try:
+            server = ThreadingHTTPServer((host, candidate), Handler)
+        except OSError as e:
+            if e.errno == errno.EADDRINUSE:
+                continue
+            raise
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Metrics endpoint on http://%s:%d/metrics", host, candidate)
+        return server
+    logger.warning("No free port for the metrics endpoint in %d-%d", port, port + attempts - 1)
+    return None
@@ -0,0 +1,426 @@
+"""
+Offline GIS overlays for Tab 1 autofill and Tab 2/4 suggestions.
+
+Zoning and future-land-use polygon layers are exported from each
+jurisdiction's GIS (GeoJSON, or shapefiles when pyshp is installed) and saved
+under Data/overlays/<jurisdiction-slug>/. A uniform grid over the polygon
+bounding boxes narrows a point query to a handful of candidates before the
+exact point-in-polygon test, so a resolve costs microseconds, not a browser
+round trip to the city ArcGIS app.
+
+Layout (per jurisdiction directory):
+  overlays.json          optional manifest: {"zoning": {"file": ..., "field": ...}, ...}
+  zoning.geojson         zoning polygons
+  future_land_use.geojson
+Parcel points live under the county directory (e.g. Data/overlays/pinellas/)
+in parcel_points.csv with columns parcel_id (or strap), lon, lat. All layers
+and points for a county must share one coordinate system.
+
+The county directory also holds the environmental layers used to suggest
+permits and assumptions: flood_zones (FEMA NFHL polygons), wetlands (NWI
+polygons) and state_roads (FDOT centerlines; the manifest "buffer" is the
+frontage distance in layer units).
+"""
+
+import csv
+import json
+import math
+import pathlib
+import re
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+try:
+    import shapefile  # pyshp, optional
+except ImportError:  # pragma: no cover - optional dependency
+    shapefile = None
+
+Ring = List[Tuple[float, float]]
+BBox = Tuple[float, float, float, float]
+
+# Attribute names tried, in order, when a layer has no manifest entry.
+DEFAULT_FIELDS = {
+    "zoning": ["ZONING", "ZONE_DESC", "ZONEDESC", "ZONE_CLASS", "ZONECLASS", "ZONE", "ZONING_DESC", "ZN_DESC"],
+    "future_land_use": ["FLU_DESC", "FLUDESC", "FLU", "FLUM", "FUTURE_LAND_USE", "LANDUSE", "LAND_USE", "LU_DESC"],
+    "flood_zones": ["FLD_ZONE", "FLOOD_ZONE", "ZONE"],
+    "wetlands": ["WETLAND_TYPE", "ATTRIBUTE", "WETLAND", "NAME"],
+    "state_roads": ["ROAD_NAME", "ROADNAME", "RTE_NAME", "ROADWAY", "NAME"],
+}
+
+# FEMA Special Flood Hazard Area zones (1% annual chance).
+SFHA_ZONES = {"A", "AE", "AH", "AO", "AR", "A99", "V", "VE"}
+
+# State-road centerline buffer when the manifest does not give one
+# (degrees; roughly 100 ft for WGS84 layers in Florida).
+DEFAULT_ROAD_BUFFER = 0.0003
+
+
+def overlay_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (name or "").lower()).strip("-")
+
+
+def _parcel_key(parcel_id: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]", "", parcel_id or "").upper()
+
+
+# -----------------------------------------------------------------------------
+# Geometry
+# -----------------------------------------------------------------------------
+def _ring_bbox(ring: Ring) -> BBox:
+    xs = [p[0] for p in ring]
+    ys = [p[1] for p in ring]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _point_in_ring(x: float, y: float, ring: Ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class OverlayPolygon:
+    """One feature: a list of polygons, each an outer ring plus holes."""
+
+    __slots__ = ("value", "parts", "bbox")
+
+    def __init__(self, value: str, parts: List[List[Ring]]):
+        self.value = value
+        self.parts = parts
+        boxes = [_ring_bbox(p[0]) for p in parts]
+        self.bbox = (
+            min(b[0] for b in boxes),
+            min(b[1] for b in boxes),
+            max(b[2] for b in boxes),
+            max(b[3] for b in boxes),
+        )
+
+    def contains(self, x: float, y: float) -> bool:
+        minx, miny, maxx, maxy = self.bbox
+        if x < minx or x > maxx or y < miny or y > maxy:
+            return False
+        for rings in self.parts:
+            if _point_in_ring(x, y, rings[0]) and not any(_point_in_ring(x, y, h) for h in rings[1:]):
+                return True
+        return False
+
+
+def _segment_distance(x: float, y: float, a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(x - a[0], y - a[1])
+    t = max(0.0, min(1.0, ((x - a[0]) * dx + (y - a[1]) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(x - (a[0] + t * dx), y - (a[1] + t * dy))
+
+
+class OverlayLine:
+    """One line feature; bbox is pre-expanded by the buffer so the grid finds it."""
+
+    __slots__ = ("value", "lines", "buffer", "bbox")
+
+    def __init__(self, value: str, lines: List[Ring], buffer: float):
+        self.value = value
+        self.lines = lines
+        self.buffer = buffer
+        boxes = [_ring_bbox(line) for line in lines]
+        self.bbox = (
+            min(b[0] for b in boxes) - buffer,
+            min(b[1] for b in boxes) - buffer,
+            max(b[2] for b in boxes) + buffer,
+            max(b[3] for b in boxes) + buffer,
+        )
+
+    def contains(self, x: float, y: float) -> bool:
+        minx, miny, maxx, maxy = self.bbox
+        if x < minx or x > maxx or y < miny or y > maxy:
+            return False
+        for line in self.lines:
+            for a, b in zip(line, line[1:]):
+                if _segment_distance(x, y, a, b) <= self.buffer:
+                    return True
+        return False
+
+
+class GridIndex:
+    """Uniform grid over feature bounding boxes; each cell lists candidate features."""
+
+    def __init__(self, features: List[Any], target_per_cell: int = 4):
+        self.features = features
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        if not features:
+            self.bounds = (0.0, 0.0, 0.0, 0.0)
+            self.cell_w = self.cell_h = 1.0
+            return
+        self.bounds = (
+            min(f.bbox[0] for f in features),
+            min(f.bbox[1] for f in features),
+            max(f.bbox[2] for f in features),
+            max(f.bbox[3] for f in features),
+        )
+        minx, miny, maxx, maxy = self.bounds
+        n_side = max(1, int(math.sqrt(len(features) / max(target_per_cell, 1))))
+        self.cell_w = ((maxx - minx) / n_side) or 1.0
+        self.cell_h = ((maxy - miny) / n_side) or 1.0
+        for idx, f in enumerate(features):
+            c0, r0 = self._cell(f.bbox[0], f.bbox[1])
+            c1, r1 = self._cell(f.bbox[2], f.bbox[3])
+            for c in range(c0, c1 + 1):
+                for r in range(r0, r1 + 1):
+                    self.cells.setdefault((c, r), []).append(idx)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int((x - self.bounds[0]) // self.cell_w), int((y - self.bounds[1]) // self.cell_h)
+
+    def candidates(self, x: float, y: float) -> Iterable[Any]:
+        for idx in self.cells.get(self._cell(x, y), ()):
+            yield self.features[idx]
+
+
+class PolygonLayer:
+    """Grid-indexed features answering "which value covers (x, y)?"."""
+
+    def __init__(self, name: str, features: List[Any]):
+        self.name = name
+        self.index = GridIndex(features)
+
+    def __len__(self) -> int:
+        return len(self.index.features)
+
+    def lookup(self, x: float, y: float) -> Optional[str]:
+        for feature in self.index.candidates(x, y):
+            if feature.contains(x, y):
+                return feature.value
+        return None
+
+
+# -----------------------------------------------------------------------------
+# Loading
+# -----------------------------------------------------------------------------
+def _pick_field(props: Dict[str, Any], field: Optional[str], layer: str) -> str:
+    if field:
+        return str(props.get(field) or "").strip()
+    upper = {str(k).upper(): v for k, v in props.items()}
+    for candidate in DEFAULT_FIELDS.get(layer, []):
+        if upper.get(candidate):
+            return str(upper[candidate]).strip()
+    return ""
+
+
+def _geometry_parts(geom: Dict[str, Any]) -> List[List[Ring]]:
+    gtype = (geom or {}).get("type")
+    coords = (geom or {}).get("coordinates") or []
+    if gtype == "Polygon":
+        polys = [coords]
+    elif gtype == "MultiPolygon":
+        polys = coords
+    else:
+        return []
+    return [[[(float(p[0]), float(p[1])) for p in ring] for ring in poly] for poly in polys if poly]
+
+
+def _line_parts(geom: Dict[str, Any]) -> List[Ring]:
+    gtype = (geom or {}).get("type")
+    coords = (geom or {}).get("coordinates") or []
+    if gtype == "LineString":
+        lines = [coords]
+    elif gtype == "MultiLineString":
+        lines = coords
+    else:
+        return []
+    return [[(float(p[0]), float(p[1])) for p in line] for line in lines if len(line) > 1]
+
+
+def _make_feature(geom: Dict[str, Any], value: str, buffer: Optional[float]) -> Optional[Any]:
+    if buffer is not None:
+        lines = _line_parts(geom)
+        return OverlayLine(value, lines, buffer) if lines else None
+    parts = _geometry_parts(geom)
+    return OverlayPolygon(value, parts) if parts else None
+
+
+def _load_geojson(path: pathlib.Path, layer: str, field: Optional[str],
+                  fallback: Optional[str], buffer: Optional[float]) -> List[Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    features = []
+    for feat in data.get("features", []):
+        value = _pick_field(feat.get("properties") or {}, field, layer) or fallback
+        if not value:
+            continue
+        feature = _make_feature(feat.get("geometry"), value, buffer)
+        if feature is not None:
+            features.append(feature)
+    return features
+
+
+def _load_shapefile(path: pathlib.Path, layer: str, field: Optional[str],
+                    fallback: Optional[str], buffer: Optional[float]) -> List[Any]:
+    if shapefile is None:
+        return []
+    features = []
+    with shapefile.Reader(str(path)) as reader:
+        for shape_rec in reader.iterShapeRecords():
+            value = _pick_field(shape_rec.record.as_dict(), field, layer) or fallback
+            if not value:
+                continue
+            feature = _make_feature(shape_rec.shape.__geo_interface__, value, buffer)
+            if feature is not None:
+                features.append(feature)
+    return features
+
+
+def load_layer(directory: pathlib.Path, layer: str, manifest: Dict[str, Any],
+               fallback: Optional[str] = None, buffer: Optional[float] = None) -> Optional[PolygonLayer]:
+    """
+    Load <layer>.geojson/.json/.shp (or the manifest's "file") from directory.
+    fallback is the value for features without a recognised attribute (features
+    are skipped when it is None); buffer switches to line features.
+    """
+    spec = manifest.get(layer) or {}
+    field = spec.get("field")
+    if buffer is not None:
+        buffer = float(spec.get("buffer", buffer))
+    candidates = [directory / spec["file"]] if spec.get("file") else [
+        directory / f"{layer}.geojson",
+        directory / f"{layer}.json",
+        directory / f"{layer}.shp",
+    ]
+    for path in candidates:
+        if not path.exists():
+            continue
+        if path.suffix.lower() == ".shp":
+            features = _load_shapefile(path, layer, field, fallback, buffer)
+        else:
+            features = _load_geojson(path, layer, field, fallback, buffer)
+        return PolygonLayer(layer, features)
+    return None
+
+
+class JurisdictionOverlays:
+    """Zoning + FLU layers for one jurisdiction."""
+
+    LAYERS = ("zoning", "future_land_use")
+
+    def __init__(self, slug: str, layers: Dict[str, PolygonLayer]):
+        self.slug = slug
+        self.layers = layers
+
+    def __bool__(self) -> bool:
+        return bool(self.layers)
+
+    def resolve(self, x: float, y: float) -> Dict[str, str]:
+        out = {}
+        for name, layer in self.layers.items():
+            value = layer.lookup(x, y)
+            if value:
+                out[name] = value
+        return out
+
+
+def _read_manifest(directory: pathlib.Path) -> Dict[str, Any]:
+    path = directory / "overlays.json"
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def load_jurisdiction_overlays(root: pathlib.Path, jurisdiction: str) -> JurisdictionOverlays:
+    slug = overlay_slug(jurisdiction)
+    directory = root / slug
+    layers: Dict[str, PolygonLayer] = {}
+    if slug and directory.is_dir():
+        manifest = _read_manifest(directory)
+        for name in JurisdictionOverlays.LAYERS:
+            layer = load_layer(directory, name, manifest)
+            if layer is not None and len(layer):
+                layers[name] = layer
+    return JurisdictionOverlays(slug, layers)
+
+
+class EnvironmentalOverlays:
+    """County-wide flood zone, wetland and state-road layers."""
+
+    def __init__(self, slug: str, layers: Dict[str, PolygonLayer]):
+        self.slug = slug
+        self.layers = layers
+
+    def __bool__(self) -> bool:
+        return bool(self.layers)
+
+    def findings(self, x: float, y: float) -> Dict[str, Any]:
+        """
+        flood_zone / sfha, wetland and state_road at the point. Keys for layers
+        that are not loaded are omitted so callers can tell "no data" from "no hit".
+        """
+        out: Dict[str, Any] = {}
+        flood = self.layers.get("flood_zones")
+        if flood is not None:
+            zone = (flood.lookup(x, y) or "").upper()
+            out["flood_zone"] = zone
+            out["sfha"] = zone in SFHA_ZONES
+        wetlands = self.layers.get("wetlands")
+        if wetlands is not None:
+            out["wetland"] = wetlands.lookup(x, y) or ""
+        roads = self.layers.get("state_roads")
+        if roads is not None:
+            out["state_road"] = roads.lookup(x, y) or ""
+        return out
+
+
+def load_environmental_overlays(root: pathlib.Path, county: str) -> EnvironmentalOverlays:
+    slug = overlay_slug(county)
+    directory = root / slug
+    layers: Dict[str, PolygonLayer] = {}
+    if slug and directory.is_dir():
+        manifest = _read_manifest(directory)
+        for name, fallback, buffer in (
+            ("flood_zones", None, None),
+            ("wetlands", "Wetland", None),
+            ("state_roads", "State Road", DEFAULT_ROAD_BUFFER),
+        ):
+            layer = load_layer(directory, name, manifest, fallback=fallback, buffer=buffer)
+            if layer is not None:
+                layers[name] = layer
+    return EnvironmentalOverlays(slug, layers)
+
+
+class ParcelLocator:
+    """parcel_id/strap -> (x, y) from a county's parcel_points.csv."""
+
+    def __init__(self, points: Dict[str, Tuple[float, float]]):
+        self.points = points
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def locate(self, *parcel_ids: str) -> Optional[Tuple[float, float]]:
+        for pid in parcel_ids:
+            pt = self.points.get(_parcel_key(pid))
+            if pt:
+                return pt
+        return None
+
+
+def load_parcel_locator(root: pathlib.Path, county: str) -> ParcelLocator:
+    path = root / overlay_slug(county) / "parcel_points.csv"
+    points: Dict[str, Tuple[float, float]] = {}
+    if path.exists():
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                row = {(k or "").strip().lower(): v for k, v in row.items()}
+                try:
+                    pt = (float(row["lon"]), float(row["lat"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                for col in ("parcel_id", "strap"):
+                    if row.get(col):
+                        points[_parcel_key(row[col])] = pt
+    return ParcelLocator(points)
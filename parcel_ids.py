@@ -0,0 +1,260 @@
+"""
+Parcel identifiers for the supported counties: parse, validate and convert.
+
+A county's parcel ID is a fixed sequence of digit segments. Three forms:
+
+- display:    the segments joined with dashes, as the property appraiser
+              shows them ("19-31-17-73166-001-0010" for Pinellas)
+- normalized: the digits alone ("193117731660010010"), which is also the
+              cache and archive key (pcpao.parcel_key)
+- strap:      the digits in the appraiser's strap order. Pinellas puts
+              range, township, section first ("173119731660010010"); the
+              other counties use the parcel ID order
+
+Input is either the compact digits or every segment separated by one of
+"-", " ", ".", "/", "_", with surrounding whitespace ignored. Input in
+strap order is read with source="strap".
+
+bulk_convert() does the same for a whole column with numpy: the strings are
+viewed as a matrix of UCS-4 code points, so there is no per-row Python and
+millions of rows from a bulk extract convert in seconds.
+
+    python parcel_ids.py convert extract.csv --column PARCEL_ID [--county Pinellas]
+                                [--to display|normalized|strap] [--out converted.csv]
+"""
+
+import argparse
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMS = ("display", "normalized", "strap")
+SEPARATORS = "- ./_"
+
+_strip = getattr(np, "strings", np.char).strip
+_str_len = getattr(np, "strings", np.char).str_len
+
+
+class InvalidParcelId(ValueError):
+    pass
+
+
+class ParcelFormat:
+    __slots__ = ("county", "names", "widths", "width", "strap_order", "_columns", "_patterns")
+
+    def __init__(self, county: str, segments: Sequence[Tuple[str, int]], strap_order: Optional[Sequence[int]] = None):
+        self.county = county
+        self.names = tuple(name for name, _ in segments)
+        self.widths = tuple(width for _, width in segments)
+        self.width = sum(self.widths)
+        self.strap_order = tuple(strap_order) if strap_order is not None else tuple(range(len(self.widths)))
+        starts = [sum(self.widths[:i]) for i in range(len(self.widths))]
+        # Column of each strap digit in the normalized digits.
+        self._columns = [c for i in self.strap_order for c in range(starts[i], starts[i] + self.widths[i])]
+        sep = f"[{re.escape(SEPARATORS)}]"
+        self._patterns = {}
+        for source in ("parcel", "strap"):
+            grouped = sep.join(r"\d{%d}" % w for w in self.source_widths(source))
+            self._patterns[source] = re.compile(r"^(?:\d{%d}|%s)$" % (self.width, grouped), re.ASCII)
+
+    def source_widths(self, source: str) -> Tuple[int, ...]:
+        if source == "parcel":
+            return self.widths
+        if source == "strap":
+            return tuple(self.widths[i] for i in self.strap_order)
+        raise ValueError(f"Unknown source {source!r}; expected parcel or strap")
+
+    @property
+    def strap_columns(self) -> List[int]:
+        return list(self._columns)
+
+    def parse(self, text: str, source: str = "parcel") -> str:
+        """Normalized digits of a parcel ID; raises InvalidParcelId."""
+        value = (text or "").strip()
+        pattern = self._patterns.get(source)
+        if pattern is None:
+            raise ValueError(f"Unknown source {source!r}; expected parcel or strap")
+        if not pattern.match(value):
+            raise InvalidParcelId(
+                f"{text!r} is not a {self.county} parcel ID "
+                f"({'-'.join('#' * w for w in self.source_widths(source))})"
+            )
+        digits = re.sub(r"\D", "", value)
+        if source == "strap":
+            unstrapped = [""] * self.width
+            for position, column in enumerate(self._columns):
+                unstrapped[column] = digits[position]
+            digits = "".join(unstrapped)
+        return digits
+
+    def format(self, digits: str, to: str) -> str:
+        if to == "normalized":
+            return digits
+        if to == "strap":
+            return "".join(digits[c] for c in self._columns)
+        if to == "display":
+            parts, start = [], 0
+            for width in self.widths:
+                parts.append(digits[start:start + width])
+                start += width
+            return "-".join(parts)
+        raise ValueError(f"Unknown form {to!r}; expected one of {FORMS}")
+
+
+FORMATS: Dict[str, ParcelFormat] = {
+    "Pinellas": ParcelFormat(
+        "Pinellas",
+        [("section", 2), ("township", 2), ("range", 2), ("subdivision", 5), ("block", 3), ("lot", 4)],
+        strap_order=(2, 1, 0, 3, 4, 5),
+    ),
+    "Pasco": ParcelFormat(
+        "Pasco",
+        [("section", 2), ("township", 2), ("range", 2), ("subdivision", 4), ("block", 5), ("lot", 4)],
+    ),
+    "Hillsborough": ParcelFormat("Hillsborough", [("folio", 6), ("suffix", 4)]),
+}
+
+
+def parcel_format(county: str) -> ParcelFormat:
+    fmt = FORMATS.get((county or "").strip().title())
+    if fmt is None:
+        raise ValueError(f"No parcel ID format for {county!r}; expected one of {sorted(FORMATS)}")
+    return fmt
+
+
+def convert(text: str, county: str = "Pinellas", to: str = "display", source: str = "parcel") -> str:
+    fmt = parcel_format(county)
+    return fmt.format(fmt.parse(text, source), to)
+
+
+def is_valid(text: str, county: str = "Pinellas", source: str = "parcel") -> bool:
+    try:
+        parcel_format(county).parse(text, source)
+    except InvalidParcelId:
+        return False
+    return True
+
+
+# -----------------------------------------------------------------------------
+# Bulk conversion
+# -----------------------------------------------------------------------------
+def _grouped_layout(widths: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """(digit columns, separator columns) of the separated form."""
+    digit_cols, sep_cols, column = [], [], 0
+    for i, width in enumerate(widths):
+        if i:
+            sep_cols.append(column)
+            column += 1
+        digit_cols.extend(range(column, column + width))
+        column += width
+    return np.asarray(digit_cols), np.asarray(sep_cols)
+
+
+def _bulk_chunk(values: np.ndarray, fmt: ParcelFormat, to: str, source: str) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(values)
+    values = np.ascontiguousarray(_strip(values))
+    length = values.dtype.itemsize // 4
+    widths = fmt.source_widths(source)
+    grouped_width = fmt.width + len(widths) - 1
+    if length < fmt.width:
+        return np.zeros(n, dtype=f"<U{max(grouped_width, 1)}"), np.zeros(n, dtype=bool)
+    codes = values.view(np.uint32).reshape(n, length)
+    if length < grouped_width:
+        codes = np.pad(codes, ((0, 0), (0, grouped_width - length)))
+        length = grouped_width
+    is_digit = (codes >= ord("0")) & (codes <= ord("9"))
+    used = np.count_nonzero(codes, axis=1)
+
+    compact = (used == fmt.width) & is_digit[:, :fmt.width].all(axis=1)
+    digit_cols, sep_cols = _grouped_layout(widths)
+    grouped = (
+        (used == grouped_width)
+        & is_digit[:, digit_cols].all(axis=1)
+        & np.isin(codes[:, sep_cols], [ord(c) for c in SEPARATORS]).all(axis=1)
+    )
+    valid = compact | grouped
+    digits = np.where(grouped[:, None], codes[:, digit_cols], codes[:, :fmt.width])
+    digits[~valid] = 0
+
+    if source == "strap":
+        unstrapped = np.empty_like(digits)
+        unstrapped[:, fmt.strap_columns] = digits
+        digits = unstrapped
+    if to == "normalized":
+        out = digits
+    elif to == "strap":
+        out = digits[:, fmt.strap_columns]
+    elif to == "display":
+        digit_cols, sep_cols = _grouped_layout(fmt.widths)
+        out = np.zeros((n, fmt.width + len(fmt.widths) - 1), dtype=np.uint32)
+        out[:, digit_cols] = digits
+        out[:, sep_cols] = np.where(valid[:, None], ord("-"), 0)
+    else:
+        raise ValueError(f"Unknown form {to!r}; expected one of {FORMS}")
+    out = np.ascontiguousarray(out, dtype=np.uint32)
+    return out.view(f"<U{out.shape[1]}").reshape(n), valid
+
+
+def bulk_convert(
+    ids: Iterable[str],
+    county: str = "Pinellas",
+    to: str = "display",
+    source: str = "parcel",
+    chunk_size: int = 1 << 18,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert many parcel IDs at once. Returns (converted, valid): a string
+    array with "" for invalid input and a boolean mask. Gives the same
+    result as convert() row by row. Missing values (None) are invalid.
+    """
+    fmt = parcel_format(county)
+    if to not in FORMS:
+        raise ValueError(f"Unknown form {to!r}; expected one of {FORMS}")
+    fmt.source_widths(source)
+    values = np.asarray(ids, dtype=object)
+    values = np.where(values == None, "", values).ravel()  # noqa: E711
+    text = values.astype(str)
+    # Numpy strings drop trailing NULs, which convert() would reject.
+    truncated = np.fromiter(map(len, map(str, values)), dtype=np.int64, count=len(values)) != _str_len(text)
+    converted, valid = [], []
+    for start in range(0, len(text), chunk_size):
+        out, ok = _bulk_chunk(text[start:start + chunk_size], fmt, to, source)
+        converted.append(out)
+        valid.append(ok)
+    if not converted:
+        return np.zeros(0, dtype="<U1"), np.zeros(0, dtype=bool)
+    converted, valid = np.concatenate(converted), np.concatenate(valid)
+    converted[truncated] = ""
+    return converted, valid & ~truncated
+
+
+# -----------------------------------------------------------------------------
+# CLI
+# -----------------------------------------------------------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Parcel ID conversion")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="Convert a parcel ID column of a CSV bulk extract")
+    conv.add_argument("csv")
+    conv.add_argument("--column", required=True)
+    conv.add_argument("--county", default="Pinellas", choices=sorted(FORMATS))
+    conv.add_argument("--to", default="display", choices=FORMS)
+    conv.add_argument("--source", default="parcel", choices=("parcel", "strap"))
+    conv.add_argument("--out", help="Output CSV (default: <csv stem>.<to>.csv)")
+    args = parser.parse_args(argv)
+
+    frame = pd.read_csv(args.csv, dtype=str, keep_default_na=False)
+    converted, valid = bulk_convert(frame[args.column].to_numpy(), args.county, args.to, args.source)
+    frame[f"{args.column}_{args.to}"] = converted
+    out = args.out or args.csv.rsplit(".", 1)[0] + f".{args.to}.csv"
+    frame.to_csv(out, index=False)
+    print(f"{int(valid.sum())} of {len(frame)} rows converted, {int((~valid).sum())} invalid -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
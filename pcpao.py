@@ -0,0 +1,324 @@
+"""
+Pinellas County Property Appraiser (pcpao.gov) request building and parsing.
+
+Kept free of Streamlit so the same parsers serve live Tab 1 lookups and
+offline re-extraction over the raw response archive:
+
+    python pcpao.py reextract [--archive Data/response_archive]
+                              [--out Data/parcel_records.jsonl]
+                              [--cache-db Data/cache.db] [--workers N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+
+from bs4 import BeautifulSoup
+
+import parcel_ids
+from response_archive import ResponseArchive
+
+# PCPAO_BASE_URL points lookups at a stand-in server (benchmarks/load_sessions.py).
+BASE_URL = os.environ.get("PCPAO_BASE_URL", "https://www.pcpao.gov").rstrip("/")
+QUICKSEARCH_URL = f"{BASE_URL}/dal/quicksearch/searchProperty"
+DETAILS_URL = f"{BASE_URL}/property-details"
+BASE_DIR = Path(__file__).parent
+
+PINELLAS_CITY_MAP = {
+    'SP': 'St. Petersburg',
+    'ST PETERSBURG': 'St. Petersburg',
+    'ST. PETERSBURG': 'St. Petersburg',
+    'CLEARWATER': 'Clearwater',
+    'CW': 'Clearwater',
+    'CWD': 'Clearwater',
+    'LARGO': 'Largo',
+    'LA': 'Largo',
+    'PINELLAS PARK': 'Pinellas Park',
+    'PP': 'Pinellas Park',
+    'PPW': 'Pinellas Park',
+    'DUNEDIN': 'Dunedin',
+    'TARPON SPRINGS': 'Tarpon Springs',
+    'TS': 'Tarpon Springs',
+    'SEMINOLE': 'Seminole',
+    'KENNETH CITY': 'Kenneth City',
+    'GULFPORT': 'Gulfport',
+    'MB': 'Madeira Beach',
+    'MADEIRA BEACH': 'Madeira Beach',
+    'REDINGTON BEACH': 'Redington Beach',
+    'TREASURE ISLAND': 'Treasure Island',
+    'ST PETE BEACH': 'St. Pete Beach',
+    'SOUTH PASADENA': 'South Pasadena',
+    'BELLEAIR': 'Belleair',
+    'BELLEAIR BEACH': 'Belleair Beach',
+    'BELLEAIR BLUFFS': 'Belleair Bluffs',
+    'INDIAN ROCKS BEACH': 'Indian Rocks Beach',
+    'INDIAN SHORES': 'Indian Shores',
+    'NORTH REDINGTON BEACH': 'North Redington Beach',
+    'OLDSMAR': 'Oldsmar',
+    'SAFETY HARBOR': 'Safety Harbor',
+    'LFPW': 'Unincorporated Pinellas (Lealman)',
+    'LEALMAN': 'Unincorporated Pinellas (Lealman)',
+    'UNINCORPORATED': 'Unincorporated Pinellas',
+    'COUNTY': 'Unincorporated Pinellas'
+}
+
+
+def register_city_names(city_lookup: Dict[str, Any]) -> None:
+    """Add the city_app entries of the Pinellas city lookup JSON to PINELLAS_CITY_MAP."""
+    for name, meta in city_lookup.items():
+        if isinstance(meta, dict) and meta.get("type") == "city_app":
+            PINELLAS_CITY_MAP.setdefault(name.strip().upper(), name.strip().upper().title())
+
+
+def expand_city_name(city_abbr: str) -> str:
+    if not city_abbr:
+        return "Unincorporated Pinellas"
+    city_upper = city_abbr.strip().upper()
+    return PINELLAS_CITY_MAP.get(city_upper, city_abbr)
+
+
+def strip_dor_code(land_use_text: str) -> str:
+    if not land_use_text:
+        return ""
+    t = land_use_text.strip()
+    if t and t[0].isdigit():
+        parts = t.split(" ", 1)
+        if len(parts) > 1:
+            return parts[1].strip()
+    return t
+
+
+def parcel_key(parcel_id: str) -> str:
+    """Dash/space-insensitive key for a parcel ID (cache and archive key)."""
+    return re.sub(r"[^0-9A-Za-z]", "", parcel_id or "").upper()
+
+
+def normalize_parcel_id(parcel_id: str) -> str:
+    """Display form ("19-31-17-73166-001-0010") of any accepted spelling; other input is only stripped."""
+    try:
+        return parcel_ids.convert(parcel_id, "Pinellas", to="display")
+    except parcel_ids.InvalidParcelId:
+        return (parcel_id or "").strip()
+
+
+def parcel_strap(normalized_parcel: str) -> str:
+    try:
+        return parcel_ids.convert(normalized_parcel, "Pinellas", to="strap")
+    except parcel_ids.InvalidParcelId:
+        return normalized_parcel.replace("-", "")
+
+
+def details_url(normalized_parcel: str) -> str:
+    return f"{DETAILS_URL}?s={parcel_strap(normalized_parcel)}&input={normalized_parcel}&search_option=parcel_number"
+
+
+def quicksearch_payload(normalized_parcel: str) -> Dict[str, str]:
+    payload = {
+        "draw": "1",
+        "start": "0",
+        "length": "10",
+        "search[value]": "",
+        "search[regex]": "false",
+        "input": normalized_parcel,
+        "searchsort": "parcel_number",
+        "url": "https://www.pcpao.gov",
+    }
+    for i in range(11):
+        payload[f"columns[{i}][data]"] = str(i)
+        payload[f"columns[{i}][name]"] = ""
+        payload[f"columns[{i}][searchable]"] = "true"
+        payload[f"columns[{i}][orderable]"] = "true" if i >= 2 else "false"
+        payload[f"columns[{i}][search][value]"] = ""
+        payload[f"columns[{i}][search][regex]"] = "false"
+    return payload
+
+
+def quicksearch_row(data: Dict[str, Any]) -> Tuple[Optional[List[Any]], str]:
+    """(first result row, "") or (None, error message) for a quicksearch JSON response."""
+    if data.get("recordsTotal", 0) == 0:
+        return None, "Parcel not found in PCPAO database"
+    if not data.get("data"):
+        return None, "No property data returned"
+    return data["data"][0], ""
+
+
+def row_fingerprint(row: List[Any]) -> str:
+    """Hash of a quicksearch row with whitespace normalised; no HTML parsing."""
+    cells = [re.sub(r"\s+", " ", str(cell or "")).strip() for cell in row]
+    return hashlib.sha256(json.dumps(cells).encode("utf-8")).hexdigest()
+
+
+class RevalidationCounters:
+    """Outcomes of revalidating cached parcels, for this process."""
+
+    OUTCOMES = ("not_modified", "row_unchanged", "changed", "full_fetch", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self.counts)
+        revalidated = counts["not_modified"] + counts["row_unchanged"] + counts["changed"]
+        counts["short_circuited"] = counts["not_modified"] + counts["row_unchanged"]
+        counts["short_circuit_ratio"] = counts["short_circuited"] / revalidated if revalidated else 0.0
+        return counts
+
+
+def parse_quicksearch_row(row: List[Any]) -> Dict[str, str]:
+    def cell(i: int) -> str:
+        return BeautifulSoup(row[i] if len(row) > i else "", "lxml").get_text(strip=True)
+
+    return {
+        "owner": cell(2),
+        "address": cell(5),
+        "tax_district": cell(6),
+        "property_use": cell(7),
+        "legal_description": cell(8),
+    }
+
+
+def parse_property_details(html: str) -> Dict[str, Any]:
+    """Land area (sf, acres) and ZIP from the property-details page."""
+    txt = BeautifulSoup(html, "html.parser").get_text(" ", strip=True)
+    sqft = acres = zip_code = None
+    m = re.search(
+        r"Land Area:\s*[^\d]*([\d,]+)\s*sf\s*\|\s*[^\d]*([\d.]+)\s*acres",
+        txt,
+        flags=re.IGNORECASE,
+    )
+    if m:
+        sqft = int(m.group(1).replace(",", ""))
+        acres = float(m.group(2))
+    z = re.search(r"FL\s*(\d{5})", txt)
+    if z:
+        zip_code = z.group(1)
+    return {"sqft": sqft, "acres": acres, "zip": zip_code}
+
+
+# Bump whenever extract_record's output changes. Revalidation only reuses a
+# fingerprinted record parsed by the same version; older ones are re-fetched.
+# 2: version 1 fingerprints may hold records whose details page failed to load.
+PARSER_VERSION = 2
+
+
+def extract_record(normalized_parcel: str, data: Dict[str, Any], details_html: Optional[str]) -> Dict[str, Any]:
+    """Structured parcel record from a quicksearch response and (optionally) the details page."""
+    row, error = quicksearch_row(data)
+    if row is None:
+        return {"success": False, "error": error}
+    fields = parse_quicksearch_row(row)
+    details: Dict[str, Any] = {"sqft": None, "acres": None, "zip": None}
+    if details_html:
+        try:
+            details = parse_property_details(details_html)
+        except Exception:
+            pass
+    sqft, acres = details["sqft"], details["acres"]
+    return {
+        "success": True,
+        "address": fields["address"],
+        "city": expand_city_name(fields["tax_district"]),
+        "zip": details["zip"] or "",
+        "owner": fields["owner"],
+        "land_use": strip_dor_code(fields["property_use"]),
+        "site_area_sqft": f"{sqft:,}" if sqft else "",
+        "site_area_acres": f"{acres:.2f}" if acres else "",
+        "legal_description": fields["legal_description"],
+        "strap": parcel_strap(normalized_parcel),
+    }
+
+
+# -----------------------------------------------------------------------------
+# Offline re-extraction
+# -----------------------------------------------------------------------------
+def _reextract_chunk(args: Tuple[str, List[str], Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    archive_root, keys, city_lookup = args
+    register_city_names(city_lookup)
+    archive = ResponseArchive(archive_root)
+    records = []
+    for key in keys:
+        latest = archive.latest(key)
+        if "quicksearch" not in latest:
+            continue
+        quicksearch = latest["quicksearch"]
+        data = json.loads(archive.text(quicksearch))
+        html = archive.text(latest["details"]) if "details" in latest else None
+        normalized = normalize_parcel_id(quicksearch["parcel_id"])
+        records.append((key, extract_record(normalized, data, html)))
+    return records
+
+
+def reextract(
+    archive_root: Path,
+    city_lookup: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """Yield (parcel_key, record) for every archived parcel, parsed with the current code."""
+    keys = ResponseArchive(archive_root).parcel_keys()
+    chunks = [(str(archive_root), keys[i:i + chunk_size], city_lookup or {}) for i in range(0, len(keys), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for records in pool.map(_reextract_chunk, chunks):
+            yield from records
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("reextract", help="Rebuild parcel records from archived responses (no network).")
+    cmd.add_argument("--archive", default=str(BASE_DIR / "Data" / "response_archive"))
+    cmd.add_argument("--city-lookup", default=str(BASE_DIR / "Data" / "pinellas_county_cities_lookup.json"))
+    cmd.add_argument("--out", default=str(BASE_DIR / "Data" / "parcel_records.jsonl"))
+    cmd.add_argument("--cache-db", default="", help="Also write successful records into this shared SQLite cache.")
+    cmd.add_argument("--ttl", type=float, default=7 * 24 * 3600, help="Cache TTL in seconds for --cache-db.")
+    cmd.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.city_lookup, "r", encoding="utf-8") as f:
+            city_lookup = json.load(f)
+    except (OSError, ValueError):
+        city_lookup = {}
+
+    cache = None
+    if args.cache_db:
+        from cache_backends import SQLiteBackend
+        cache = SQLiteBackend(args.cache_db)
+
+    if cache is not None:
+        # Drops stale entries and tells running workers to discard their local copies.
+        # Fingerprints carry a copy of the record too; revalidating against one would
+        # write the record parsed by the old code back into "parcel".
+        cache.invalidate("parcel")
+        cache.invalidate("parcel_fingerprint")
+
+    started = time.perf_counter()
+    total = ok = 0
+    with open(args.out, "w", encoding="utf-8") as out:
+        for key, record in reextract(Path(args.archive), city_lookup, args.workers):
+            total += 1
+            out.write(json.dumps({"parcel": key, **record}) + "\n")
+            if record.get("success"):
+                ok += 1
+                if cache is not None:
+                    cache.set("parcel", key, record, time.time() + args.ttl)
+    print(f"{total} parcels re-extracted ({ok} ok) in {time.perf_counter() - started:.1f}s -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+cProfile for one rerun, split into named sections.
+
+    profile = RerunProfile(counters={"widgets": count_widgets})
+    with profile.running():
+        with profile.section("render_tab1"):
+            ...
+    profile.top("render_tab1")
+
+Only one cProfile profiler can be active on a thread, so a section pauses
+the enclosing profiler and runs its own; stats() with no section merges
+them back into the whole rerun. The merged cumulative times of functions
+that enclose a section (main, render_app) therefore leave the section out.
+Counters are sampled around each section and their difference stored in
+section_counts.
+
+dump() writes .prof files for `python -m pstats`, snakeviz or gprof2dot.
+When profiling is off, NULL_PROFILE stands in with no-op contexts.
+"""
+
+import cProfile
+import marshal
+import os
+import pstats
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _NullProfile:
+    enabled = False
+
+    def running(self):
+        return nullcontext()
+
+    def section(self, name: str):
+        return nullcontext()
+
+
+NULL_PROFILE = _NullProfile()
+
+
+class RerunProfile:
+    enabled = True
+
+    def __init__(self, counters: Optional[Dict[str, Callable[[], int]]] = None):
+        self.counters = counters or {}
+        self.seconds = 0.0
+        self.section_seconds: Dict[str, float] = {}
+        self.section_counts: Dict[str, Dict[str, int]] = {}
+        self._whole = cProfile.Profile()
+        self._sections: Dict[str, cProfile.Profile] = {}
+        self._active: List[cProfile.Profile] = []
+
+    @contextmanager
+    def running(self):
+        started = time.perf_counter()
+        self._active.append(self._whole)
+        self._whole.enable()
+        try:
+            yield self
+        finally:
+            self._whole.disable()
+            self._active.pop()
+            self.seconds += time.perf_counter() - started
+
+    @contextmanager
+    def section(self, name: str):
+        outer = self._active[-1] if self._active else None
+        if outer is not None:
+            outer.disable()
+        before = {key: count() for key, count in self.counters.items()}
+        profiler = self._sections.setdefault(name, cProfile.Profile())
+        self._active.append(profiler)
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield self
+        finally:
+            profiler.disable()
+            self.section_seconds[name] = self.section_seconds.get(name, 0.0) + time.perf_counter() - started
+            self._active.pop()
+            counts = self.section_counts.setdefault(name, {})
+            for key, count in self.counters.items():
+                counts[key] = counts.get(key, 0) + count() - before[key]
+            if outer is not None:
+                outer.enable()
+
+    @property
+    def sections(self) -> List[str]:
+        return list(self._sections)
+
+    def stats(self, section: Optional[str] = None) -> pstats.Stats:
+        """Stats of one section, or of the whole rerun when section is None."""
+        if section is not None:
+            return pstats.Stats(self._sections[section])
+        stats = pstats.Stats(self._whole)
+        for profiler in self._sections.values():
+            stats.add(profiler)
+        return stats
+
+    def top(self, section: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """The functions with the most cumulative time, as table rows."""
+        rows = []
+        for (filename, line, func), (_, calls, tottime, cumtime, _) in self.stats(section).stats.items():
+            if "_lsprof" in func:
+                continue
+            where = f"{os.path.basename(filename)}:{line}" if line else filename
+            rows.append({
+                "function": f"{func} ({where})" if where != "~" else func,
+                "calls": calls,
+                "cumulative_ms": round(cumtime * 1000, 2),
+                "own_ms": round(tottime * 1000, 2),
+            })
+        rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+        return rows[:limit]
+
+    def to_bytes(self, section: Optional[str] = None) -> bytes:
+        """Contents of a .prof file (the format pstats.Stats.dump_stats writes)."""
+        return marshal.dumps(self.stats(section).stats)
+
+    def dump(self, directory: Path) -> List[Path]:
+        """Write rerun.prof and one <section>.prof per section into directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name in [None] + self.sections:
+            path = directory / f"{name or 'rerun'}.prof"
+            path.write_bytes(self.to_bytes(name))
+            paths.append(path)
+        return paths
@@ -0,0 +1,531 @@
+"""
+Consistency rules for proposals.
+
+Data/proposal_rules.json declares checks over the proposal dict. Each rule
+has an id, a severity ("error" or "warning"), a `when` condition, optional
+named `let` values and a message that may use them. Conditions are small
+Python expressions over the proposal sections (meta, intake, client,
+project, scope, permits, invoice) plus two values that are not stored in the
+body: scope_text (the generated scope, as indexed for search) and total_fee.
+
+    "150" in scope.selected_tasks and intake.county != "Hillsborough"
+        and contains(scope_text, "Hillsborough County", "City of Tampa")
+
+A missing key reads as None instead of raising, and `.field` on a list reads
+that field of every element. Expressions are parsed once with `ast`, checked
+against a short whitelist of node types, names and functions (no underscore
+attributes), and compiled into nested closures; nothing is eval'ed, and
+checking a proposal against the whole set takes well under a millisecond.
+
+The app checks each proposal as it is saved. The stored portfolio is checked
+in parallel, in rowid chunks over worker processes that each compile the
+rules once:
+
+    python proposal_rules.py check [--rules Data/proposal_rules.json]
+    python proposal_rules.py scan [--db Data/proposals.db] [--rules ...]
+                                  [--saved-since 2026-01-01] [--workers N]
+                                  [--out Data/consistency_report.jsonl]
+
+Proposals stored before scope text was indexed have an empty scope_text, so
+rules reading it stay silent for them until they are saved again.
+"""
+
+import argparse
+import ast
+import json
+import operator
+import os
+import re
+import string
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from proposal_store import ProposalStore
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "Data" / "proposal_rules.json"
+
+SECTIONS = ("meta", "intake", "client", "project", "scope", "permits", "invoice")
+CONTEXT = ("scope_text", "total_fee")
+SEVERITIES = ("error", "warning")
+
+Env = Dict[str, Any]
+Compiled = Callable[[Env], Any]
+
+
+class RuleError(ValueError):
+    pass
+
+
+# -----------------------------------------------------------------------------
+# Functions available to rule expressions
+# -----------------------------------------------------------------------------
+def _elements(value: Any) -> Iterable[Any]:
+    if value is None:
+        return ()
+    if isinstance(value, dict):
+        return value.values()
+    if isinstance(value, (list, tuple)):
+        return value
+    return (value,)
+
+
+def _number(value: Any) -> float:
+    """Stored numbers, with "$1,200"-style text and None read as numbers (0 if unreadable)."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        cleaned = re.sub(r"[^\d.\-]", "", value)
+        try:
+            return float(cleaned) if cleaned else 0
+        except ValueError:
+            return 0
+    return 0
+
+
+def _contains(haystack: Any, *needles: str) -> bool:
+    """Case-insensitive: does the text (or any text in a list) contain any of the needles?"""
+    texts = [haystack.lower()] if isinstance(haystack, str) else [str(v).lower() for v in _elements(haystack) if v]
+    return any(needle.lower() in text for needle in needles for text in texts)
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "len": lambda v: len(v) if isinstance(v, (str, list, tuple, dict)) else 0,
+    "sum": lambda v: sum(_number(x) for x in _elements(v)),
+    "min": lambda v: min((_number(x) for x in _elements(v)), default=0),
+    "max": lambda v: max((_number(x) for x in _elements(v)), default=0),
+    "any": lambda v: any(_elements(v)),
+    "all": lambda v: all(_elements(v)),
+    "number": _number,
+    "lower": lambda v: str(v or "").lower(),
+    "contains": _contains,
+    "each": lambda v: list(_elements(v)),
+    "keys": lambda v: list(v) if isinstance(v, dict) else [],
+    "items": lambda v: list(v.items()) if isinstance(v, dict) else [],
+}
+
+
+# -----------------------------------------------------------------------------
+# Compiler
+# -----------------------------------------------------------------------------
+def _step(value: Any, key: Any) -> Any:
+    if isinstance(value, dict):
+        return value.get(key)
+    if isinstance(value, list):
+        if isinstance(key, int):
+            return value[key] if -len(value) <= key < len(value) else None
+        return [_step(v, key) for v in value]
+    return None
+
+
+def _member(item: Any, container: Any) -> bool:
+    return container is not None and item in container
+
+
+_COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: _member,
+    ast.NotIn: lambda item, container: not _member(item, container),
+}
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+}
+
+
+def _literal(node: ast.AST) -> Tuple[bool, Any]:
+    """(True, value) for constants and literal collections, else (False, None)."""
+    if isinstance(node, (ast.Constant, ast.Tuple, ast.List, ast.Set)):
+        try:
+            return True, ast.literal_eval(node)
+        except ValueError:
+            pass
+    return False, None
+
+
+def _path(node: ast.AST) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+    """name.a["b"].c -> ("name", ("a", "b", "c")); None for anything else."""
+    keys: List[Any] = []
+    while True:
+        if isinstance(node, ast.Attribute):
+            keys.append(node.attr)
+            node = node.value
+        elif isinstance(node, ast.Subscript):
+            is_literal, key = _literal(node.slice)
+            if not is_literal or not isinstance(key, (str, int)):
+                return None
+            keys.append(key)
+            node = node.value
+        elif isinstance(node, ast.Name):
+            return node.id, tuple(reversed(keys))
+        else:
+            return None
+
+
+def _targets(node: ast.AST) -> List[str]:
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if isinstance(node, ast.Tuple) and all(isinstance(e, ast.Name) for e in node.elts):
+        return [e.id for e in node.elts]
+    raise RuleError("comprehension targets must be a name or a tuple of names")
+
+
+def _compile(node: ast.AST, names: frozenset) -> Compiled:
+    is_literal, value = _literal(node)
+    if is_literal:
+        return lambda env: value
+
+    path = _path(node)
+    if path is not None:
+        root, keys = path
+        if root not in names:
+            raise RuleError(f"unknown name {root!r}")
+        if not keys:
+            return lambda env: env.get(root)
+
+        def walk(env: Env) -> Any:
+            value = env.get(root)
+            for key in keys:
+                value = _step(value, key)
+            return value
+        return walk
+
+    if isinstance(node, ast.Attribute):
+        base, attr = _compile(node.value, names), node.attr
+        return lambda env: _step(base(env), attr)
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v, names) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def all_of(env: Env) -> Any:
+                result = True
+                for part in parts:
+                    result = part(env)
+                    if not result:
+                        return result
+                return result
+            return all_of
+
+        def any_of(env: Env) -> Any:
+            result = False
+            for part in parts:
+                result = part(env)
+                if result:
+                    return result
+            return result
+        return any_of
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand, names)
+        if isinstance(node.op, ast.Not):
+            return lambda env: not operand(env)
+        if isinstance(node.op, ast.USub):
+            return lambda env: -_number(operand(env))
+        raise RuleError(f"unsupported operator {type(node.op).__name__}")
+
+    if isinstance(node, ast.BinOp):
+        op = _BINARY.get(type(node.op))
+        if op is None:
+            raise RuleError(f"unsupported operator {type(node.op).__name__}")
+        left, right = _compile(node.left, names), _compile(node.right, names)
+        return lambda env: op(left(env), right(env))
+
+    if isinstance(node, ast.Compare):
+        first = _compile(node.left, names)
+        pairs = []
+        for op_node, right_node in zip(node.ops, node.comparators):
+            op = _COMPARE.get(type(op_node))
+            if op is None:
+                raise RuleError(f"unsupported comparison {type(op_node).__name__}")
+            is_literal, value = _literal(right_node)
+            if is_literal and isinstance(op_node, (ast.In, ast.NotIn)) and isinstance(value, (tuple, list, set)):
+                # Literal collections become frozensets once, here, not per proposal.
+                try:
+                    members = frozenset(value)
+                except TypeError:
+                    members = value
+                pairs.append((op, lambda env, members=members: members))
+            else:
+                pairs.append((op, _compile(right_node, names)))
+
+        def compare(env: Env) -> bool:
+            left = first(env)
+            for op, right_fn in pairs:
+                right = right_fn(env)
+                try:
+                    if not op(left, right):
+                        return False
+                except TypeError:
+                    # Ordering against a missing value (None < 3) is simply false.
+                    return False
+                left = right
+            return True
+        return compare
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = (_compile(n, names) for n in (node.test, node.body, node.orelse))
+        return lambda env: body(env) if test(env) else orelse(env)
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise RuleError(f"unknown function {ast.unparse(node.func)!r}")
+        if node.keywords or any(isinstance(a, ast.Starred) for a in node.args):
+            raise RuleError(f"{node.func.id}() takes positional arguments only")
+        func = FUNCTIONS[node.func.id]
+        args = [_compile(a, names) for a in node.args]
+        if len(args) == 1:
+            only = args[0]
+            return lambda env: func(only(env))
+        return lambda env: func(*[a(env) for a in args])
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        elts = [_compile(e, names) for e in node.elts]
+        return lambda env: [e(env) for e in elts]
+
+    if isinstance(node, (ast.ListComp, ast.GeneratorExp)):
+        if len(node.generators) != 1 or node.generators[0].is_async:
+            raise RuleError("comprehensions may have a single for clause")
+        gen = node.generators[0]
+        targets = _targets(gen.target)
+        inner = names | frozenset(targets)
+        source = _compile(gen.iter, names)
+        conditions = [_compile(c, inner) for c in gen.ifs]
+        element = _compile(node.elt, inner)
+
+        def comprehension(env: Env) -> List[Any]:
+            saved = {t: env.get(t) for t in targets}
+            out = []
+            try:
+                for item in source(env) or ():
+                    if len(targets) == 1:
+                        env[targets[0]] = item
+                    else:
+                        env.update(zip(targets, item))
+                    if all(c(env) for c in conditions):
+                        out.append(element(env))
+            finally:
+                env.update(saved)
+            return out
+        return comprehension
+
+    raise RuleError(f"unsupported expression {type(node).__name__}: {ast.unparse(node)!r}")
+
+
+def compile_expression(text: str, names: Iterable[str]) -> Compiled:
+    """Expression text -> fn(env); raises RuleError for syntax or anything off the whitelist."""
+    try:
+        tree = ast.parse(" ".join(str(text).split()), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"syntax error in {text!r}: {e.msg}") from e
+    for node in ast.walk(tree):
+        # Proposal fields never start with an underscore; dunders only reach Python internals.
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            raise RuleError(f"private attribute {node.attr!r} in {text!r}")
+    return _compile(tree.body, frozenset(names))
+
+
+def _display(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_display(v) for v in value)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return "-" if value is None else str(value)
+
+
+# -----------------------------------------------------------------------------
+# Rules
+# -----------------------------------------------------------------------------
+class Rule:
+    __slots__ = ("id", "severity", "message", "description", "_lets", "_when")
+
+    def __init__(self, raw: Dict[str, Any]):
+        try:
+            self.id = str(raw["id"])
+            self.severity = str(raw.get("severity", "warning"))
+            self.message = str(raw["message"])
+            self.description = str(raw.get("description", ""))
+            when = raw["when"]
+            lets = dict(raw.get("let", {}))
+        except (KeyError, TypeError, ValueError) as e:
+            raise RuleError(f"Malformed rule {raw.get('id', '?') if isinstance(raw, dict) else raw!r}: {e}") from e
+        if self.severity not in SEVERITIES:
+            raise RuleError(f"Rule {self.id}: severity must be one of {', '.join(SEVERITIES)}")
+        names = set(SECTIONS) | set(CONTEXT)
+        self._lets: List[Tuple[str, Compiled]] = []
+        try:
+            for name, text in lets.items():
+                self._lets.append((name, compile_expression(text, names)))
+                names.add(name)
+            self._when = compile_expression(when, names)
+        except RuleError as e:
+            raise RuleError(f"Rule {self.id}: {e}") from e
+        for _, field, _, _ in string.Formatter().parse(self.message):
+            if field is not None and field not in lets:
+                raise RuleError(f"Rule {self.id}: message field {{{field}}} is not one of its let values")
+
+    def evaluate(self, env: Env) -> Optional[Dict[str, str]]:
+        """The violation for this proposal, or None."""
+        if self._lets:
+            env = dict(env)
+            for name, fn in self._lets:
+                env[name] = fn(env)
+        if not self._when(env):
+            return None
+        message = self.message
+        if self._lets:
+            message = message.format_map({name: _display(env[name]) for name, _ in self._lets})
+        return {"rule": self.id, "severity": self.severity, "message": message}
+
+
+class RuleSet:
+    """
+    Compiled rules. check() never raises: a rule that fails on an odd
+    proposal is reported as a "rule_error" violation so saving carries on.
+    """
+
+    def __init__(self, raw: Dict[str, Any], error: str = ""):
+        started = time.perf_counter()
+        try:
+            entries = list(raw["rules"])
+        except (KeyError, TypeError) as e:
+            raise RuleError(f"Rules file needs a \"rules\" list: {e}") from e
+        self.rules = [Rule(entry) for entry in entries]
+        ids = [rule.id for rule in self.rules]
+        if len(set(ids)) != len(ids):
+            raise RuleError("Duplicate rule ids")
+        self.compile_seconds = time.perf_counter() - started
+        self.error = error
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def check(self, proposal: Dict[str, Any], **context: Any) -> List[Dict[str, str]]:
+        """Violations as {rule, severity, message}; context supplies scope_text and total_fee."""
+        env = {name: proposal.get(name) for name in SECTIONS}
+        env.update(context)
+        violations = []
+        for rule in self.rules:
+            try:
+                violation = rule.evaluate(env)
+            except Exception as e:
+                violation = {"rule": rule.id, "severity": "rule_error", "message": f"{type(e).__name__}: {e}"}
+            if violation is not None:
+                violations.append(violation)
+        return violations
+
+
+def load_rules(path: Path) -> RuleSet:
+    """Read and compile a rules file; raises RuleError."""
+    try:
+        raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise RuleError(f"Cannot read rules {path}: {e}") from e
+    return RuleSet(raw)
+
+
+# -----------------------------------------------------------------------------
+# Portfolio scan
+# -----------------------------------------------------------------------------
+_worker_rules: Optional[RuleSet] = None
+
+
+def _init_scan_worker(rules_path: str) -> None:
+    global _worker_rules
+    _worker_rules = load_rules(Path(rules_path))
+
+
+def _scan_chunk(args: Tuple[str, int, int, str]) -> Tuple[int, List[Dict[str, Any]]]:
+    db, first_rowid, last_rowid, saved_since = args
+    rows = ProposalStore(db).rule_inputs(first_rowid, last_rowid, saved_since)
+    found = []
+    for row in rows:
+        violations = _worker_rules.check(
+            json.loads(row["body"]), scope_text=row["scope_text"] or "", total_fee=row["total_fee"]
+        )
+        for violation in violations:
+            found.append({
+                "proposal": row["id"],
+                "saved_at": row["saved_at"],
+                "county": row["county"],
+                "project_name": row["project_name"],
+                **violation,
+            })
+    return len(rows), found
+
+
+def scan(
+    db: str,
+    rules_path: Path,
+    saved_since: str = "",
+    workers: Optional[int] = None,
+    chunk_size: int = 2000,
+) -> Iterable[Tuple[int, List[Dict[str, Any]]]]:
+    """Yield (proposals checked, violations) per chunk of the store."""
+    chunks = [
+        (str(db), first, last, saved_since)
+        for first, last in ProposalStore(db).rowid_chunks(chunk_size, saved_since)
+    ]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scan_worker, initargs=(str(rules_path),)) as pool:
+        yield from pool.map(_scan_chunk, chunks)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Validate and compile the rules file")
+    check.add_argument("--rules", type=Path, default=DEFAULT_RULES_PATH)
+    cmd = sub.add_parser("scan", help="Check every stored proposal against the rules")
+    cmd.add_argument("--rules", type=Path, default=DEFAULT_RULES_PATH)
+    cmd.add_argument("--db", default=os.environ.get("PROPOSAL_STORE_PATH", str(Path(__file__).parent / "Data" / "proposals.db")))
+    cmd.add_argument("--saved-since", default="", help="Only proposals saved on or after this ISO date")
+    cmd.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    cmd.add_argument("--out", default=str(Path(__file__).parent / "Data" / "consistency_report.jsonl"))
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.rules)
+    except RuleError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if args.command == "check":
+        for rule in rules.rules:
+            print(f"{rule.id:<32}{rule.severity:<9}{rule.description}")
+        print(f"{len(rules)} rules compiled in {rules.compile_seconds * 1000:.1f} ms")
+        return 0
+
+    started = time.perf_counter()
+    total = 0
+    by_rule: Counter = Counter()
+    flagged = set()
+    with open(args.out, "w", encoding="utf-8") as out:
+        for checked, violations in scan(args.db, args.rules, args.saved_since, args.workers):
+            total += checked
+            for violation in violations:
+                out.write(json.dumps(violation) + "\n")
+                by_rule[(violation["rule"], violation["severity"])] += 1
+                flagged.add(violation["proposal"])
+    seconds = time.perf_counter() - started
+    for (rule_id, severity), count in sorted(by_rule.items(), key=lambda item: -item[1]):
+        print(f"{rule_id:<32}{severity:<11}{count:>8}")
+    print(
+        f"{total} proposals checked in {seconds:.1f}s ({total / max(seconds, 1e-9):,.0f}/s); "
+        f"{len(flagged)} with violations -> {args.out}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,538 @@
+"""
+Local proposal storage.
+
+Proposals are saved as JSON bodies in a SQLite database next to a few
+denormalised columns (county, total fee, permit/service bitsets) used for
+portfolio queries. Every save bumps a monotonically increasing seq so
+in-memory indexes can catch up incrementally, including saves made by other
+worker processes.
+
+Full-text search uses an FTS5 table (rowid = proposals.rowid) that is
+updated in the same transaction as each save, with prefix indexes so
+"clear*"-style queries stay fast at 100k proposals.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional, List, Iterable, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proposals (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    saved_at TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    county TEXT NOT NULL DEFAULT '',
+    project_name TEXT NOT NULL DEFAULT '',
+    total_fee INTEGER NOT NULL DEFAULT 0,
+    permit_bits INTEGER NOT NULL DEFAULT 0,
+    service_bits INTEGER NOT NULL DEFAULT 0,
+    body TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS proposals_seq ON proposals (seq);
+CREATE INDEX IF NOT EXISTS proposals_county_saved ON proposals (county, saved_at);
+CREATE INDEX IF NOT EXISTS proposals_saved ON proposals (saved_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS proposals_fts USING fts5 (
+    parcel, address, owner, city, client, project_name, scope_text,
+    tokenize = 'unicode61', prefix = '2 3 4'
+);
+"""
+
+SEARCH_COLUMNS = ["parcel", "address", "owner", "city", "client", "project_name", "scope_text"]
+
+
+def search_fields(proposal: Dict[str, Any], scope_text: str = "") -> List[str]:
+    """Values for the FTS columns, in SEARCH_COLUMNS order."""
+    intake = proposal.get("intake", {})
+    client = proposal.get("client", {})
+    project = proposal.get("project", {})
+    parcel = intake.get("parcel_id", "") or ""
+    return [
+        # Indexed with and without dashes so either form matches.
+        f"{parcel} {re.sub(r'[^0-9A-Za-z]', '', parcel)}",
+        " ".join(str(intake.get(k, "") or "") for k in ("address", "zip")),
+        intake.get("owner", "") or "",
+        " ".join(str(intake.get(k, "") or "") for k in ("city", "municipality")),
+        " ".join(str(v or "") for v in client.values()),
+        " ".join(str(project.get(k, "") or "") for k in ("project_name", "property_name")),
+        scope_text or "",
+    ]
+
+
+def fts_query(text: str) -> str:
+    """User text -> FTS5 query: every word must match, each as a prefix."""
+    terms = re.findall(r"[0-9A-Za-z]+", text or "")
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+class BitRegistry:
+    """
+    Ordered, append-only list of selection keys; a key's position is its bit.
+    Never reorder or remove entries once proposals have been stored.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = list(keys)
+        self.bit = {k: i for i, k in enumerate(self.keys)}
+        if len(self.bit) != len(self.keys):
+            raise ValueError("Duplicate keys in bit registry")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def encode(self, selected: Iterable[str]) -> int:
+        bits = 0
+        for key in selected:
+            if key in self.bit:
+                bits |= 1 << self.bit[key]
+        return bits
+
+    def decode(self, bits: int) -> List[str]:
+        return [k for i, k in enumerate(self.keys) if bits >> i & 1]
+
+
+class ProposalStore:
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._backfill_search(conn)
+        with self._conn() as conn:
+            self._unique_seq(conn)
+
+    def _backfill_search(self, conn: sqlite3.Connection) -> None:
+        # Databases created before the FTS table existed.
+        if conn.execute("SELECT 1 FROM proposals_fts LIMIT 1").fetchone():
+            return
+        rows = conn.execute("SELECT rowid, body FROM proposals").fetchall()
+        conn.executemany(
+            f"INSERT INTO proposals_fts (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?, {', '.join('?' * len(SEARCH_COLUMNS))})",
+            [(row[0], *search_fields(json.loads(row[1]))) for row in rows],
+        )
+
+    def _unique_seq(self, conn: sqlite3.Connection) -> None:
+        # Databases created while proposals_seq was a plain index. Concurrent
+        # saves could then share a seq; move the later rows past the end so
+        # incremental readers pick them up, then enforce uniqueness.
+        def unique() -> bool:
+            return any(row["name"] == "proposals_seq" and row["unique"] for row in conn.execute("PRAGMA index_list(proposals)"))
+
+        if unique():
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        if unique():
+            # Another worker migrated it while we waited for the lock.
+            return
+        top = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM proposals").fetchone()[0]
+        duplicates = conn.execute(
+            "SELECT rowid FROM proposals p WHERE EXISTS "
+            "(SELECT 1 FROM proposals q WHERE q.seq = p.seq AND q.rowid < p.rowid) ORDER BY rowid"
+        ).fetchall()
+        for seq, row in enumerate(duplicates, top + 1):
+            conn.execute("UPDATE proposals SET seq = ? WHERE rowid = ?", (seq, row[0]))
+        conn.execute("DROP INDEX proposals_seq")
+        conn.execute("CREATE UNIQUE INDEX proposals_seq ON proposals (seq)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def save(
+        self,
+        proposal_id: str,
+        proposal: Dict[str, Any],
+        *,
+        total_fee: int = 0,
+        permit_bits: int = 0,
+        service_bits: int = 0,
+        scope_text: str = "",
+    ) -> int:
+        """Insert or replace a proposal (and its search entry); returns its new seq."""
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        conn = self._conn()
+        with conn:
+            # Take the write lock before reading MAX(seq), so concurrent
+            # savers cannot both allocate the same seq.
+            conn.execute("BEGIN IMMEDIATE")
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM proposals").fetchone()[0]
+            old = conn.execute("SELECT rowid FROM proposals WHERE id = ?", (proposal_id,)).fetchone()
+            if old:
+                conn.execute("DELETE FROM proposals_fts WHERE rowid = ?", (old[0],))
+            cursor = conn.execute(
+                "INSERT OR REPLACE INTO proposals "
+                "(id, seq, saved_at, year, county, project_name, total_fee, permit_bits, service_bits, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    proposal_id,
+                    seq,
+                    saved_at,
+                    int(saved_at[:4]),
+                    proposal.get("intake", {}).get("county", "") or "",
+                    proposal.get("project", {}).get("project_name", "") or "",
+                    int(total_fee or 0),
+                    int(permit_bits),
+                    int(service_bits),
+                    json.dumps(proposal),
+                ),
+            )
+            conn.execute(
+                f"INSERT INTO proposals_fts (rowid, {', '.join(SEARCH_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' * len(SEARCH_COLUMNS))})",
+                (cursor.lastrowid, *search_fields(proposal, scope_text)),
+            )
+        return seq
+
+    def search(
+        self,
+        text: str = "",
+        *,
+        county: str = "",
+        date_from: str = "",
+        date_to: str = "",
+        min_fee: Optional[int] = None,
+        max_fee: Optional[int] = None,
+        limit: int = 50,
+    ) -> List[sqlite3.Row]:
+        """
+        Proposals matching every word of text (prefix match) and the filters,
+        most recently saved first. Dates are ISO strings compared against
+        saved_at (date_to is inclusive).
+        """
+        where, params = [], []
+        if county:
+            where.append("p.county = ?")
+            params.append(county)
+        if date_from:
+            where.append("p.saved_at >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("p.saved_at < ?")
+            params.append(f"{date_to}T99")
+        if min_fee is not None:
+            where.append("p.total_fee >= ?")
+            params.append(int(min_fee))
+        if max_fee is not None:
+            where.append("p.total_fee <= ?")
+            params.append(int(max_fee))
+        columns = "p.id, p.saved_at, p.county, p.project_name, p.total_fee"
+        query = fts_query(text)
+        if query:
+            sql = (
+                f"SELECT {columns} FROM proposals_fts f JOIN proposals p ON p.rowid = f.rowid "
+                f"WHERE proposals_fts MATCH ? {''.join(' AND ' + w for w in where)} "
+                "ORDER BY f.rowid DESC LIMIT ?"
+            )
+            params = [query, *params, limit]
+        else:
+            sql = (
+                f"SELECT {columns} FROM proposals p {'WHERE ' + ' AND '.join(where) if where else ''} "
+                "ORDER BY p.saved_at DESC LIMIT ?"
+            )
+            params = [*params, limit]
+        return self._conn().execute(sql, params).fetchall()
+
+    def load(self, proposal_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT body FROM proposals WHERE id = ?", (proposal_id,)).fetchone()
+        return json.loads(row["body"]) if row else None
+
+    def summaries(self, ids: Iterable[str]) -> List[sqlite3.Row]:
+        ids = list(ids)
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        return self._conn().execute(
+            f"SELECT id, saved_at, county, project_name, total_fee FROM proposals WHERE id IN ({marks}) "
+            "ORDER BY saved_at DESC",
+            ids,
+        ).fetchall()
+
+    def changes_since(self, seq: int) -> List[sqlite3.Row]:
+        return self._conn().execute(
+            "SELECT id, seq, year, permit_bits, service_bits FROM proposals WHERE seq > ? ORDER BY seq",
+            (seq,),
+        ).fetchall()
+
+    def bodies_since(self, seq: int) -> List[Tuple[str, int, Dict[str, Any]]]:
+        rows = self._conn().execute(
+            "SELECT id, seq, body FROM proposals WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+        return [(row["id"], row["seq"], json.loads(row["body"])) for row in rows]
+
+    def max_seq(self) -> int:
+        return self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM proposals").fetchone()[0]
+
+    def recent_parcel_ids(self, limit: int = 20) -> List[str]:
+        """Parcel IDs of the most recently saved proposals, newest first, without duplicates."""
+        rows = self._conn().execute(
+            "SELECT json_extract(body, '$.intake.parcel_id') AS parcel_id, MAX(saved_at) AS saved_at FROM proposals "
+            "WHERE COALESCE(json_extract(body, '$.intake.parcel_id'), '') != '' "
+            "GROUP BY parcel_id ORDER BY saved_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [row["parcel_id"] for row in rows]
+
+    def rows(self) -> Iterable[Dict[str, Any]]:
+        """Every stored proposal as a dict of its columns, with body decoded."""
+        cursor = self._conn().execute(
+            "SELECT id, saved_at, year, county, project_name, total_fee, permit_bits, service_bits, body "
+            "FROM proposals ORDER BY seq"
+        )
+        for row in cursor:
+            record = dict(row)
+            record["body"] = json.loads(record["body"])
+            yield record
+
+    def pricing_items(self, saved_since: str = "") -> Tuple[List[sqlite3.Row], List[sqlite3.Row]]:
+        """
+        Priced fields of every proposal saved on or after `saved_since`, read
+        with SQLite's JSON functions instead of decoding each body:
+        (rowid, id, rate_card_version, total_fee, services_total_cost) per
+        proposal, and (rowid, kind, item, value, hours, included) per task
+        fee ("task"), Task 310 service rate ("task_310") and additional
+        service fee ("service").
+        """
+        conn = self._conn()
+        proposals = conn.execute(
+            "SELECT rowid, id, COALESCE(json_extract(body, '$.meta.rate_card_version'), 0), total_fee, "
+            "json_extract(body, '$.scope.selected_tasks.\"310\".services_total_cost') "
+            "FROM proposals WHERE saved_at >= ?",
+            (saved_since,),
+        ).fetchall()
+        items = conn.execute(
+            """
+            SELECT p.rowid, 'task', t.key, json_extract(t.value, '$.fee'), NULL, 1
+            FROM proposals p, json_each(p.body, '$.scope.selected_tasks') t WHERE p.saved_at >= ?1
+            UNION ALL
+            SELECT p.rowid, 'task_310', s.key, json_extract(s.value, '$.rate'), json_extract(s.value, '$.hours'),
+                   json_extract(s.value, '$.included')
+            FROM proposals p, json_each(p.body, '$.scope.selected_tasks."310".services') s WHERE p.saved_at >= ?1
+            UNION ALL
+            SELECT p.rowid, 'service', a.key, a.value, NULL, 1
+            FROM proposals p, json_each(p.body, '$.permits.included_additional_services_with_fees') a WHERE p.saved_at >= ?1
+            """,
+            (saved_since,),
+        ).fetchall()
+        return proposals, items
+
+    def bodies(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = list(ids)
+        found: Dict[str, Dict[str, Any]] = {}
+        conn = self._conn()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, body FROM proposals WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((row["id"], json.loads(row["body"])) for row in rows)
+        return found
+
+    def update_bodies(
+        self,
+        updates: Iterable[Tuple[str, Dict[str, Any], int]],
+        scope_text: Optional[Callable[[str], str]] = None,
+    ) -> int:
+        """
+        Rewrite (id, body, total_fee) in one transaction for bulk edits that
+        leave the bitset columns alone. Each row gets a new seq so indexes
+        pick the change up, and its search entry is rebuilt from the new
+        body where that changes what is indexed. The generated scope text cannot be rebuilt here (it comes from
+        app.py), so the indexed one is kept, passed through `scope_text` if
+        given.
+        """
+        conn = self._conn()
+        count = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM proposals").fetchone()[0]
+            for proposal_id, body, total_fee in updates:
+                row = conn.execute(
+                    f"SELECT p.rowid, {', '.join('f.' + c for c in SEARCH_COLUMNS)} "
+                    "FROM proposals p LEFT JOIN proposals_fts f ON f.rowid = p.rowid WHERE p.id = ?",
+                    (proposal_id,),
+                ).fetchone()
+                if row is None:
+                    continue
+                seq += 1
+                count += conn.execute(
+                    "UPDATE proposals SET body = ?, total_fee = ?, seq = ? WHERE id = ?",
+                    (json.dumps(body), int(total_fee), seq, proposal_id),
+                ).rowcount
+                text = row["scope_text"] or ""
+                if scope_text is not None:
+                    text = scope_text(text)
+                fields = search_fields(body, text)
+                if fields == [row[c] for c in SEARCH_COLUMNS]:
+                    # Re-pricing rarely touches searchable text; FTS rewrites are the slow part.
+                    continue
+                conn.execute("DELETE FROM proposals_fts WHERE rowid = ?", (row["rowid"],))
+                conn.execute(
+                    f"INSERT INTO proposals_fts (rowid, {', '.join(SEARCH_COLUMNS)}) "
+                    f"VALUES (?, {', '.join('?' * len(SEARCH_COLUMNS))})",
+                    (row["rowid"], *fields),
+                )
+        return count
+
+    def rowid_chunks(self, chunk_size: int, saved_since: str = "") -> List[Tuple[int, int]]:
+        """(first, last) rowid ranges of about chunk_size proposals each, for batch jobs."""
+        rowids = [
+            row[0] for row in self._conn().execute(
+                "SELECT rowid FROM proposals WHERE saved_at >= ? ORDER BY rowid", (saved_since,)
+            )
+        ]
+        return [
+            (rowids[i], rowids[min(i + chunk_size, len(rowids)) - 1])
+            for i in range(0, len(rowids), chunk_size)
+        ]
+
+    def rule_inputs(self, first_rowid: int, last_rowid: int, saved_since: str = "") -> List[sqlite3.Row]:
+        """
+        (id, saved_at, county, project_name, total_fee, body, scope_text) for
+        proposals in a rowid range; body is left as JSON text and scope_text
+        comes from the search index.
+        """
+        return self._conn().execute(
+            "SELECT p.id, p.saved_at, p.county, p.project_name, p.total_fee, p.body, f.scope_text "
+            "FROM proposals p LEFT JOIN proposals_fts f ON f.rowid = p.rowid "
+            "WHERE p.rowid BETWEEN ? AND ? AND p.saved_at >= ?",
+            (first_rowid, last_rowid, saved_since),
+        ).fetchall()
+
+    def iter_bodies(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        for row in self._conn().execute("SELECT id, body FROM proposals ORDER BY seq"):
+            yield row["id"], json.loads(row["body"])
+
+
+class BitmapIndex:
+    """
+    Per-bit bitmaps (Python ints, one bit per stored proposal) over permit and
+    service bitsets plus per-year bitmaps. A combinational query is a handful
+    of big-int ANDs regardless of how many proposals are stored.
+    """
+
+    def __init__(self, store: ProposalStore, permit_count: int, service_count: int):
+        self.store = store
+        self.seq = 0
+        self.ids: List[str] = []
+        self.slot: Dict[str, int] = {}
+        self.rows: List[Tuple[int, int, int]] = []  # (year, permit_bits, service_bits) per slot
+        self.permits = [0] * permit_count
+        self.services = [0] * service_count
+        self.years: Dict[int, int] = {}
+        self.last_query_ms = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _apply(bitmaps: List[int], bits: int, slot_bit: int, on: bool) -> None:
+        i = 0
+        while bits:
+            if bits & 1 and i < len(bitmaps):
+                bitmaps[i] = bitmaps[i] | slot_bit if on else bitmaps[i] & ~slot_bit
+            bits >>= 1
+            i += 1
+
+    def _set(self, slot: int, row: Tuple[int, int, int], on: bool) -> None:
+        year, permit_bits, service_bits = row
+        slot_bit = 1 << slot
+        self._apply(self.permits, permit_bits, slot_bit, on)
+        self._apply(self.services, service_bits, slot_bit, on)
+        if on:
+            self.years[year] = self.years.get(year, 0) | slot_bit
+        else:
+            self.years[year] = self.years.get(year, 0) & ~slot_bit
+
+    def _append(self, rows: List[Tuple[int, int, int]]) -> None:
+        # Bulk path for new slots: set bits in bytearrays and OR each bitmap
+        # once, instead of one big-int OR per proposal (quadratic on rebuild).
+        base = len(self.rows)
+        nbytes = (base + len(rows) + 7) // 8
+        buffers: Dict[Any, bytearray] = {}
+        for offset, (year, permit_bits, service_bits) in enumerate(rows):
+            slot = base + offset
+            byte, mask = slot >> 3, 1 << (slot & 7)
+            for kind, bits in (("p", permit_bits), ("s", service_bits)):
+                i = 0
+                while bits:
+                    if bits & 1:
+                        buf = buffers.get((kind, i))
+                        if buf is None:
+                            buf = buffers[(kind, i)] = bytearray(nbytes)
+                        buf[byte] |= mask
+                    bits >>= 1
+                    i += 1
+            buf = buffers.get(("y", year))
+            if buf is None:
+                buf = buffers[("y", year)] = bytearray(nbytes)
+            buf[byte] |= mask
+        self.rows.extend(rows)
+        for (kind, i), buf in buffers.items():
+            added = int.from_bytes(buf, "little")
+            if kind == "y":
+                self.years[i] = self.years.get(i, 0) | added
+            elif kind == "p" and i < len(self.permits):
+                self.permits[i] |= added
+            elif kind == "s" and i < len(self.services):
+                self.services[i] |= added
+
+    def refresh(self) -> int:
+        """Pull saves made since the last refresh (this or any other process)."""
+        with self._lock:
+            changes = self.store.changes_since(self.seq)
+            appended: List[Tuple[int, int, int]] = []
+            for change in changes:
+                row = (change["year"], change["permit_bits"], change["service_bits"])
+                slot = self.slot.get(change["id"])
+                if slot is None:
+                    self.slot[change["id"]] = len(self.ids)
+                    self.ids.append(change["id"])
+                    appended.append(row)
+                elif slot >= len(self.rows):
+                    appended[slot - len(self.rows)] = row
+                else:
+                    self._set(slot, self.rows[slot], False)
+                    self.rows[slot] = row
+                    self._set(slot, row, True)
+                self.seq = change["seq"]
+            if appended:
+                self._append(appended)
+            return len(changes)
+
+    def query(
+        self,
+        permit_bits: int = 0,
+        service_bits: int = 0,
+        years: Optional[Iterable[int]] = None,
+    ) -> List[str]:
+        """Ids of proposals having ALL given permit and service bits, in any of years."""
+        self.refresh()
+        started = time.perf_counter()
+        result = (1 << len(self.ids)) - 1
+        for bitmaps, bits in ((self.permits, permit_bits), (self.services, service_bits)):
+            i = 0
+            while bits and result:
+                if bits & 1:
+                    result &= bitmaps[i] if i < len(bitmaps) else 0
+                bits >>= 1
+                i += 1
+        if years:
+            year_mask = 0
+            for y in years:
+                year_mask |= self.years.get(int(y), 0)
+            result &= year_mask
+        ids = []
+        flags = bin(result)[:1:-1]  # slot 0 first
+        slot = flags.find("1")
+        while slot != -1:
+            ids.append(self.ids[slot])
+            slot = flags.find("1", slot + 1)
+        self.last_query_ms = (time.perf_counter() - started) * 1000
+        return ids
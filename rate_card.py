@@ -0,0 +1,415 @@
+"""
+Rate card: task fees, Task 310 hours and rates, and additional service fees.
+
+Data/rate_card.json holds every version of the card, oldest first; the
+highest version is the live one. To change rates, append a copy of the last
+version with a higher "version" and edit it. Workers pick the change up on
+the next rerun without a restart (RateCardWatcher), and older versions stay
+in the file so stored proposals can be re-priced against what they were
+priced with. Additional service keys are bit positions in stored proposals
+(proposal_store.BitRegistry), so a new version may only append to them.
+
+Re-pricing moves stored proposals onto a newer card. A fee or rate that
+still equals its default on the card the proposal was priced with is
+re-priced to the new default; anything entered by hand is left alone. The
+pass over the store is vectorized: stored fees come out of SQLite as one
+long table (json_each), defaults are joined on, and only proposals that
+change are rewritten.
+
+    python rate_card.py check [--card Data/rate_card.json]
+    python rate_card.py reprice [--db Data/proposals.db] [--card Data/rate_card.json]
+                                [--to VERSION] [--saved-since 2026-01-01]
+                                [--report diff.csv] [--apply]
+
+reprice is a dry run that prints the diff summary unless --apply is given.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from proposal_store import ProposalStore
+
+DEFAULT_CARD_PATH = Path(__file__).parent / "Data" / "rate_card.json"
+
+# Task 310 services every version must keep: app.py summarises their hours
+# into selected_tasks["310"]["hours"] under these names for the documents.
+TASK_310_HOURS_KEYS = {
+    "shop_drawings": "shop_drawing",
+    "rfi": "rfi",
+    "oac": "oac_meetings",
+    "site_visits": "site_visits",
+    "record_drawings": "record_drawing",
+}
+
+
+class RateCardError(ValueError):
+    pass
+
+
+class RateCard:
+    """One version of the card, in the shapes app.py uses (DEFAULT_FEES, TASK_310_SERVICES, ...)."""
+
+    def __init__(self, raw: Dict[str, Any]):
+        try:
+            self.version = int(raw["version"])
+            self.effective = str(raw.get("effective", ""))
+            self.default_hourly_rate = float(raw["default_hourly_rate"])
+            self.default_fees = {
+                str(num): {"name": str(t["name"]), "amount": int(t["amount"]), "type": str(t.get("type", ""))}
+                for num, t in raw["tasks"].items()
+            }
+            task_310 = raw["task_310"]
+            self.task_310_services = [
+                (str(s["key"]), str(s["name"]), int(s["hours"]), int(s["rate"]), int(s["cost"]))
+                for s in task_310["services"]
+            ]
+            self.task_310_default_included = set(task_310.get("default_included", []))
+            self.task_310_hourly = set(task_310.get("hourly", []))
+            self.additional_services = [
+                (str(s["key"]), str(s["name"]), bool(s.get("default_checked", False)), int(s["fee"]))
+                for s in raw["additional_services"]
+            ]
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise RateCardError(f"Malformed rate card version {raw.get('version', '?')}: {type(e).__name__}: {e}") from e
+        for name, keys in (
+            ("Task 310 service", [s[0] for s in self.task_310_services]),
+            ("additional service", [s[0] for s in self.additional_services]),
+        ):
+            if len(set(keys)) != len(keys):
+                raise RateCardError(f"Duplicate {name} keys in rate card version {self.version}")
+        missing = set(TASK_310_HOURS_KEYS) - {s[0] for s in self.task_310_services}
+        if missing:
+            raise RateCardError(
+                f"Rate card version {self.version} is missing Task 310 services {', '.join(sorted(missing))}"
+            )
+
+    @property
+    def service_keys(self) -> List[str]:
+        return [key for key, _, _, _ in self.additional_services]
+
+    def task_310_default_rate(self, key: str, rate: float) -> float:
+        # task_310_frame: services without a rate of their own bill at the
+        # default hourly rate when they are hourly, otherwise at 0.
+        return float(rate or (self.default_hourly_rate if key in self.task_310_hourly else 0))
+
+    def defaults(self) -> pd.DataFrame:
+        """Long table of (kind, key, name, default) for re-pricing."""
+        rows = [("task", num, t["name"], float(t["amount"])) for num, t in self.default_fees.items()]
+        rows += [
+            ("task_310", key, name, self.task_310_default_rate(key, rate))
+            for key, name, _, rate, _ in self.task_310_services
+        ]
+        rows += [("service", key, name, float(fee)) for key, name, _, fee in self.additional_services]
+        return pd.DataFrame(rows, columns=["kind", "key", "name", "default"])
+
+
+def load_rate_cards(path: Path) -> Dict[int, RateCard]:
+    """Every version in the file, by version number; raises RateCardError."""
+    try:
+        raw = json.loads(Path(path).read_text(encoding="utf-8"))
+        versions = raw["versions"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise RateCardError(f"Cannot read rate card {path}: {e}") from e
+    cards: Dict[int, RateCard] = {}
+    previous: Optional[RateCard] = None
+    for entry in versions:
+        card = RateCard(entry)
+        if previous is not None:
+            if card.version <= previous.version:
+                raise RateCardError(f"Rate card versions must increase ({previous.version} then {card.version})")
+            check_append_only(previous, card)
+        cards[card.version] = previous = card
+    if not cards:
+        raise RateCardError(f"Rate card {path} has no versions")
+    return cards
+
+
+def check_append_only(old: RateCard, new: RateCard) -> None:
+    keys = new.service_keys
+    if keys[:len(old.service_keys)] != old.service_keys:
+        raise RateCardError(
+            f"Rate card version {new.version} reorders or removes additional services; "
+            "their keys are stored bit positions, so new services may only be appended"
+        )
+
+
+class RateCardWatcher:
+    """
+    Live rate card, reloaded when the file changes. The file is stat'ed at
+    most every check_interval seconds. A new version replaces the old one in
+    a single reference swap, so a rerun that took a card keeps using it
+    throughout; a file that fails to load is reported and the old card stays.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 2.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.error = ""
+        self.reloads = 0
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._signature = self._stat()
+        self._cards = load_rate_cards(self.path)
+        self.loaded_at = time.time()
+
+    def _stat(self) -> Tuple[int, int]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return (0, 0)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def cards(self) -> Dict[int, RateCard]:
+        self._maybe_reload()
+        return self._cards
+
+    def current(self) -> RateCard:
+        cards = self.cards
+        return cards[max(cards)]
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            signature = self._stat()
+            if signature == self._signature:
+                return
+            self._signature = signature
+            try:
+                cards = load_rate_cards(self.path)
+                live = self._cards[max(self._cards)]
+                check_append_only(live, cards[max(cards)])
+            except RateCardError as e:
+                self.error = str(e)
+                return
+            self._cards = cards
+            self.error = ""
+            self.reloads += 1
+            self.loaded_at = time.time()
+
+
+# -----------------------------------------------------------------------------
+# Re-pricing stored proposals
+# -----------------------------------------------------------------------------
+def plan_repricing(
+    proposals: pd.DataFrame,
+    items: pd.DataFrame,
+    cards: Dict[int, RateCard],
+    target: int,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    proposals: rowid, id, version, total_fee, services_total_cost (one row each).
+    items: rowid, kind (task / task_310 / service), item, value, hours, included.
+
+    Returns (changes, totals): one row per re-priced or renamed item
+    (id, kind, key, item, new_item, old, new) and one row per changed
+    proposal (id, old_total, new_total, services_total_cost).
+    """
+    oldest = min(cards)
+    new_card = cards[target]
+    proposals = proposals.assign(version=proposals["version"].where(proposals["version"] > 0, oldest))
+    proposals = proposals[proposals["version"] < target]
+    old_defaults = pd.concat(
+        [card.defaults().assign(version=v) for v, card in cards.items() if v < target],
+        ignore_index=True,
+    )
+    new_defaults = new_card.defaults().rename(columns={"name": "new_name", "default": "new_default"})
+
+    frame = items.merge(proposals[["rowid", "version"]], on="rowid")
+    # Task and Task 310 items are stored by key, additional services by name.
+    by_name = frame["kind"] == "service"
+    named = frame[by_name].merge(
+        old_defaults[old_defaults["kind"] == "service"][["version", "name", "key"]],
+        left_on=["version", "item"], right_on=["version", "name"], how="left",
+    ).drop(columns="name")
+    frame = pd.concat([frame[~by_name].assign(key=frame.loc[~by_name, "item"]), named], ignore_index=True)
+    frame = frame.merge(old_defaults.drop(columns="name"), on=["version", "kind", "key"], how="left")
+    frame = frame.merge(new_defaults, on=["kind", "key"], how="left")
+
+    value = frame["value"].to_numpy(dtype=float)
+    old_default = frame["default"].to_numpy(dtype=float)
+    new_default = frame["new_default"].to_numpy(dtype=float)
+    included = frame["included"].fillna(1).to_numpy(dtype=bool)
+    repriced = (value == old_default) & ~np.isnan(new_default) & (old_default != new_default) & included
+    frame["new_value"] = np.where(repriced, new_default, value)
+    frame["repriced"] = repriced
+    renamed = (
+        (frame["kind"] == "service").to_numpy()
+        & frame["new_name"].notna().to_numpy()
+        & (frame["new_name"] != frame["item"]).to_numpy()
+    )
+    frame["new_item"] = np.where(renamed, frame["new_name"], frame["item"])
+    frame["renamed"] = renamed
+
+    # Task 310 totals are recomputed like task_310_frame: whole-dollar cost per service.
+    is_310 = (frame["kind"] == "task_310").to_numpy()
+    hours = frame["hours"].fillna(0).to_numpy(dtype=float)
+    cost = np.where(is_310 & included, np.trunc(hours * np.nan_to_num(frame["new_value"].to_numpy(dtype=float))), 0)
+    frame["cost"] = cost
+    frame["delta"] = np.where(repriced & ~is_310, new_default - value, 0.0)
+    frame["repriced_310"] = repriced & is_310
+
+    per_row = frame.groupby("rowid").agg(
+        delta=("delta", "sum"),
+        repriced_310=("repriced_310", "any"),
+        changed=("repriced", "any"),
+        renamed=("renamed", "any"),
+        cost_310=("cost", "sum"),
+    )
+    per_row = per_row[per_row["changed"] | per_row["renamed"]]
+    totals = proposals.set_index("rowid").loc[per_row.index, ["id", "total_fee", "services_total_cost"]].copy()
+    stored_310 = totals["services_total_cost"].fillna(0).to_numpy(dtype=float)
+    new_310 = np.where(per_row["repriced_310"], per_row["cost_310"], stored_310)
+    totals["services_total_cost"] = np.where(per_row["repriced_310"], new_310, totals["services_total_cost"])
+    totals["new_total"] = (totals["total_fee"] + per_row["delta"] + (new_310 - stored_310)).round().astype("int64")
+    totals = totals.rename(columns={"total_fee": "old_total"}).reset_index()
+
+    changed = frame[frame["repriced"] | frame["renamed"]].merge(proposals[["rowid", "id"]], on="rowid")
+    changes = changed[["id", "kind", "key", "item", "new_item", "value", "new_value"]].rename(
+        columns={"value": "old", "new_value": "new"}
+    )
+    return changes.reset_index(drop=True), totals[["id", "old_total", "new_total", "services_total_cost"]]
+
+
+def apply_changes(body: Dict[str, Any], changes: List[Dict[str, Any]], services_total_cost: Any, version: int) -> Dict[str, Any]:
+    """Write one proposal's planned changes (rows of plan_repricing's changes) into its body."""
+    tasks = body.get("scope", {}).get("selected_tasks", {})
+    permits = body.get("permits", {})
+    renames = {}
+    for change in changes:
+        if change["kind"] == "task":
+            tasks[change["item"]]["fee"] = int(change["new"])
+        elif change["kind"] == "task_310":
+            service = tasks["310"]["services"][change["item"]]
+            service["rate"] = float(change["new"])
+            service["cost"] = int(np.trunc(float(service.get("hours") or 0) * float(change["new"])))
+        elif change["kind"] == "service":
+            renames[change["item"]] = (change["new_item"], int(change["new"]))
+    if renames:
+        fees = permits.get("included_additional_services_with_fees", {})
+        permits["included_additional_services_with_fees"] = {
+            renames.get(name, (name,))[0]: renames[name][1] if name in renames else fee for name, fee in fees.items()
+        }
+        for listing in ("included_additional_services", "excluded_additional_services"):
+            permits[listing] = [renames.get(name, (name,))[0] for name in permits.get(listing) or []]
+    if "310" in tasks and services_total_cost is not None and not pd.isna(services_total_cost):
+        tasks["310"]["services_total_cost"] = int(services_total_cost)
+    body.setdefault("meta", {})["rate_card_version"] = version
+    return body
+
+
+def reprice(
+    store: ProposalStore,
+    cards: Dict[int, RateCard],
+    target: Optional[int] = None,
+    saved_since: str = "",
+    apply: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Plan (and with apply=True, write) re-pricing onto card `target` (default: latest)."""
+    target = max(cards) if target is None else target
+    if target not in cards:
+        raise RateCardError(f"No rate card version {target}")
+    proposal_rows, item_rows = store.pricing_items(saved_since)
+    proposals = pd.DataFrame(
+        [tuple(r) for r in proposal_rows], columns=["rowid", "id", "version", "total_fee", "services_total_cost"]
+    )
+    items = pd.DataFrame(
+        [tuple(r) for r in item_rows], columns=["rowid", "kind", "item", "value", "hours", "included"]
+    )
+    if proposals.empty or items.empty:
+        return pd.DataFrame(columns=["id", "kind", "key", "item", "new_item", "old", "new"]), pd.DataFrame(
+            columns=["id", "old_total", "new_total", "services_total_cost"]
+        )
+    items["value"] = pd.to_numeric(items["value"], errors="coerce")
+    items["hours"] = pd.to_numeric(items["hours"], errors="coerce")
+    changes, totals = plan_repricing(proposals, items, cards, target)
+    if apply and not totals.empty:
+        by_id: Dict[str, List[Dict[str, Any]]] = {}
+        for change in changes.to_dict("records"):
+            by_id.setdefault(change["id"], []).append(change)
+        bodies = store.bodies(totals["id"].tolist())
+        # Included services are listed one per line in the indexed scope text.
+        renamed = changes[(changes["kind"] == "service") & (changes["item"] != changes["new_item"])]
+        renames = dict(zip(renamed["item"], renamed["new_item"]))
+        store.update_bodies(
+            (
+                (
+                    row["id"],
+                    apply_changes(bodies[row["id"]], by_id.get(row["id"], []), row["services_total_cost"], target),
+                    row["new_total"],
+                )
+                for row in totals.to_dict("records")
+                if row["id"] in bodies
+            ),
+            scope_text=(lambda text: "\n".join(renames.get(line, line) for line in text.split("\n"))) if renames else None,
+        )
+    return changes, totals
+
+
+def print_summary(changes: pd.DataFrame, totals: pd.DataFrame, target: int, applied: bool) -> None:
+    verb = "Re-priced" if applied else "Would re-price"
+    print(f"{verb} {len(totals)} proposal(s) onto rate card version {target}: {len(changes)} line change(s)")
+    if totals.empty:
+        return
+    delta = int((totals["new_total"] - totals["old_total"]).sum())
+    print(f"Total fees {int(totals['old_total'].sum()):,} -> {int(totals['new_total'].sum()):,} ({delta:+,})")
+    summary = changes.assign(renamed=changes["item"] != changes["new_item"])
+    summary = summary.groupby(["kind", "key", "old", "new", "renamed"]).size().reset_index(name="proposals")
+    print(summary.to_string(index=False))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rate card tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Validate the rate card file")
+    check.add_argument("--card", type=Path, default=DEFAULT_CARD_PATH)
+    rep = sub.add_parser("reprice", help="Re-price stored proposals onto a newer card (dry run by default)")
+    rep.add_argument("--card", type=Path, default=DEFAULT_CARD_PATH)
+    rep.add_argument("--db", default=os.environ.get("PROPOSAL_STORE_PATH", str(Path(__file__).parent / "Data" / "proposals.db")))
+    rep.add_argument("--to", type=int, help="Target version (default: latest)")
+    rep.add_argument("--saved-since", default="", help="Only proposals saved on or after this ISO date")
+    rep.add_argument("--report", type=Path, help="Write the line-by-line diff to this CSV")
+    rep.add_argument("--apply", action="store_true", help="Write the changes (default is a dry run)")
+    args = parser.parse_args(argv)
+
+    try:
+        cards = load_rate_cards(args.card)
+    except RateCardError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if args.command == "check":
+        for version, card in cards.items():
+            print(
+                f"version {version} (effective {card.effective or '-'}): {len(card.default_fees)} tasks, "
+                f"{len(card.task_310_services)} Task 310 services, {len(card.additional_services)} additional services"
+            )
+        return 0
+
+    started = time.perf_counter()
+    target = max(cards) if args.to is None else args.to
+    changes, totals = reprice(ProposalStore(args.db), cards, target, args.saved_since, apply=args.apply)
+    print_summary(changes, totals, target, args.apply)
+    if args.report:
+        changes.merge(totals, on="id").to_csv(args.report, index=False)
+        print(f"Diff written to {args.report}")
+    print(f"({time.perf_counter() - started:.2f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
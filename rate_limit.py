@@ -0,0 +1,129 @@
+"""
+Host-wide token bucket for outbound requests.
+
+Every worker process (and batch script) on the host shares one bucket kept
+in a small JSON state file guarded by an exclusive flock, so the combined
+request rate to a site stays under `rate` per second with bursts of up to
+`burst`. Callers take a token per request in a lane:
+
+- "interactive" (Tab 1 lookups) may use any available token
+- "batch" only takes a token while none is being waited for interactively
+  and `reserve` tokens remain, so a person clicking Lookup is never queued
+  behind a batch job
+
+Waiters register in the state file with a deadline, which gives a host-wide
+queue depth per lane and lets a crashed process's entries expire on their own.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: the bucket is only shared between threads of one process
+    fcntl = None
+
+LANES = ("interactive", "batch")
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, path: Path, rate: float = 2.0, burst: float = 5.0, reserve: float = 1.0):
+        self.path = Path(path)
+        self.rate = rate
+        self.burst = burst
+        self.reserve = min(reserve, max(burst - 1, 0))
+        self._thread_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.counters: Dict[str, Dict[str, float]] = {
+            lane: {"acquired": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0} for lane in LANES
+        }
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        with self._thread_lock, open(self.path, "a+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                now = time.time()
+                tokens = float(state.get("tokens", self.burst))
+                updated = float(state.get("updated", now))
+                state["tokens"] = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                state["updated"] = now
+                waiting = state.setdefault("waiting", {})
+                for lane in LANES:
+                    waiting[lane] = {k: d for k, d in waiting.get(lane, {}).items() if d > now}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self, lane: str = "interactive", timeout: float = 30.0) -> float:
+        """Take one token, waiting up to timeout seconds. Returns the time waited."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane!r}; expected one of {LANES}")
+        started = time.monotonic()
+        deadline = time.time() + timeout
+        ticket = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        registered = False
+        floor = 1.0 if lane == "interactive" else 1.0 + self.reserve
+        while True:
+            with self._state() as state:
+                waiting = state["waiting"]
+                blocked = lane == "batch" and bool(waiting["interactive"])
+                granted = state["tokens"] >= floor and not blocked
+                expired = not granted and time.time() >= deadline
+                if granted:
+                    state["tokens"] -= 1.0
+                if granted or expired:
+                    waiting[lane].pop(ticket, None)
+                elif not registered:
+                    waiting[lane][ticket] = deadline + 1.0
+                    registered = True
+                shortfall = max(floor - state["tokens"], 0.0)
+            if granted or expired:
+                waited = time.monotonic() - started
+                self._record(lane, waited, timed_out=expired)
+                if expired:
+                    raise RateLimitTimeout(f"No {lane} request slot within {timeout:g} s")
+                return waited
+            time.sleep(max(min(shortfall / self.rate, 0.25, deadline - time.time()), 0.01))
+
+    def _record(self, lane: str, waited: float, timed_out: bool = False) -> None:
+        with self._metrics_lock:
+            counters = self.counters[lane]
+            counters["timeouts" if timed_out else "acquired"] += 1
+            counters["wait_seconds"] += waited
+            counters["max_wait_seconds"] = max(counters["max_wait_seconds"], waited)
+
+    def metrics(self) -> Dict[str, Any]:
+        """This process's per-lane counters plus the host-wide queue depth and tokens left."""
+        with self._state() as state:
+            depth = {lane: len(state["waiting"][lane]) for lane in LANES}
+            tokens = state["tokens"]
+        with self._metrics_lock:
+            lanes = {lane: dict(c, queue_depth=depth[lane]) for lane, c in self.counters.items()}
+        for counters in lanes.values():
+            done = counters["acquired"] + counters["timeouts"]
+            counters["mean_wait_seconds"] = counters["wait_seconds"] / done if done else 0.0
+        return {"tokens": tokens, "rate": self.rate, "burst": self.burst, "lanes": lanes}
@@ -0,0 +1,124 @@
+"""
+Content-addressed archive of raw HTTP responses.
+
+Response bodies are stored once per SHA-256 of their bytes under
+`<root>/objects/<2 hex>/<62 hex>.<zz|xz>` (zlib by default, lzma when
+space matters more than speed), so re-fetching an unchanged page costs no
+extra disk. A small SQLite index records every fetch: which parcel, which
+kind of response, the URL, the digest, the text encoding and when it was
+fetched. Parsers can then be rerun over the archive without the network.
+"""
+
+import hashlib
+import lzma
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parcel TEXT NOT NULL,
+    parcel_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    encoding TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fetches_parcel_kind ON fetches (parcel, kind, id);
+CREATE INDEX IF NOT EXISTS fetches_digest ON fetches (digest);
+"""
+
+CODECS = {
+    "zlib": (".zz", lambda b: zlib.compress(b, 6), zlib.decompress),
+    "lzma": (".xz", lambda b: lzma.compress(b, preset=6), lzma.decompress),
+}
+
+
+class ResponseArchive:
+    def __init__(self, root: Path, compression: str = "zlib"):
+        if compression not in CODECS:
+            raise ValueError(f"Unknown compression {compression!r}; expected one of {sorted(CODECS)}")
+        self.root = Path(root)
+        self.compression = compression
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.root / "index.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _object_path(self, digest: str, ext: str) -> Path:
+        return self.objects / digest[:2] / f"{digest[2:]}{ext}"
+
+    def put(self, parcel: str, parcel_id: str, kind: str, url: str, body: bytes, encoding: str = "") -> str:
+        """Store body (once per content hash) and record the fetch. Returns the digest."""
+        digest = hashlib.sha256(body).hexdigest()
+        if not any(self._object_path(digest, ext).exists() for ext, _, _ in CODECS.values()):
+            ext, compress, _ = CODECS[self.compression]
+            path = self._object_path(digest, ext)
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(compress(body))
+            os.replace(tmp, path)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO fetches (parcel, parcel_id, kind, url, digest, encoding, size, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (parcel, parcel_id, kind, url, digest, encoding or "", len(body), datetime.now().isoformat(timespec="seconds")),
+            )
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        for ext, _, decompress in CODECS.values():
+            path = self._object_path(digest, ext)
+            if path.exists():
+                return decompress(path.read_bytes())
+        raise KeyError(digest)
+
+    def text(self, fetch: Dict[str, Any]) -> str:
+        """Body of a fetch row decoded the way the live response was."""
+        return self.get(fetch["digest"]).decode(fetch.get("encoding") or "utf-8", errors="replace")
+
+    def latest(self, parcel: str) -> Dict[str, Dict[str, Any]]:
+        """Most recent fetch row per kind for a parcel."""
+        rows = self._conn().execute(
+            "SELECT f.* FROM fetches f JOIN (SELECT kind, MAX(id) AS id FROM fetches WHERE parcel = ? GROUP BY kind) m ON f.id = m.id",
+            (parcel,),
+        ).fetchall()
+        return {row["kind"]: dict(row) for row in rows}
+
+    def parcel_keys(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT DISTINCT parcel FROM fetches ORDER BY parcel")]
+
+    def recent_parcel_ids(self, limit: int = 20) -> List[str]:
+        """Parcel IDs (as looked up) of the most recently fetched parcels, newest first."""
+        rows = self._conn().execute(
+            "SELECT parcel_id FROM fetches WHERE id IN (SELECT MAX(id) FROM fetches GROUP BY parcel) ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._conn()
+        fetches, raw_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fetches").fetchone()
+        objects = stored = 0
+        for path in self.objects.glob("*/*"):
+            if path.suffix in (".zz", ".xz"):
+                objects += 1
+                stored += path.stat().st_size
+        return {"fetches": fetches, "fetched_bytes": raw_bytes, "objects": objects, "stored_bytes": stored}
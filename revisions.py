@@ -0,0 +1,218 @@
+"""
+Undo/redo history for the in-session proposal dict.
+
+The proposal is edited in place by the tab renderers, so history is kept as
+per-edit deltas instead of snapshots: after each run the subtrees the app
+marked as edited (from widget callbacks) are compared against a private
+shadow copy and only the changed leaves (path, old, new) are stored. The rest
+of the proposal is never walked or copied, undo/redo/goto replay deltas in
+place, and the number of revisions kept is capped.
+"""
+
+import copy
+import math
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+Path = Tuple[str, ...]
+Change = Tuple[Path, Any, Any]
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "<missing>"
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+DEFAULT_LIMIT = 200
+
+
+def _same(old: Any, new: Any) -> bool:
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, float) and math.isnan(old) and math.isnan(new):
+        return True
+    return old == new
+
+
+def diff_trees(old: Any, new: Any, path: Path = ()) -> List[Change]:
+    """Leaf-level changes turning old into new; dicts are walked, anything else is a leaf."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes: List[Change] = []
+        for key, value in old.items():
+            if key not in new:
+                changes.append((path + (key,), copy.deepcopy(value), MISSING))
+            else:
+                changes.extend(diff_trees(value, new[key], path + (key,)))
+        for key, value in new.items():
+            if key not in old:
+                changes.append((path + (key,), MISSING, copy.deepcopy(value)))
+        return changes
+    if _same(old, new):
+        return []
+    return [(path, copy.deepcopy(old), copy.deepcopy(new))]
+
+
+def get_path(root: Any, path: Path) -> Any:
+    node = root
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return MISSING
+        node = node[key]
+    return node
+
+
+def outermost(paths: Iterable[Path]) -> List[Path]:
+    """The paths that are not inside another of the paths."""
+    kept: List[Path] = []
+    for path in sorted(set(map(tuple, paths)), key=len):
+        if not any(path[:len(root)] == root for root in kept):
+            kept.append(path)
+    return kept
+
+
+def set_path(root: Dict[str, Any], path: Path, value: Any) -> None:
+    node = root
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = node[key] = {}
+        node = child
+    if value is MISSING:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = copy.deepcopy(value)
+
+
+class Revision:
+    __slots__ = ("changes", "label", "at")
+
+    def __init__(self, changes: List[Change], label: str = ""):
+        self.changes = changes
+        self.label = label
+        self.at = time.time()
+
+
+class RevisionHistory:
+    """
+    Linear history of one proposal. Revision numbers only grow; revisions
+    older than `limit` edits are dropped, and a new edit after an undo
+    discards the redo branch (and any checkpoints on it).
+    """
+
+    def __init__(self, proposal: Dict[str, Any], proposal_id: str = "", limit: int = DEFAULT_LIMIT):
+        self.proposal_id = proposal_id
+        self.limit = limit
+        self.reset(proposal)
+
+    def reset(self, proposal: Dict[str, Any]) -> None:
+        """Forget all revisions and take proposal as revision 0."""
+        self.shadow = copy.deepcopy(proposal)
+        self.base = 0
+        self.cursor = 0
+        self.revisions: List[Revision] = []
+        self.checkpoints: Dict[str, int] = {}
+
+    @property
+    def head(self) -> int:
+        return self.base + len(self.revisions)
+
+    def can_undo(self) -> bool:
+        return self.cursor > self.base
+
+    def can_redo(self) -> bool:
+        return self.cursor < self.head
+
+    def record(self, proposal: Dict[str, Any], paths: Iterable[Path], label: str = "") -> bool:
+        """
+        Store the edits made under paths since the last record as a new
+        revision. Only those subtrees are compared, so the cost follows the
+        edit, not the size of the proposal.
+        """
+        changes: List[Change] = []
+        for path in outermost(paths):
+            changes.extend(diff_trees(get_path(self.shadow, path), get_path(proposal, path), path))
+        if not changes:
+            return False
+        del self.revisions[self.cursor - self.base:]
+        self.checkpoints = {name: rev for name, rev in self.checkpoints.items() if rev <= self.cursor}
+        for path, _, new in changes:
+            set_path(self.shadow, path, new)
+        self.revisions.append(Revision(changes, label))
+        self.cursor += 1
+        if len(self.revisions) > self.limit:
+            dropped = len(self.revisions) - self.limit
+            del self.revisions[:dropped]
+            self.base += dropped
+            self.checkpoints = {name: rev for name, rev in self.checkpoints.items() if rev >= self.base}
+        return True
+
+    def _replay(self, proposal: Dict[str, Any], revision: Revision, forward: bool) -> None:
+        changes = revision.changes if forward else reversed(revision.changes)
+        for path, old, new in changes:
+            value = new if forward else old
+            set_path(proposal, path, value)
+            set_path(self.shadow, path, value)
+
+    def undo(self, proposal: Dict[str, Any]) -> bool:
+        if not self.can_undo():
+            return False
+        self.cursor -= 1
+        self._replay(proposal, self.revisions[self.cursor - self.base], forward=False)
+        return True
+
+    def redo(self, proposal: Dict[str, Any]) -> bool:
+        if not self.can_redo():
+            return False
+        self._replay(proposal, self.revisions[self.cursor - self.base], forward=True)
+        self.cursor += 1
+        return True
+
+    def goto(self, proposal: Dict[str, Any], revision: int) -> bool:
+        if not self.base <= revision <= self.head:
+            return False
+        while self.cursor > revision:
+            self.undo(proposal)
+        while self.cursor < revision:
+            self.redo(proposal)
+        return True
+
+    def checkpoint(self, name: str) -> None:
+        self.checkpoints[name] = self.cursor
+
+    def restore(self, proposal: Dict[str, Any], name: str) -> bool:
+        revision = self.checkpoints.get(name)
+        return revision is not None and self.goto(proposal, revision)
+
+    def diff(self, a: int, b: int) -> List[Change]:
+        """Net (path, value at a, value at b) for every leaf that differs between revisions a and b."""
+        if not (self.base <= a <= self.head and self.base <= b <= self.head):
+            raise ValueError(f"revisions must be between {self.base} and {self.head}")
+        lo, hi = min(a, b), max(a, b)
+        net: Dict[Path, List[Any]] = {}
+        for revision in self.revisions[lo - self.base:hi - self.base]:
+            for path, old, new in revision.changes:
+                if path in net:
+                    net[path][1] = new
+                else:
+                    net[path] = [old, new]
+        changes = [(path, old, new) for path, (old, new) in net.items() if not _same(old, new)]
+        if a > b:
+            changes = [(path, new, old) for path, old, new in changes]
+        return changes
+
+
+def describe_change(change: Change, limit: int = 60) -> str:
+    path, old, new = change
+
+    def short(value: Any) -> str:
+        text = repr(value)
+        return text if len(text) <= limit else text[: limit - 1] + "…"
+
+    return f"{' › '.join(map(str, path))}: {short(old)} → {short(new)}"
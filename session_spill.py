@@ -0,0 +1,273 @@
+"""
+Per-session memory accounting and idle-session spill to disk.
+
+Every browser session keeps its proposal, revision history and widget values
+in server memory until Streamlit drops the session. SessionSpiller tracks when
+each session last ran; a background sweep pickles the proposal state of
+sessions idle longer than `idle_seconds` to `<directory>/<session_id>.pkl`
+and removes it (and the proposal widget keys) from the session. The next run
+of that session calls touch(), which loads the file back before the app
+reads the state.
+
+Other sessions are reached through Streamlit's runtime session manager. That
+is not public API, so it is isolated in _session_state(); without a running
+server (bare mode) the sweep finds no sessions and does nothing. If a
+Streamlit upgrade removes the attributes it relies on, that is logged once
+and the sweep leaves every session and spill file alone (AppTest's mock
+runtime lands here too).
+"""
+
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SPILL_KEYS = ("proposal", "revision_history")
+STALE_FILE_SECONDS = 24 * 3600
+
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate bytes held by obj and everything it references (shared objects counted once)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return size + sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, "memory_usage"):  # pandas DataFrame / Series
+        usage = obj.memory_usage(deep=True)
+        return size + int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(obj, "nbytes"):  # numpy arrays
+        return size + int(obj.nbytes)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def session_footprint(state: Any, widget_prefixes: Tuple[str, ...] = ()) -> Dict[str, int]:
+    """Estimated bytes per group of session_state keys: proposal, history, widgets, other, total."""
+    groups = {"proposal": 0, "history": 0, "widgets": 0, "other": 0}
+    seen: set = set()
+    for key in list(state):
+        try:
+            value = state[key]
+        except KeyError:
+            continue
+        size = deep_size(value, seen)
+        if key == "proposal":
+            groups["proposal"] += size
+        elif key == "revision_history":
+            groups["history"] += size
+        elif str(key).startswith(widget_prefixes):
+            groups["widgets"] += size
+        else:
+            groups["other"] += size
+    groups["total"] = sum(groups.values())
+    return groups
+
+
+class UnsupportedStreamlit(RuntimeError):
+    """This Streamlit lacks the private runtime attributes the sweep reads other sessions through."""
+
+
+_reported: set = set()
+
+
+def _unsupported(missing: str) -> UnsupportedStreamlit:
+    if missing not in _reported:
+        _reported.add(missing)
+        try:
+            from streamlit import __version__ as version
+        except ImportError:
+            version = "?"
+        logger.warning("Idle-session spill disabled: Streamlit %s has no %s", version, missing)
+    return UnsupportedStreamlit(f"Streamlit has no {missing}")
+
+
+def _session_state(session_id: str) -> Tuple[Optional[Any], bool]:
+    """
+    (SessionState, is_running) for a live or disconnected session of this
+    server, or (None, False) if it is gone or there is no server. Raises
+    UnsupportedStreamlit if the runtime is not shaped as expected.
+    """
+    try:
+        from streamlit.runtime import Runtime
+    except ImportError:
+        return None, False
+    if not Runtime.exists():
+        return None, False
+    try:
+        from streamlit.runtime.app_session import AppSessionState
+
+        running_state = AppSessionState.APP_IS_RUNNING
+    except (ImportError, AttributeError):
+        raise _unsupported("AppSessionState.APP_IS_RUNNING") from None
+    get_session_info = getattr(getattr(Runtime.instance(), "_session_mgr", None), "get_session_info", None)
+    if not callable(get_session_info):
+        raise _unsupported("Runtime._session_mgr.get_session_info")
+    info = get_session_info(session_id)
+    if info is None:
+        return None, False
+    session = getattr(info, "session", None)
+    if not hasattr(session, "session_state") or not hasattr(session, "_state"):
+        raise _unsupported("AppSession.session_state / AppSession._state")
+    return session.session_state, session._state == running_state
+
+
+class SessionSpiller:
+    def __init__(
+        self,
+        directory: Path,
+        idle_seconds: float = 900.0,
+        sweep_interval: float = 60.0,
+        widget_prefixes: Tuple[str, ...] = (),
+    ):
+        self.directory = Path(directory)
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self.widget_prefixes = widget_prefixes
+        self.last_seen: Dict[str, float] = {}
+        self.spilled: Dict[str, int] = {}
+        self.stats = {"spilled": 0, "rehydrated": 0, "bytes_spilled": 0, "failed": 0}
+        # Why the sweep is off, if the running Streamlit is not supported.
+        self.unsupported = ""
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_files()
+
+    def _path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.pkl"
+
+    def _remove_stale_files(self) -> None:
+        # Sessions do not survive a server restart, so old files are orphans.
+        cutoff = time.time() - STALE_FILE_SECONDS
+        for path in self.directory.glob("*.pkl"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def start(self) -> "SessionSpiller":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-spill", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Session spill sweep failed")
+
+    def touch(self, session_id: str, state: Any) -> bool:
+        """Mark the session active; rehydrate it first if it was spilled. True if state was restored."""
+        with self._lock:
+            self.last_seen[session_id] = time.monotonic()
+            if session_id not in self.spilled:
+                return False
+            self.spilled.pop(session_id)
+            path = self._path(session_id)
+            try:
+                with open(path, "rb") as f:
+                    saved = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                logger.exception("Could not rehydrate session %s", session_id)
+                self.stats["failed"] += 1
+                return False
+            finally:
+                path.unlink(missing_ok=True)
+            for key, value in saved.items():
+                if key not in state:
+                    state[key] = value
+            self.stats["rehydrated"] += 1
+            return True
+
+    def spill(self, session_id: str, state: Any, min_idle: float = 0.0) -> int:
+        """Move the session's proposal state to disk. Returns the estimated bytes released."""
+        with self._lock:
+            if session_id in self.spilled:
+                return 0
+            # Re-checked under the lock in case the session ran since the sweep looked.
+            if min_idle and time.monotonic() - self.last_seen.get(session_id, 0.0) < min_idle:
+                return 0
+            saved = {key: state[key] for key in SPILL_KEYS if key in state}
+            if not saved:
+                return 0
+            widget_keys = [key for key in list(state) if str(key).startswith(self.widget_prefixes)]
+            released = deep_size(saved) + sum(deep_size(state[key]) for key in widget_keys if key in state)
+            path = self._path(session_id)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            # Widget values come back from the browser on the next run.
+            for key in list(saved) + widget_keys:
+                try:
+                    del state[key]
+                except KeyError:
+                    pass
+            self.spilled[session_id] = released
+            self.stats["spilled"] += 1
+            self.stats["bytes_spilled"] += released
+            return released
+
+    def sweep(self) -> int:
+        """Spill every session idle for longer than idle_seconds; forget sessions that are gone."""
+        now = time.monotonic()
+        count = 0
+        for session_id, seen in list(self.last_seen.items()):
+            try:
+                state, running = _session_state(session_id)
+            except UnsupportedStreamlit as e:
+                self.unsupported = str(e)
+                return count
+            if state is None:
+                with self._lock:
+                    self.last_seen.pop(session_id, None)
+                    self.spilled.pop(session_id, None)
+                    self._path(session_id).unlink(missing_ok=True)
+                continue
+            if running or now - seen < self.idle_seconds or session_id in self.spilled:
+                continue
+            if self.spill(session_id, state, min_idle=self.idle_seconds):
+                count += 1
+        return count
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """One row per tracked session: id, idle seconds, spilled flag and memory footprint."""
+        now = time.monotonic()
+        rows = []
+        for session_id, seen in sorted(self.last_seen.items(), key=lambda item: item[1]):
+            try:
+                state, running = _session_state(session_id)
+            except UnsupportedStreamlit as e:
+                self.unsupported = str(e)
+                state, running = None, False
+            footprint = session_footprint(state, self.widget_prefixes) if state is not None else {"total": 0}
+            rows.append({
+                "session": session_id[:8],
+                "idle_s": int(now - seen),
+                "running": running,
+                "spilled_kb": round(self.spilled.get(session_id, 0) / 1024, 1),
+                **{f"{k}_kb": round(v / 1024, 1) for k, v in footprint.items()},
+            })
+        return rows
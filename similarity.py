@@ -0,0 +1,215 @@
+"""
+Similar-proposal retrieval.
+
+Each saved proposal's project description, understanding, assumptions and
+task/permit selections are turned into a hashed bag of word 1-2 grams
+(sublinear tf) and kept as CSR arrays. Document frequencies are tracked
+incrementally, so idf changes with every save; a query applies the current
+idf to both sides and scores every document by TF-IDF cosine with two
+gather + reduceat passes (dot products and document norms).
+
+New saves are appended to a small tail block that is folded into the main
+block when it grows. A re-save overwrites its tail row in place; one whose
+row is already in the main block leaves a dead row behind, and the index is
+rebuilt from the live rows once a quarter of it is dead.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Any, List, Tuple, Iterable
+
+import numpy as np
+
+from proposal_store import ProposalStore
+
+DIM = 1 << 18
+TAIL_LIMIT = 2048
+DEAD_FRACTION = 0.25
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def proposal_text(proposal: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """Free text and categorical tokens that describe a proposal for retrieval."""
+    project = proposal.get("project", {})
+    intake = proposal.get("intake", {})
+    text = " ".join(
+        str(v or "")
+        for v in (
+            project.get("project_description_short"),
+            project.get("project_understanding"),
+            project.get("assumptions_other"),
+            intake.get("land_use"),
+            intake.get("zoning"),
+            intake.get("future_land_use"),
+        )
+    )
+    tags = [f"assump:{k}" for k, v in (project.get("assumptions_checked", {}) or {}).items() if v]
+    tags += [f"task:{k}" for k in (proposal.get("scope", {}).get("selected_tasks", {}) or {})]
+    tags += [f"permit:{k}" for k, v in (proposal.get("permits", {}).get("permit_flags", {}) or {}).items() if v]
+    return text, tags
+
+
+def hash_features(text: str, tags: Iterable[str] = ()) -> Tuple[np.ndarray, np.ndarray]:
+    """(indices, log-tf weights) of hashed word unigrams, bigrams and tags."""
+    words = TOKEN_RE.findall((text or "").lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])] + list(tags)
+    if not grams:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    # str hash is salted per process; that is fine because every process
+    # builds its own index from the store.
+    hashed = np.fromiter((hash(g) % DIM for g in grams), dtype=np.int64, count=len(grams))
+    indices, counts = np.unique(hashed, return_counts=True)
+    return indices.astype(np.int32), (1.0 + np.log(counts)).astype(np.float32)
+
+
+class _Block:
+    """CSR rows: row r spans data[indptr[r]:indptr[r+1]]."""
+
+    def __init__(self, indices: np.ndarray, data: np.ndarray, indptr: np.ndarray):
+        self.indices = indices
+        self.data = data
+        self.indptr = indptr
+
+    @classmethod
+    def build(cls, rows: List[Tuple[np.ndarray, np.ndarray]]) -> "_Block":
+        lengths = np.fromiter((len(r[0]) for r in rows), dtype=np.int64, count=len(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        if rows:
+            indices = np.concatenate([r[0] for r in rows])
+            data = np.concatenate([r[1] for r in rows])
+        else:
+            indices = np.zeros(0, dtype=np.int32)
+            data = np.zeros(0, dtype=np.float32)
+        return cls(indices, data, indptr)
+
+    def row_sums(self, values: np.ndarray, squared: bool = False) -> np.ndarray:
+        """Per row, the sum of data (or data squared) times values[index]."""
+        n = len(self.indptr) - 1
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        data = self.data * self.data if squared else self.data
+        products = data * values[self.indices]
+        # reduceat needs in-range starts; empty rows are fixed up below.
+        starts = np.minimum(self.indptr[:-1], max(len(products) - 1, 0))
+        out = np.add.reduceat(products, starts) if len(products) else np.zeros(n, dtype=np.float32)
+        out[self.indptr[:-1] == self.indptr[1:]] = 0.0
+        return out
+
+
+class SimilarityIndex:
+    def __init__(self, store: ProposalStore):
+        self.store = store
+        self.seq = 0
+        self.ids: List[str] = []
+        self.alive = bytearray()
+        self.dead = 0
+        self.slot: Dict[str, int] = {}
+        self.doc_freq = np.zeros(DIM, dtype=np.int32)
+        self.main = _Block.build([])
+        self.tail: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.last_query_ms = 0.0
+        # Document norms under the current idf; any add or compaction clears them.
+        self._norms = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.slot)
+
+    def _add(self, proposal_id: str, proposal: Dict[str, Any]) -> None:
+        indices, weights = hash_features(*proposal_text(proposal))
+        self._norms = None
+        old = self.slot.get(proposal_id)
+        if old is not None:
+            self.doc_freq[self._row(old)[0]] -= 1
+        self.doc_freq[indices] += 1
+        main_rows = len(self.main.indptr) - 1
+        if old is not None and old >= main_rows:
+            self.tail[old - main_rows] = (indices, weights)
+            return
+        if old is not None:
+            self.alive[old] = 0
+            self.dead += 1
+        self.slot[proposal_id] = len(self.ids)
+        self.ids.append(proposal_id)
+        self.alive.append(1)
+        self.tail.append((indices, weights))
+
+    def _row(self, slot: int) -> Tuple[np.ndarray, np.ndarray]:
+        main_rows = len(self.main.indptr) - 1
+        if slot < main_rows:
+            start, end = self.main.indptr[slot], self.main.indptr[slot + 1]
+            return self.main.indices[start:end], self.main.data[start:end]
+        return self.tail[slot - main_rows]
+
+    def add(self, proposal_id: str, proposal: Dict[str, Any]) -> None:
+        with self._lock:
+            self._add(proposal_id, proposal)
+            self._compact()
+
+    def _compact(self) -> None:
+        if self.dead > len(self.ids) * DEAD_FRACTION:
+            live = [slot for slot in range(len(self.ids)) if self.alive[slot]]
+            rows = [self._row(slot) for slot in live]
+            self.ids = [self.ids[slot] for slot in live]
+            self.slot = {proposal_id: slot for slot, proposal_id in enumerate(self.ids)}
+            self.alive = bytearray(b"\x01" * len(self.ids))
+            self.dead = 0
+            self.main = _Block.build(rows)
+            self.tail = []
+            self._norms = None
+            return
+        if len(self.tail) < TAIL_LIMIT:
+            return
+        tail = _Block.build(self.tail)
+        offset = self.main.indptr[-1]
+        self.main = _Block(
+            np.concatenate([self.main.indices, tail.indices]),
+            np.concatenate([self.main.data, tail.data]),
+            np.concatenate([self.main.indptr, tail.indptr[1:] + offset]),
+        )
+        self.tail = []
+
+    def refresh(self) -> int:
+        """Index saves made since the last refresh (this or any other process)."""
+        with self._lock:
+            changes = self.store.bodies_since(self.seq)
+            for proposal_id, seq, body in changes:
+                self._add(proposal_id, body)
+                self.seq = seq
+            self._compact()
+            return len(changes)
+
+    def query(self, proposal: Dict[str, Any], k: int = 5, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-k (proposal_id, TF-IDF cosine score) most similar to proposal."""
+        self.refresh()
+        started = time.perf_counter()
+        indices, weights = hash_features(*proposal_text(proposal))
+        with self._lock:
+            if not len(indices) or not self.slot:
+                return []
+            # Snapshot under the lock: saves from other sessions rewrite the tail in place.
+            idf = (np.log((1 + len(self.slot)) / (1 + self.doc_freq)) + 1.0).astype(np.float32)
+            main, tail, ids, alive = self.main, _Block.build(self.tail), self.ids, bytes(self.alive)
+            slots = [self.slot.get(proposal_id) for proposal_id in exclude]
+            if self._norms is None:
+                # Documents are stored as raw log-tf; weight and normalise them with today's idf.
+                squared = idf * idf
+                self._norms = np.sqrt(np.concatenate([main.row_sums(squared, squared=True), tail.row_sums(squared, squared=True)]))
+            norms = self._norms
+        query = np.zeros(DIM, dtype=np.float32)
+        query[indices] = weights * idf[indices]
+        query /= float(np.sqrt((query ** 2).sum())) or 1.0
+
+        dots = np.concatenate([main.row_sums(query * idf), tail.row_sums(query * idf)])
+        scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        scores[np.frombuffer(alive, dtype=np.uint8) == 0] = -1.0
+        for slot in slots:
+            if slot is not None:
+                scores[slot] = -1.0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        self.last_query_ms = (time.perf_counter() - started) * 1000
+        return [(ids[i], float(scores[i])) for i in top if scores[i] > 0]
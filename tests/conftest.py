@@ -0,0 +1,33 @@
+import os
+import pathlib
+import sys
+
+import pytest
+
+# The modules live at the repository root, not in a package.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """app.py imported in Streamlit bare mode, with its state files in a scratch directory."""
+    work = tmp_path_factory.mktemp("app")
+    for name, value in {
+        "PROPOSAL_STORE_PATH": work / "proposals.db",
+        "PROPOSAL_CACHE_PATH": work / "cache.db",
+        "LOOKUP_QUEUE_PATH": work / "lookup_queue.db",
+        "SESSION_SPILL_DIR": work / "session_spill",
+        "PCPAO_RATE_STATE_PATH": work / "pcpao_rate.json",
+        "RESPONSE_ARCHIVE_DIR": "",
+        "PROPOSAL_METRICS_PORT": "0",
+        "PROPOSAL_WARMUP": "off",
+        # Nothing listens here; tests swap in a fake session where they need one.
+        "PCPAO_BASE_URL": "http://127.0.0.1:9",
+    }.items():
+        os.environ[name] = str(value)
+    import app
+    from streamlit.logger import set_log_level
+
+    # Bare mode warns about the missing script run context on every st call.
+    set_log_level("error")
+    return app
@@ -0,0 +1,112 @@
+"""TieredCache over SQLite: promotion into the local tier, and invalidations reaching other workers."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import cache_backends
+from cache_backends import SQLiteBackend, TieredCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def worker(path, **kwargs):
+    """One process's view of the shared file; poll_interval=0 reads the invalidation log on every get."""
+    return TieredCache(SQLiteBackend(path), poll_interval=kwargs.pop("poll_interval", 0.0), **kwargs)
+
+
+def test_shared_hit_is_promoted_to_the_local_tier(path):
+    a, b = worker(path), worker(path)
+    a.set("parcel", "k", {"zip": "33701"})
+    assert b.get("parcel", "k")[0] == {"zip": "33701"}
+    assert b.get("parcel", "k")[0] == {"zip": "33701"}
+    stats = b.stats()
+    assert stats["local"]["hits"] == 1 and stats["local"]["misses"] == 1
+    assert stats["sqlite"]["hits"] == 1
+
+
+def test_invalidation_reaches_the_other_worker(path):
+    a, b = worker(path), worker(path)
+    a.set("parcel", "k", 1)
+    a.set("parcel", "other", 2)
+    b.get("parcel", "k"), b.get("parcel", "other")
+    a.invalidate("parcel", "k")
+    assert b.get("parcel", "k") is None
+    assert b.get("parcel", "other")[0] == 2
+
+
+def test_invalidate_then_set_replaces_the_other_workers_copy(path):
+    # lookup_pinellas_property's pattern for parcel and parcel_fingerprint.
+    a, b = worker(path), worker(path)
+    a.set("parcel_fingerprint", "k", {"row": "old"})
+    assert b.get("parcel_fingerprint", "k")[0] == {"row": "old"}
+    a.invalidate("parcel_fingerprint", "k")
+    a.set("parcel_fingerprint", "k", {"row": "new"})
+    assert b.get("parcel_fingerprint", "k")[0] == {"row": "new"}
+
+
+def test_set_alone_leaves_the_other_workers_local_copy(path):
+    a, b = worker(path), worker(path)
+    a.set("parcel", "k", "old")
+    b.get("parcel", "k")
+    a.set("parcel", "k", "new")
+    assert b.get("parcel", "k")[0] == "old"
+
+
+def test_namespace_invalidation(path):
+    a, b = worker(path), worker(path)
+    for key in "xyz":
+        a.set("jurisdiction", key, key)
+        b.get("jurisdiction", key)
+    b.set("parcel", "k", 1)
+    a.invalidate("jurisdiction")
+    assert [b.get("jurisdiction", key) for key in "xyz"] == [None, None, None]
+    assert b.get("parcel", "k")[0] == 1
+
+
+def test_poll_interval_delays_invalidations(path):
+    a, b = worker(path), worker(path, poll_interval=3600)
+    a.set("parcel", "k", 1)
+    b.get("parcel", "k")
+    a.invalidate("parcel", "k")
+    assert b.get("parcel", "k")[0] == 1
+
+
+def test_worker_behind_a_trimmed_log_clears_its_local_tier(path, monkeypatch):
+    monkeypatch.setattr(cache_backends, "INVALIDATION_LOG_LIMIT", 3)
+    a, b = worker(path), worker(path, poll_interval=3600)
+    a.set("parcel", "kept", 1)
+    b.get("parcel", "kept")
+    b.local.set("parcel", "stale", "only in b")
+    for i in range(5):
+        a.invalidate("other", str(i))
+    b.poll_interval = 0.0
+    assert b.get("parcel", "stale") is None
+    assert b.get("parcel", "kept")[0] == 1
+
+
+def test_expired_entries_are_misses(path):
+    a = worker(path)
+    a.set("parcel", "k", 1, ttl=0.05)
+    assert a.get("parcel", "k")[0] == 1
+    time.sleep(0.1)
+    assert a.get("parcel", "k") is None
+    assert worker(path).get("parcel", "k") is None
+
+
+def test_invalidation_from_another_process(path):
+    b = worker(path)
+    b.set("parcel", "k", 1)
+    assert b.get("parcel", "k")[0] == 1
+    script = (
+        "import sys; from cache_backends import SQLiteBackend, TieredCache; "
+        "TieredCache(SQLiteBackend(sys.argv[1])).invalidate('parcel', 'k')"
+    )
+    subprocess.run([sys.executable, "-c", script, path], check=True, cwd=os.path.dirname(cache_backends.__file__))
+    assert b.get("parcel", "k") is None
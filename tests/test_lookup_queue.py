@@ -0,0 +1,70 @@
+"""LookupQueue replay outcomes, and how a lookup failure decides between retry and reject."""
+
+import pytest
+
+from lookup_queue import LookupQueue, LookupReplayer
+from rate_limit import RateLimitTimeout
+
+PARCEL = "19-31-17-73166-001-0010"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # backoff=0 makes a fresh entry due straight away.
+    return LookupQueue(str(tmp_path / "queue.db"), backoff=0.0, max_backoff=0.0)
+
+
+def replay(queue, record):
+    queue.enqueue("k", PARCEL, "Pinellas")
+    replayer = LookupReplayer(queue, lambda parcel_id: record)
+    assert replayer.run_once() == 1
+    return queue.get("k"), replayer.stats
+
+
+def test_success_completes_the_entry(queue):
+    entry, stats = replay(queue, {"success": True, "address": "1 MAIN ST"})
+    assert entry["status"] == "done" and entry["record"]["address"] == "1 MAIN ST"
+    assert stats["replayed"] == 1
+
+
+@pytest.mark.parametrize("marker", ["unreachable", "retry"])
+def test_unreachable_and_retry_stay_queued(queue, marker):
+    entry, stats = replay(queue, {"success": False, marker: True, "error": "busy"})
+    assert entry["status"] == "queued" and entry["attempts"] == 1 and entry["last_error"] == "busy"
+    assert stats == {"replayed": 0, "retried": 1, "rejected": 0}
+
+
+def test_other_failures_are_rejected(queue):
+    entry, stats = replay(queue, {"success": False, "error": "No record found"})
+    assert entry["status"] == "rejected"
+    assert stats["rejected"] == 1
+
+
+def test_a_raising_lookup_is_retried(queue):
+    queue.enqueue("k", PARCEL)
+
+    def boom(parcel_id):
+        raise OSError("disk")
+
+    LookupReplayer(queue, boom).run_once()
+    assert queue.get("k")["status"] == "queued"
+
+
+class BusyLimiter:
+    def acquire(self, lane="interactive", timeout=30.0):
+        raise RateLimitTimeout(f"No {lane} request slot within {timeout:g} s")
+
+
+def test_local_rate_limit_timeout_is_retried_without_touching_upstream_health(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "get_pcpao_limiter", BusyLimiter)
+    upstream = app.get_lookup_queue()
+    before = upstream.upstream_down(3600)
+
+    record = app.lookup_pinellas_property(PARCEL, refresh=True, lane="batch")
+    assert record["retry"] and not record.get("unreachable") and not record["success"]
+    assert upstream.upstream_down(3600) == before
+
+    queue = LookupQueue(str(tmp_path / "queue.db"), backoff=0.0, max_backoff=0.0)
+    queue.enqueue("k", PARCEL)
+    LookupReplayer(queue, lambda parcel_id: app.lookup_pinellas_property(parcel_id, lane="batch")).run_once()
+    assert queue.get("k")["status"] == "queued"
@@ -0,0 +1,47 @@
+"""Overlay suggestions only ever switch permits and assumptions on, and leave the user's choices alone."""
+
+import copy
+
+SUGGESTIONS = {
+    "permit_flags": {"permit_floodplain": True, "permit_fema": True},
+    "assumptions": {"assump_no_flood_comp": False, "assump_no_wetlands": True, "assump_no_protected_species": True},
+    "reasons": ["Parcel is in FEMA flood zone AE"],
+}
+
+
+def proposal(**checked):
+    return {"project": {"assumptions_checked": dict(checked)}, "permits": {"permit_flags": {}}}
+
+
+def test_suggestions_switch_assumptions_on_but_never_off(app):
+    p = proposal(assump_no_flood_comp=True)
+    app.apply_overlay_suggestions(p, SUGGESTIONS)
+    assert p["project"]["assumptions_checked"] == {
+        "assump_no_flood_comp": True, "assump_no_wetlands": True, "assump_no_protected_species": True,
+    }
+    assert p["permits"]["permit_flags"] == {"permit_floodplain": True, "permit_fema": True}
+    assert p["permits"]["overlay_suggestions"]["reasons"] == SUGGESTIONS["reasons"]
+
+
+def test_a_second_lookup_leaves_assumptions_the_user_unticked(app):
+    p = proposal()
+    app.apply_overlay_suggestions(p, SUGGESTIONS)
+    p["project"]["assumptions_checked"]["assump_no_wetlands"] = False
+    app.apply_overlay_suggestions(p, copy.deepcopy(SUGGESTIONS))
+    checked = p["project"]["assumptions_checked"]
+    assert checked["assump_no_wetlands"] is False and checked["assump_no_protected_species"] is True
+
+
+def test_queued_lookup_baseline_keeps_assumptions_unticked_since_queueing(app):
+    p = proposal(assump_no_wetlands=False)
+    app.apply_overlay_suggestions(p, SUGGESTIONS, baseline={"assump_no_wetlands": True})
+    checked = p["project"]["assumptions_checked"]
+    assert checked["assump_no_wetlands"] is False and checked["assump_no_protected_species"] is True
+
+
+def test_widget_state_is_dropped_only_for_assumptions_that_change(app):
+    app.st.session_state["tab2_assump_no_flood_comp"] = True
+    app.st.session_state["tab2_assump_no_wetlands"] = False
+    app.apply_overlay_suggestions(proposal(assump_no_flood_comp=True), SUGGESTIONS)
+    assert "tab2_assump_no_flood_comp" in app.st.session_state
+    assert "tab2_assump_no_wetlands" not in app.st.session_state
@@ -0,0 +1,129 @@
+"""Property tests for parcel_ids: form round trips, and bulk_convert() agreeing with convert()."""
+
+import numpy as np
+import pytest
+from hypothesis import example, given, settings
+from hypothesis import strategies as st
+
+import parcel_ids
+
+COUNTIES = sorted(parcel_ids.FORMATS)
+
+
+def digit_strings(fmt: parcel_ids.ParcelFormat, size: int = 0) -> st.SearchStrategy:
+    return st.text(alphabet="0123456789", min_size=size or fmt.width, max_size=size or fmt.width)
+
+
+def separated(fmt: parcel_ids.ParcelFormat, digits: str, seps: list, source: str = "parcel") -> str:
+    parts, start = [], 0
+    for width in fmt.source_widths(source):
+        parts.append(digits[start:start + width])
+        start += width
+    out = parts[0]
+    for sep, part in zip(seps, parts[1:]):
+        out += sep + part
+    return out
+
+
+@st.composite
+def parcel_cases(draw):
+    fmt = parcel_ids.FORMATS[draw(st.sampled_from(COUNTIES))]
+    digits = draw(digit_strings(fmt))
+    seps = draw(st.lists(st.sampled_from(parcel_ids.SEPARATORS), min_size=len(fmt.widths) - 1, max_size=len(fmt.widths) - 1))
+    return fmt, digits, seps
+
+
+@given(parcel_cases(), st.sampled_from(["", " ", "\t", "  \n"]))
+def test_separated_and_compact_input_parse_to_the_digits(case, pad):
+    fmt, digits, seps = case
+    assert fmt.parse(digits) == digits
+    assert fmt.parse(pad + separated(fmt, digits, seps) + pad) == digits
+
+
+@given(parcel_cases(), st.sampled_from(parcel_ids.FORMS), st.sampled_from(parcel_ids.FORMS))
+def test_every_form_round_trips_through_every_other(case, first, second):
+    fmt, digits, _ = case
+    display = fmt.format(digits, "display")
+    text = parcel_ids.convert(display, fmt.county, first)
+    source = "strap" if first == "strap" else "parcel"
+    again = parcel_ids.convert(text, fmt.county, second, source=source)
+    assert parcel_ids.convert(again, fmt.county, "display", source="strap" if second == "strap" else "parcel") == display
+
+
+@given(parcel_cases())
+def test_separated_strap_input_reads_back_to_parcel_order(case):
+    fmt, digits, seps = case
+    strap = fmt.format(digits, "strap")
+    assert fmt.parse(separated(fmt, strap, seps, source="strap"), "strap") == digits
+
+
+def test_pinellas_strap_puts_range_township_section_first():
+    assert parcel_ids.convert("19-31-17-73166-001-0010", "Pinellas", "strap") == "173119731660010010"
+    assert parcel_ids.convert("173119731660010010", "Pinellas", "display", source="strap") == "19-31-17-73166-001-0010"
+
+
+# -----------------------------------------------------------------------------
+# bulk_convert() == convert()
+# -----------------------------------------------------------------------------
+NON_ASCII_DIGITS = "٠١٢۳०১０１９\U0001d7ce"
+
+
+@st.composite
+def near_miss(draw):
+    """Parcel-like strings: right and wrong lengths, mixed separators, non-ASCII digits, padding."""
+    fmt = parcel_ids.FORMATS[draw(st.sampled_from(COUNTIES))]
+    digits = draw(digit_strings(fmt, draw(st.integers(fmt.width - 2, fmt.width + 2))))
+    if draw(st.booleans()):
+        digits = list(digits)
+        for _ in range(draw(st.integers(1, 3))):
+            digits[draw(st.integers(0, len(digits) - 1))] = draw(st.sampled_from(NON_ASCII_DIGITS + "x-"))
+        digits = "".join(digits)
+    if draw(st.booleans()):
+        seps = draw(st.lists(st.sampled_from(parcel_ids.SEPARATORS + ":,"), min_size=len(fmt.widths) - 1, max_size=len(fmt.widths) - 1))
+        digits = separated(fmt, digits.ljust(fmt.width, "0")[:len(digits)], seps) if len(digits) >= fmt.width else digits
+    pad = draw(st.sampled_from(["", " ", "\t", "　", "\x00"]))
+    return draw(st.sampled_from([digits, pad + digits, digits + pad]))
+
+
+def scalar(text, county: str, to: str, source: str) -> str:
+    try:
+        return parcel_ids.convert(text, county, to, source)
+    except parcel_ids.InvalidParcelId:
+        return ""
+
+
+inputs = st.lists(st.one_of(st.none(), st.text(max_size=30), near_miss()), max_size=40)
+
+
+@settings(max_examples=300)
+@given(inputs, st.sampled_from(COUNTIES), st.sampled_from(parcel_ids.FORMS), st.sampled_from(["parcel", "strap"]))
+@example(["193117731660010010\x00", "\x00193117731660010010", "19311773166001\x000010"], "Pinellas", "display", "parcel")
+@example(["193117731660010010\x85", "\x1c19-31-17-73166-001-0010", "19-31-17-73166-001-0010\u3000"], "Pinellas", "normalized", "parcel")
+def test_bulk_convert_matches_convert(values, county, to, source):
+    converted, valid = parcel_ids.bulk_convert(values, county, to, source)
+    expected = [scalar(v, county, to, source) for v in values]
+    assert converted.tolist() == expected
+    assert valid.tolist() == [bool(e) for e in expected]
+
+
+@given(st.lists(parcel_cases(), min_size=1, max_size=20), st.integers(1, 7))
+def test_bulk_convert_chunking_does_not_change_results(cases, chunk_size):
+    for county in COUNTIES:
+        values = [separated(fmt, d, s) for fmt, d, s in cases if fmt.county == county]
+        whole, _ = parcel_ids.bulk_convert(values, county, "strap")
+        chunked, _ = parcel_ids.bulk_convert(values, county, "strap", chunk_size=chunk_size)
+        assert whole.tolist() == chunked.tolist()
+
+
+def test_bulk_convert_empty_input():
+    converted, valid = parcel_ids.bulk_convert([], "Pasco")
+    assert converted.shape == valid.shape == (0,)
+
+
+@pytest.mark.parametrize("county", COUNTIES)
+def test_bulk_convert_accepts_object_arrays_with_missing_values(county):
+    fmt = parcel_ids.FORMATS[county]
+    good = fmt.format("1" * fmt.width, "display")
+    converted, valid = parcel_ids.bulk_convert(np.array([good, None, ""], dtype=object), county, "normalized")
+    assert converted.tolist() == ["1" * fmt.width, "", ""]
+    assert valid.tolist() == [True, False, False]
@@ -0,0 +1,108 @@
+"""Pinellas lookups: what gets cached and fingerprinted when part of the fetch fails."""
+
+import json
+import os
+
+import pytest
+import requests
+
+from cache_backends import SQLiteBackend, TieredCache
+from rate_limit import RateLimitTimeout
+
+ROW = [
+    "", "<a>19-31-17-73166-001-0010</a>", "<span>HOLDINGS LLC</span>", "", "",
+    "<span>100 CENTRAL AVE</span>", "SP", "1130 Stores, One Story", "LOT 1 BLOCK 2", "", "",
+]
+DETAILS = (
+    "<html><body><div>Site Address 100 CENTRAL AVE ST PETERSBURG FL 33701</div>"
+    "<div>Land Area: &asymp; 21,780 sf | &asymp; 0.50 acres</div></body></html>"
+)
+
+
+def response(status, body, content_type, url="http://pcpao.test/"):
+    r = requests.Response()
+    r.status_code, r._content, r.url, r.encoding = status, body.encode("utf-8"), url, "utf-8"
+    r.headers["Content-Type"] = content_type
+    return r
+
+
+class FakeSession:
+    def __init__(self, details_status=200, owner=""):
+        self.details_status = details_status
+        self.row = list(ROW)
+        if owner:
+            self.row[2] = f"<span>{owner}</span>"
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        body = json.dumps({"draw": 1, "recordsTotal": 1, "recordsFiltered": 1, "data": [self.row]})
+        return response(200, body, "application/json", url)
+
+    def get(self, url, timeout=None):
+        body = DETAILS if self.details_status == 200 else "<html>Service Unavailable</html>"
+        return response(self.details_status, body, "text/html", url)
+
+
+class Limiter:
+    """Grants `slots` requests, then times out like a busy TokenBucket."""
+
+    def __init__(self, slots):
+        self.slots = slots
+
+    def acquire(self, lane="interactive", timeout=30.0):
+        if self.slots <= 0:
+            raise RateLimitTimeout(f"No {lane} request slot within {timeout:g} s")
+        self.slots -= 1
+
+
+def lookup(app, monkeypatch, parcel_id, session, limiter):
+    monkeypatch.setattr(app, "get_resilient_session", lambda: session)
+    monkeypatch.setattr(app, "get_pcpao_limiter", lambda: limiter)
+    record = app.lookup_pinellas_property(parcel_id, refresh=True, lane="batch", report_health=False)
+    key = app.parcel_key(parcel_id)
+    cache = app.get_shared_cache()
+    return record, cache.get("parcel", key), cache.get("parcel_fingerprint", key)
+
+
+def test_complete_fetch_is_cached_and_fingerprinted(app, monkeypatch):
+    record, cached, fingerprint = lookup(app, monkeypatch, "19-31-17-73170-001-0010", FakeSession(), Limiter(2))
+    assert record["success"] and record["zip"] == "33701"
+    assert cached[0] == record and fingerprint[0]["record"] == record
+
+
+@pytest.mark.parametrize("details_status", [503, 404])
+def test_failed_details_page_fails_the_lookup(app, monkeypatch, details_status):
+    parcel_id = f"19-31-17-73171-001-{details_status:04d}"
+    record, cached, fingerprint = lookup(app, monkeypatch, parcel_id, FakeSession(details_status), Limiter(2))
+    assert not record["success"] and str(details_status) in record["error"]
+    assert record.get("unreachable", False) == (details_status >= 500)
+    assert cached is None and fingerprint is None
+
+
+def test_rate_limit_timeout_before_details_page_is_retried_and_not_fingerprinted(app, monkeypatch):
+    record, cached, fingerprint = lookup(app, monkeypatch, "19-31-17-73172-001-0010", FakeSession(), Limiter(1))
+    assert record["retry"] and not record["success"]
+    assert cached is None and fingerprint is None
+
+
+def test_lookup_after_failed_details_page_is_a_full_fetch(app, monkeypatch):
+    # A later full fetch must not be answered "row_unchanged" from a failed attempt.
+    parcel_id = "19-31-17-73173-001-0010"
+    lookup(app, monkeypatch, parcel_id, FakeSession(503), Limiter(2))
+    counters = app.get_revalidation_counters()
+    before = dict(counters.counts)
+    record, _, fingerprint = lookup(app, monkeypatch, parcel_id, FakeSession(), Limiter(2))
+    assert record["zip"] == "33701" and fingerprint[0]["record"]["site_area_acres"] == "0.50"
+    assert counters.counts["full_fetch"] == before["full_fetch"] + 1
+    assert counters.counts["row_unchanged"] == before["row_unchanged"]
+
+
+def test_changed_fingerprint_reaches_other_workers(app, monkeypatch):
+    parcel_id = "19-31-17-73174-001-0010"
+    lookup(app, monkeypatch, parcel_id, FakeSession(), Limiter(2))
+    other = TieredCache(SQLiteBackend(os.environ["PROPOSAL_CACHE_PATH"]), poll_interval=0.0)
+    key = app.parcel_key(parcel_id)
+    assert other.get("parcel_fingerprint", key)[0]["record"]["owner"] == "HOLDINGS LLC"
+
+    lookup(app, monkeypatch, parcel_id, FakeSession(owner="NEW OWNER LLC"), Limiter(2))
+    assert other.get("parcel", key)[0]["owner"] == "NEW OWNER LLC"
+    assert other.get("parcel_fingerprint", key)[0]["record"]["owner"] == "NEW OWNER LLC"
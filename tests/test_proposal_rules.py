@@ -0,0 +1,248 @@
+"""Rule expression whitelist, the shipped rules, and scan() agreeing with RuleSet.check()."""
+
+import copy
+
+import pytest
+
+import proposal_rules
+from proposal_rules import RuleError, RuleSet, compile_expression
+from proposal_store import ProposalStore
+
+NAMES = proposal_rules.SECTIONS + proposal_rules.CONTEXT
+
+
+# -----------------------------------------------------------------------------
+# Expressions
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("text", [
+    "().__class__",
+    "().__class__.__bases__[0].__subclasses__()",
+    "intake.__class__",
+    "scope._private",
+    "(lambda: 1)()",
+    "lambda: 1",
+    "__import__('os')",
+    "__import__('os').system('true')",
+    "open('x')",
+    "getattr(intake, 'county')",
+    "intake.county.upper()",
+    "len(x=1)",
+    "len(*scope)",
+    "unknown.field",
+    "[x for x in each(scope) for y in x]",
+    "{k: v for k, v in items(scope)}",
+    "(county := intake.county)",
+    "intake.county ** 2",
+    "f'{intake.county}'",
+    "intake.county is None",
+    "intake[intake.county]",
+    "intake.county +",
+])
+def test_expressions_off_the_whitelist_are_rejected(text):
+    with pytest.raises(RuleError):
+        compile_expression(text, NAMES)
+
+
+def evaluate(text, **env):
+    return compile_expression(text, list(NAMES) + list(env))(env)
+
+
+def test_missing_keys_read_as_none():
+    assert evaluate("intake.county", intake={}) is None
+    assert evaluate("intake.county", intake=None) is None
+    assert evaluate("scope.selected_tasks['310'].services", scope={"selected_tasks": {}}) is None
+    assert evaluate("permits.included_additional_services[5]", permits={"included_additional_services": ["a"]}) is None
+    assert evaluate("intake.county.name", intake={"county": "Pasco"}) is None
+    assert evaluate("not intake.county", intake={}) is True
+    assert evaluate("number(invoice.retainer_amount) > 3", invoice={}) is False
+    assert evaluate("intake.county < 3", intake={}) is False
+    assert evaluate("'150' in scope.selected_tasks", scope={}) is False
+
+
+def test_attribute_on_a_list_reads_it_from_every_element():
+    services = [{"hours": 2}, {"hours": 3}, {}]
+    assert evaluate("services.hours", services=services) == [2, 3, None]
+    assert evaluate("sum(services.hours)", services=services) == 5
+
+
+def test_comprehensions_functions_and_literal_membership():
+    tasks = {"150": {"fee": 0}, "310": {"fee": "$1,200"}}
+    assert evaluate("[n for n, t in items(tasks) if not number(t.fee)]", tasks=tasks) == ["150"]
+    assert evaluate("county not in ('Pinellas', 'Pasco')", county="Hillsborough") is True
+    assert evaluate("contains(agencies, 'tampa', 'Clearwater')", agencies="City of TAMPA") is True
+    assert evaluate("max(each(fees)) - min(each(fees))", fees={"a": 5, "b": "12"}) == 7
+
+
+# -----------------------------------------------------------------------------
+# Shipped rules
+# -----------------------------------------------------------------------------
+CLEAN = {
+    "meta": {"proposal_id": "clean"},
+    "intake": {"county": "Hillsborough"},
+    "client": {"client_name": "Client"},
+    "project": {
+        "project_name": "Site",
+        "assumptions_checked": {
+            "assump_no_flood_comp": True,
+            "assump_no_traffic": True,
+            "assump_no_platting": True,
+            "assump_no_offsite": True,
+        },
+    },
+    "scope": {
+        "selected_tasks": {
+            "150": {"fee": 5000},
+            "310": {
+                "fee": 0,
+                "total_hours": 40,
+                "services_total_cost": 3000,
+                "services": {
+                    "0": {"name": "Shop drawings", "included": True, "hours": 30},
+                    "1": {"name": "Site visits", "included": False, "hours": 0},
+                },
+            },
+        },
+    },
+    "permits": {
+        "permit_flags": {"permit_swfwmd": True, "permit_floodplain": False, "permit_fema": False},
+        "included_additional_services": ["Geotechnical coordination"],
+    },
+    "invoice": {"use_retainer": True, "retainer_amount": "$1,000"},
+}
+CLEAN_CONTEXT = {"scope_text": "Permits from Hillsborough County and the City of Tampa.", "total_fee": 8000}
+
+
+def _task_150_other_county(p, ctx):
+    p["intake"]["county"] = "Pasco"
+
+
+def _task_310_hours_over_total(p, ctx):
+    p["scope"]["selected_tasks"]["310"]["services"]["0"]["hours"] = 41
+
+
+def _task_without_fee(p, ctx):
+    p["scope"]["selected_tasks"]["150"]["fee"] = ""
+
+
+def _permitting_without_permits(p, ctx):
+    p["permits"]["permit_flags"]["permit_swfwmd"] = False
+
+
+def _flood_permit_vs_no_flood_comp(p, ctx):
+    p["permits"]["permit_flags"]["permit_fema"] = True
+
+
+def _traffic_service_vs_assumption(p, ctx):
+    p["permits"]["included_additional_services"].append("Traffic Impact Study")
+
+
+def _platting_service_vs_assumption(p, ctx):
+    p["permits"]["included_additional_services"].append("Platting coordination")
+
+
+def _offsite_service_vs_assumption(p, ctx):
+    p["permits"]["included_additional_services"].append("Off-Site utility design")
+
+
+def _retainer_without_amount(p, ctx):
+    p["invoice"]["retainer_amount"] = 0
+
+
+def _retainer_over_total(p, ctx):
+    ctx["total_fee"] = 900
+
+
+def _county_without_permit_setup(p, ctx):
+    p["intake"]["county"] = "Polk"
+    ctx["scope_text"] = "Permits from the county."
+
+
+PLANTS = {
+    "task_150_other_county": _task_150_other_county,
+    "task_310_hours_over_total": _task_310_hours_over_total,
+    "task_without_fee": _task_without_fee,
+    "permitting_without_permits": _permitting_without_permits,
+    "flood_permit_vs_no_flood_comp": _flood_permit_vs_no_flood_comp,
+    "traffic_service_vs_assumption": _traffic_service_vs_assumption,
+    "platting_service_vs_assumption": _platting_service_vs_assumption,
+    "offsite_service_vs_assumption": _offsite_service_vs_assumption,
+    "retainer_without_amount": _retainer_without_amount,
+    "retainer_over_total": _retainer_over_total,
+    "county_without_permit_setup": _county_without_permit_setup,
+}
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return proposal_rules.load_rules(proposal_rules.DEFAULT_RULES_PATH)
+
+
+def planted(rule_id):
+    proposal, context = copy.deepcopy(CLEAN), dict(CLEAN_CONTEXT)
+    PLANTS[rule_id](proposal, context)
+    return proposal, context
+
+
+def test_every_shipped_rule_has_a_planted_contradiction(rules):
+    assert sorted(PLANTS) == sorted(rule.id for rule in rules.rules)
+
+
+def test_clean_proposal_has_no_violations(rules):
+    assert rules.check(CLEAN, **CLEAN_CONTEXT) == []
+
+
+@pytest.mark.parametrize("rule_id", sorted(PLANTS))
+def test_each_rule_fires_on_its_contradiction_only(rules, rule_id):
+    proposal, context = planted(rule_id)
+    violations = rules.check(proposal, **context)
+    assert [v["rule"] for v in violations] == [rule_id]
+    assert violations[0]["severity"] in proposal_rules.SEVERITIES
+    assert "{" not in violations[0]["message"]
+
+
+def test_messages_fill_in_let_values(rules):
+    proposal, context = planted("task_310_hours_over_total")
+    (violation,) = rules.check(proposal, **context)
+    assert violation["message"] == "Task 310 services add up to 41 hours, but the task total is 40 hours."
+
+
+def test_a_failing_rule_is_reported_not_raised():
+    rules = RuleSet({"rules": [{"id": "boom", "when": "number(invoice.retainer_amount) / 0", "message": "never"}]})
+    (violation,) = rules.check(CLEAN, **CLEAN_CONTEXT)
+    assert violation["rule"] == "boom" and violation["severity"] == "rule_error"
+
+
+@pytest.mark.parametrize("raw", [
+    {},
+    {"rules": [{"id": "a", "message": "no when"}]},
+    {"rules": [{"id": "a", "when": "True", "message": "m", "severity": "fatal"}]},
+    {"rules": [{"id": "a", "when": "True", "message": "{undeclared}"}]},
+    {"rules": [{"id": "a", "when": "True", "message": "m"}, {"id": "a", "when": "False", "message": "m"}]},
+    {"rules": [{"id": "a", "when": "x.__class__", "message": "m", "let": {"x": "intake"}}]},
+])
+def test_malformed_rule_sets_are_rejected(raw):
+    with pytest.raises(RuleError):
+        RuleSet(raw)
+
+
+# -----------------------------------------------------------------------------
+# Portfolio scan
+# -----------------------------------------------------------------------------
+def test_scan_matches_save_time_check(rules, tmp_path):
+    db = str(tmp_path / "proposals.db")
+    store = ProposalStore(db)
+    expected, ids = set(), []
+    cases = [(CLEAN, CLEAN_CONTEXT)] + [planted(rule_id) for rule_id in sorted(PLANTS)]
+    for i in range(60):
+        proposal, context = copy.deepcopy(cases[i % len(cases)])
+        proposal["meta"]["proposal_id"] = proposal_id = f"p-{i}"
+        store.save(proposal_id, proposal, **context)
+        ids.append(proposal_id)
+        expected.update((proposal_id, v["rule"], v["message"]) for v in rules.check(proposal, **context))
+
+    found, checked = set(), 0
+    for count, violations in proposal_rules.scan(db, proposal_rules.DEFAULT_RULES_PATH, workers=2, chunk_size=7):
+        checked += count
+        found.update((v["proposal"], v["rule"], v["message"]) for v in violations)
+    assert checked == len(ids)
+    assert expected and found == expected
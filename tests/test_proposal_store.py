@@ -0,0 +1,63 @@
+"""ProposalStore seq allocation: every save gets its own seq, across connections."""
+
+import sqlite3
+import threading
+
+from proposal_store import ProposalStore
+
+
+def proposal(i):
+    return {"meta": {"proposal_id": f"p-{i}"}, "intake": {"county": "Pinellas"}, "project": {"project_name": f"Site {i}"}}
+
+
+def test_concurrent_saves_get_distinct_seqs(tmp_path):
+    path = str(tmp_path / "proposals.db")
+    ProposalStore(path)
+    seqs, barrier = [], threading.Barrier(8)
+
+    def worker(n):
+        # A store per thread, like separate worker processes sharing the file.
+        store = ProposalStore(path)
+        barrier.wait()
+        for i in range(25):
+            seqs.append(store.save(f"p-{n}-{i % 5}", proposal(i)))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seqs) == 200 and len(set(seqs)) == 200
+    store = ProposalStore(path)
+    assert store.max_seq() == max(seqs)
+    assert len(store.changes_since(0)) == 40
+
+
+def test_update_bodies_moves_rows_past_the_last_save(tmp_path):
+    store = ProposalStore(str(tmp_path / "proposals.db"))
+    for i in range(3):
+        store.save(f"p-{i}", proposal(i))
+    assert store.update_bodies([("p-0", proposal(0), 10), ("p-2", proposal(2), 20)]) == 2
+    assert [(row["id"], row["seq"]) for row in store.changes_since(3)] == [("p-0", 4), ("p-2", 5)]
+    assert store.save("p-1", proposal(1)) == 6
+
+
+def test_old_database_with_duplicate_seqs_is_renumbered(tmp_path):
+    path = str(tmp_path / "proposals.db")
+    ProposalStore(path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP INDEX proposals_seq")
+        conn.execute("CREATE INDEX proposals_seq ON proposals (seq)")
+        conn.executemany(
+            "INSERT INTO proposals (id, seq, saved_at, year, body) VALUES (?, ?, '2024-01-01T00:00:00', 2024, '{}')",
+            [("a", 1), ("b", 2), ("c", 2), ("d", 3), ("e", 3)],
+        )
+
+    store = ProposalStore(path)
+    assert [(row["id"], row["seq"]) for row in store.changes_since(0)] == [
+        ("a", 1), ("b", 2), ("d", 3), ("c", 4), ("e", 5),
+    ]
+    index = {row["name"]: row["unique"] for row in store._conn().execute("PRAGMA index_list(proposals)")}
+    assert index["proposals_seq"] == 1
+    assert store.save("f", proposal(5)) == 6
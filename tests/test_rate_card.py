@@ -0,0 +1,46 @@
+"""Rate card versions: what a new version may not drop, and the watcher keeping the last good card."""
+
+import copy
+import json
+
+import pytest
+
+import rate_card
+from rate_card import RateCard, RateCardError, RateCardWatcher, load_rate_cards
+
+SHIPPED = json.loads(rate_card.DEFAULT_CARD_PATH.read_text(encoding="utf-8"))
+
+
+def next_version(drop_task_310=()):
+    last = copy.deepcopy(SHIPPED["versions"][-1])
+    last["version"] += 1
+    last["task_310"]["services"] = [s for s in last["task_310"]["services"] if s["key"] not in drop_task_310]
+    return last
+
+
+def test_shipped_card_has_every_task_310_summary_service():
+    card = RateCard(SHIPPED["versions"][-1])
+    assert set(rate_card.TASK_310_HOURS_KEYS) <= {key for key, *_ in card.task_310_services}
+
+
+@pytest.mark.parametrize("key", sorted(rate_card.TASK_310_HOURS_KEYS))
+def test_version_without_a_task_310_summary_service_is_rejected(key):
+    with pytest.raises(RateCardError, match=key):
+        RateCard(next_version(drop_task_310=[key]))
+
+
+def test_other_task_310_services_may_be_dropped():
+    RateCard(next_version(drop_task_310=["asbuilt"]))
+
+
+def test_watcher_keeps_the_live_card_when_a_new_version_drops_a_service(tmp_path):
+    path = tmp_path / "rate_card.json"
+    path.write_text(json.dumps(SHIPPED), encoding="utf-8")
+    watcher = RateCardWatcher(path, check_interval=0.0)
+    live = watcher.current().version
+
+    path.write_text(json.dumps({"versions": SHIPPED["versions"] + [next_version(drop_task_310=["oac"])]}), encoding="utf-8")
+    assert watcher.current().version == live
+    assert "oac" in watcher.error
+    with pytest.raises(RateCardError):
+        load_rate_cards(path)
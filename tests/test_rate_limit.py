@@ -0,0 +1,103 @@
+"""TokenBucket: one bucket per state file however many instances share it, lanes, reserve and timeouts."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from rate_limit import RateLimitTimeout, TokenBucket
+
+
+@pytest.fixture
+def state(tmp_path):
+    return tmp_path / "rate.json"
+
+
+def write_state(path, tokens, interactive=(), batch=()):
+    now = time.time()
+    path.write_text(json.dumps({
+        "tokens": tokens,
+        "updated": now,
+        "waiting": {"interactive": {t: d for t, d in interactive}, "batch": {t: d for t, d in batch}},
+    }))
+
+
+def test_instances_on_one_file_share_the_tokens(state):
+    # Near-zero rate: nothing refills during the test.
+    a, b = TokenBucket(state, rate=0.001, burst=3), TokenBucket(state, rate=0.001, burst=3)
+    a.acquire()
+    b.acquire()
+    a.acquire()
+    with pytest.raises(RateLimitTimeout):
+        b.acquire(timeout=0.05)
+    assert a.metrics()["tokens"] < 1
+    assert a.metrics()["lanes"]["interactive"]["acquired"] == 2
+    assert b.metrics()["lanes"]["interactive"]["timeouts"] == 1
+
+
+def test_batch_leaves_the_reserve_to_interactive(state):
+    bucket = TokenBucket(state, rate=0.001, burst=3, reserve=1)
+    bucket.acquire("batch")
+    bucket.acquire("batch")
+    with pytest.raises(RateLimitTimeout, match="batch"):
+        bucket.acquire("batch", timeout=0.05)
+    bucket.acquire("interactive")
+    assert bucket.metrics()["tokens"] < 1
+
+
+@pytest.mark.parametrize("burst, reserve, expected", [(5, 1, 1), (3, 10, 2), (1, 1, 0)])
+def test_reserve_always_leaves_batch_a_token(state, burst, reserve, expected):
+    assert TokenBucket(state, burst=burst, reserve=reserve).reserve == expected
+
+
+def test_batch_yields_while_an_interactive_waiter_is_registered(state):
+    write_state(state, 5, interactive=[("other-process", time.time() + 60)])
+    bucket = TokenBucket(state, rate=0.001, burst=5, reserve=0)
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire("batch", timeout=0.05)
+    bucket.acquire("interactive")
+    assert bucket.metrics()["lanes"]["interactive"]["queue_depth"] == 1
+
+
+def test_expired_waiters_no_longer_block_batch(state):
+    # A crashed process's entry lapses at its deadline.
+    write_state(state, 5, interactive=[("crashed", time.time() - 1)])
+    bucket = TokenBucket(state, rate=0.001, burst=5, reserve=0)
+    bucket.acquire("batch", timeout=0.05)
+    assert bucket.metrics()["lanes"]["interactive"]["queue_depth"] == 0
+
+
+def test_batch_yields_to_an_interactive_waiter_in_another_instance(state):
+    a, b = TokenBucket(state, rate=0.001, burst=1, reserve=0), TokenBucket(state, rate=0.001, burst=1, reserve=0)
+    a.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(b.acquire("interactive", timeout=5)))
+    waiter.start()
+    deadline = time.monotonic() + 2
+    while a.metrics()["lanes"]["interactive"]["queue_depth"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    # A token turns up while the interactive waiter sleeps between attempts.
+    with a._state() as shared:
+        shared["tokens"] = 1.0
+    with pytest.raises(RateLimitTimeout):
+        a.acquire("batch", timeout=0.05)
+    waiter.join()
+    assert len(results) == 1 and a.metrics()["lanes"]["interactive"]["queue_depth"] == 0
+
+
+def test_timeout_is_counted_and_waiter_unregistered(state):
+    bucket = TokenBucket(state, rate=0.001, burst=1)
+    bucket.acquire()
+    started = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(timeout=0.1)
+    assert 0.1 <= time.monotonic() - started < 1.0
+    lanes = bucket.metrics()["lanes"]
+    assert lanes["interactive"]["timeouts"] == 1 and lanes["interactive"]["queue_depth"] == 0
+    assert lanes["interactive"]["max_wait_seconds"] >= 0.1
+
+
+def test_unknown_lane(state):
+    with pytest.raises(ValueError):
+        TokenBucket(state).acquire("bulk")
@@ -0,0 +1,189 @@
+"""RevisionHistory: replay round trips, branch truncation, pruning, diffs and the per-section record contract."""
+
+import copy
+
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from revisions import MISSING, RevisionHistory, describe_change, diff_trees, outermost, set_path
+
+
+def base_proposal():
+    return {
+        "intake": {"county": "Pinellas", "parcel_id": ""},
+        "project": {"assumptions_checked": {"assump_no_traffic": False}, "assumptions_other": ""},
+        "scope": {"selected_tasks": {}},
+    }
+
+
+def edit(proposal, n):
+    """The nth edit of a small repertoire; returns the section it touched."""
+    kind = n % 5
+    if kind == 0:
+        proposal["intake"]["parcel_id"] = f"19-31-17-{73166 + n:05d}-001-0010"
+        return "intake"
+    if kind == 1:
+        checked = proposal["project"]["assumptions_checked"]
+        checked["assump_no_traffic"] = not checked["assump_no_traffic"]
+        return "project"
+    if kind == 2:
+        proposal["scope"]["selected_tasks"][str(100 + n)] = {"fee": n * 100, "services": {"a": {"hours": n}}}
+        return "scope"
+    if kind == 3:
+        tasks = proposal["scope"]["selected_tasks"]
+        if tasks:
+            tasks.pop(sorted(tasks)[0])
+        return "scope"
+    proposal["project"]["assumptions_other"] += f" note {n}."
+    return "project"
+
+
+def build(edits, limit=200):
+    proposal = base_proposal()
+    history = RevisionHistory(proposal, "p", limit=limit)
+    snapshots = [copy.deepcopy(proposal)]
+    for n in edits:
+        section = edit(proposal, n)
+        if history.record(proposal, {(section,)}, label=f"edit {n}"):
+            snapshots.append(copy.deepcopy(proposal))
+    return proposal, history, snapshots
+
+
+@settings(max_examples=50, deadline=None)
+@given(st.lists(st.integers(0, 40), min_size=1, max_size=25), st.data())
+def test_goto_reaches_every_revision_in_any_order(edits, data):
+    proposal, history, snapshots = build(edits)
+    assert history.head == len(snapshots) - 1
+    for _ in range(10):
+        target = data.draw(st.integers(0, history.head))
+        assert history.goto(proposal, target)
+        assert history.cursor == target
+        assert proposal == snapshots[target] and history.shadow == snapshots[target]
+
+
+def test_undo_and_redo_step_through_the_history():
+    proposal, history, snapshots = build(range(8))
+    while history.undo(proposal):
+        assert proposal == snapshots[history.cursor]
+    assert not history.can_undo() and proposal == snapshots[0]
+    while history.redo(proposal):
+        assert proposal == snapshots[history.cursor]
+    assert not history.can_redo() and proposal == snapshots[-1]
+    assert not history.goto(proposal, history.head + 1)
+
+
+def test_edit_after_undo_drops_the_redo_branch_and_its_checkpoints():
+    proposal, history, snapshots = build(range(6))
+    history.checkpoint("before")
+    history.goto(proposal, 2)
+    history.checkpoint("kept")
+    history.goto(proposal, 4)
+    history.checkpoint("on_branch")
+    history.goto(proposal, 2)
+
+    proposal["intake"]["county"] = "Pasco"
+    assert history.record(proposal, {("intake",)})
+    assert history.head == history.cursor == 3 and not history.can_redo()
+    assert set(history.checkpoints) == {"kept"}
+    assert history.restore(proposal, "kept") and proposal == snapshots[2]
+    assert not history.restore(proposal, "before")
+
+
+def test_limit_prunes_the_oldest_revisions_and_their_checkpoints():
+    proposal = base_proposal()
+    history = RevisionHistory(proposal, limit=3)
+    history.checkpoint("start")
+    snapshots = {0: copy.deepcopy(proposal)}
+    for n in range(6):
+        proposal["intake"]["parcel_id"] = str(n)
+        history.record(proposal, {("intake",)})
+        snapshots[history.cursor] = copy.deepcopy(proposal)
+        if n == 3:
+            history.checkpoint("late")
+    assert (history.base, history.head, len(history.revisions)) == (3, 6, 3)
+    assert set(history.checkpoints) == {"late"}
+    assert not history.goto(proposal, 2)
+    assert history.goto(proposal, 3) and proposal == snapshots[3]
+    assert not history.undo(proposal)
+
+
+@pytest.mark.parametrize("a, b", [(0, 5), (5, 0), (2, 4), (4, 2), (3, 3)])
+def test_diff_turns_revision_a_into_b_in_either_direction(a, b):
+    _, history, snapshots = build(range(5))
+    changes = history.diff(a, b)
+    result = copy.deepcopy(snapshots[a])
+    for path, old, new in changes:
+        set_path(result, path, new)
+    assert result == snapshots[b]
+    assert {path for path, _, _ in changes} == {path for path, _, _ in diff_trees(snapshots[a], snapshots[b])}
+    assert all(describe_change(change) for change in changes)
+
+
+def test_diff_rejects_revisions_outside_the_history():
+    _, history, _ = build(range(3), limit=2)
+    with pytest.raises(ValueError):
+        history.diff(0, 3)
+    with pytest.raises(ValueError):
+        history.diff(1, 4)
+
+
+def test_diff_drops_leaves_that_change_back():
+    proposal = base_proposal()
+    history = RevisionHistory(proposal)
+    for county in ("Pasco", "Pinellas"):
+        proposal["intake"]["county"] = county
+        history.record(proposal, {("intake",)})
+    assert history.diff(0, 2) == []
+    assert history.diff(0, 1) == [(("intake", "county"), "Pinellas", "Pasco")]
+
+
+# -----------------------------------------------------------------------------
+# record(paths=...)
+# -----------------------------------------------------------------------------
+def test_record_only_compares_the_marked_sections():
+    proposal = base_proposal()
+    history = RevisionHistory(proposal)
+    proposal["intake"]["county"] = "Pasco"
+    proposal["scope"]["selected_tasks"]["150"] = {"fee": 5000}
+    assert history.record(proposal, {("intake",)})
+    assert history.revisions[-1].changes == [(("intake", "county"), "Pinellas", "Pasco")]
+    assert not history.record(proposal, set())
+    assert not history.record(proposal, {("project",)})
+
+
+def test_unmarked_mutation_drifts_into_the_next_revision_of_its_section():
+    proposal = base_proposal()
+    history = RevisionHistory(proposal)
+    # Not marked: the shadow still holds the old scope.
+    proposal["scope"]["selected_tasks"]["150"] = {"fee": 5000}
+    proposal["intake"]["county"] = "Pasco"
+    history.record(proposal, {("intake",)})
+    proposal["scope"]["selected_tasks"]["310"] = {"fee": 0}
+    history.record(proposal, {("scope",)})
+    assert {path for path, _, _ in history.revisions[-1].changes} == {
+        ("scope", "selected_tasks", "150"), ("scope", "selected_tasks", "310"),
+    }
+    history.undo(proposal)
+    assert proposal["scope"]["selected_tasks"] == {} and proposal["intake"]["county"] == "Pasco"
+
+
+def test_nested_paths_are_compared_once():
+    assert outermost([("scope", "selected_tasks"), ("scope",), ("intake", "county"), ("scope",)]) == [
+        ("scope",), ("intake", "county"),
+    ]
+    proposal = base_proposal()
+    history = RevisionHistory(proposal)
+    proposal["scope"]["selected_tasks"]["150"] = {"fee": 1}
+    history.record(proposal, [("scope",), ("scope", "selected_tasks")])
+    assert len(history.revisions[-1].changes) == 1
+
+
+def test_removed_keys_are_restored_on_undo():
+    proposal = base_proposal()
+    history = RevisionHistory(proposal)
+    del proposal["intake"]["parcel_id"]
+    history.record(proposal, {("intake",)})
+    assert history.revisions[-1].changes == [(("intake", "parcel_id"), "", MISSING)]
+    history.undo(proposal)
+    assert proposal == base_proposal()
@@ -0,0 +1,121 @@
+"""SessionSpiller: spill and restore round trip, the idle sweep, and an unsupported Streamlit runtime."""
+
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+from streamlit.runtime import Runtime
+from streamlit.runtime.app_session import AppSessionState
+
+import session_spill
+from session_spill import SessionSpiller
+
+
+def session_state():
+    return {
+        "proposal": {"intake": {"parcel_id": "19-31-17-73166-001-0010"}, "scope": {"selected_tasks": {"150": {"fee": 5000}}}},
+        "revision_history": ["r1", "r2"],
+        "tab2_assump_no_traffic": True,
+        "lookup_refresh": False,
+    }
+
+
+@pytest.fixture
+def spiller(tmp_path):
+    return SessionSpiller(tmp_path / "spill", idle_seconds=0.0, widget_prefixes=("tab2_",))
+
+
+def test_spill_and_restore_round_trip(spiller):
+    state = session_state()
+    spiller.touch("s1", state)
+    released = spiller.spill("s1", state)
+    assert released > 0 and spiller.spilled == {"s1": released}
+    assert state == {"lookup_refresh": False}
+    assert (spiller.directory / "s1.pkl").exists()
+
+    assert spiller.touch("s1", state)
+    assert state["proposal"] == session_state()["proposal"] and state["revision_history"] == ["r1", "r2"]
+    # Widget values are not spilled; the browser sends them back.
+    assert "tab2_assump_no_traffic" not in state
+    assert not (spiller.directory / "s1.pkl").exists()
+    assert spiller.stats["spilled"] == spiller.stats["rehydrated"] == 1
+    assert not spiller.touch("s1", state)
+
+
+def test_restore_keeps_keys_the_session_already_set_again(spiller):
+    state = session_state()
+    spiller.spill("s1", state)
+    state["proposal"] = {"new": True}
+    spiller.touch("s1", state)
+    assert state["proposal"] == {"new": True} and state["revision_history"] == ["r1", "r2"]
+
+
+def test_spill_skips_recently_active_and_empty_sessions(spiller):
+    state = session_state()
+    spiller.touch("s1", state)
+    assert spiller.spill("s1", state, min_idle=60) == 0
+    assert spiller.spill("s2", {"lookup_refresh": True}) == 0
+    assert state == session_state()
+
+
+def test_unreadable_spill_file_is_counted_as_failed(spiller):
+    state = session_state()
+    spiller.spill("s1", state)
+    (spiller.directory / "s1.pkl").write_bytes(b"not a pickle")
+    assert not spiller.touch("s1", state)
+    assert spiller.stats["failed"] == 1 and "proposal" not in state
+
+
+def fake_runtime(monkeypatch, runtime):
+    monkeypatch.setattr(Runtime, "exists", classmethod(lambda cls: True))
+    monkeypatch.setattr(Runtime, "instance", classmethod(lambda cls: runtime))
+
+
+def test_sweep_spills_idle_sessions_and_forgets_closed_ones(spiller, monkeypatch):
+    idle, running = session_state(), session_state()
+    sessions = {
+        "idle": SimpleNamespace(session=SimpleNamespace(session_state=idle, _state=AppSessionState.APP_NOT_RUNNING)),
+        "running": SimpleNamespace(session=SimpleNamespace(session_state=running, _state=AppSessionState.APP_IS_RUNNING)),
+    }
+    fake_runtime(monkeypatch, SimpleNamespace(_session_mgr=SimpleNamespace(get_session_info=sessions.get)))
+    for session_id in ("idle", "running", "closed"):
+        spiller.touch(session_id, {})
+    time.sleep(0.01)
+
+    assert spiller.sweep() == 1
+    assert "proposal" not in idle and running == session_state()
+    assert set(spiller.last_seen) == {"idle", "running"}
+    assert spiller.touch("idle", idle) and idle["proposal"] == session_state()["proposal"]
+
+
+@pytest.mark.parametrize("runtime", [
+    SimpleNamespace(),
+    SimpleNamespace(_session_mgr=SimpleNamespace()),
+    SimpleNamespace(_session_mgr=SimpleNamespace(get_session_info=lambda session_id: SimpleNamespace(session=object()))),
+])
+def test_sweep_leaves_everything_alone_on_an_unsupported_runtime(spiller, monkeypatch, caplog, runtime):
+    state = session_state()
+    spiller.touch("s1", state)
+    spiller.spill("s1", state)
+    spiller.touch("s2", session_state())
+    fake_runtime(monkeypatch, runtime)
+    monkeypatch.setattr(session_spill, "_reported", set())
+
+    with caplog.at_level(logging.WARNING, logger="session_spill"):
+        assert spiller.sweep() == 0
+        spiller.sweep()
+        rows = spiller.sessions()
+    assert len([r for r in caplog.records if "spill disabled" in r.getMessage()]) == 1
+    assert spiller.unsupported and len(rows) == 2
+    # Nothing forgotten or deleted: s1 still comes back on its next run.
+    assert set(spiller.last_seen) == {"s1", "s2"} and (spiller.directory / "s1.pkl").exists()
+    assert spiller.touch("s1", state) and state["proposal"] == session_state()["proposal"]
+
+
+def test_widget_count_falls_back_to_zero_without_the_private_attribute(app, monkeypatch):
+    monkeypatch.setattr(app, "get_script_run_ctx", lambda: SimpleNamespace(shared=SimpleNamespace()))
+    assert app.widgets_this_run() == 0
+    ids = SimpleNamespace(snapshot=lambda: {"a", "b"})
+    monkeypatch.setattr(app, "get_script_run_ctx", lambda: SimpleNamespace(shared=SimpleNamespace(widget_ids_this_run=ids)))
+    assert app.widgets_this_run() == 2
@@ -0,0 +1,87 @@
+"""SimilarityIndex: TF-IDF cosine over live documents, however often proposals are re-saved."""
+
+import numpy as np
+import pytest
+
+import similarity
+from proposal_store import ProposalStore
+from similarity import SimilarityIndex, hash_features, proposal_text
+
+WORDS = "pond grading drainage retail parking utility lift station wetland flood plat traffic sidewalk".split()
+
+
+def proposal(i, edit=0):
+    rng = np.random.default_rng(i * 1000 + edit)
+    return {
+        "project": {
+            "project_description_short": " ".join(rng.choice(WORDS, size=12)),
+            "assumptions_checked": {"assump_no_traffic": bool(i % 2)},
+        },
+        "scope": {"selected_tasks": {str(110 + i % 3 * 100): {}}},
+    }
+
+
+def expected_scores(bodies, query):
+    """Brute-force TF-IDF cosine of query against every body, with idf over these bodies only."""
+    docs = [dict(zip(*hash_features(*proposal_text(body)))) for body in bodies.values()]
+    df = {}
+    for doc in docs:
+        for t in doc:
+            df[t] = df.get(t, 0) + 1
+    idf = {t: np.log((1 + len(docs)) / (1 + n)) + 1.0 for t, n in df.items()}
+    q = {t: w * idf.get(t, np.log(1 + len(docs)) + 1.0) for t, w in zip(*hash_features(*proposal_text(query)))}
+    qn = np.sqrt(sum(v * v for v in q.values()))
+    out = {}
+    for proposal_id, doc in zip(bodies, docs):
+        d = {t: w * idf[t] for t, w in doc.items()}
+        dn = np.sqrt(sum(v * v for v in d.values()))
+        out[proposal_id] = sum(q[t] * d.get(t, 0.0) for t in q) / (qn * dn) if dn else 0.0
+    return out
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProposalStore(str(tmp_path / "proposals.db"))
+
+
+def check(index, bodies, query, k=50):
+    expected = expected_scores(bodies, query)
+    found = dict(index.query(query, k=k))
+    assert found.keys() == {p for p, score in expected.items() if score > 0}
+    for proposal_id, score in found.items():
+        assert score == pytest.approx(expected[proposal_id], rel=1e-4)
+
+
+def test_scores_are_tf_idf_cosine(store):
+    bodies = {f"p-{i}": proposal(i) for i in range(30)}
+    for proposal_id, body in bodies.items():
+        store.save(proposal_id, body)
+    check(SimilarityIndex(store), bodies, proposal(99))
+
+
+@pytest.mark.parametrize("tail_limit", [4, 1000])
+def test_resaves_keep_the_index_to_its_live_documents(store, monkeypatch, tail_limit):
+    # A small tail limit pushes rows into the main block, where re-saves leave dead rows.
+    monkeypatch.setattr(similarity, "TAIL_LIMIT", tail_limit)
+    index = SimilarityIndex(store)
+    bodies = {}
+    for edit in range(40):
+        for i in range(10):
+            bodies[f"p-{i}"] = proposal(i, edit)
+            store.save(f"p-{i}", bodies[f"p-{i}"])
+        index.refresh()
+        assert len(index) == 10
+        assert len(index.ids) <= 10 / (1 - similarity.DEAD_FRACTION) + 1
+        assert index.dead <= len(index.ids) * similarity.DEAD_FRACTION
+    fresh = SimilarityIndex(store)
+    fresh.refresh()
+    assert (index.doc_freq == fresh.doc_freq).all()
+    check(index, bodies, proposal(3, 7))
+
+
+def test_exclude_and_empty_queries(store):
+    for i in range(5):
+        store.save(f"p-{i}", proposal(i))
+    index = SimilarityIndex(store)
+    assert "p-2" not in dict(index.query(proposal(2), k=5, exclude=["p-2"]))
+    assert index.query({}) == []
@@ -0,0 +1,163 @@
+"""
+Lightweight tracing spans in Chrome trace-event format.
+
+    with tracer.span("render_tab3"):
+        ...
+
+Each finished span becomes a complete ("ph": "X") event. Events go to a
+per-process file `<dir>/trace-<pid>.json` in the JSON-array trace format,
+which chrome://tracing and https://ui.perfetto.dev open directly (the
+format allows the closing bracket to be missing, so events are appended).
+Once the file exceeds max_bytes it is rotated to .1, .2, ... like
+logging's RotatingFileHandler.
+
+Between begin_run() and end_run() the spans of the current thread are also
+collected and returned by end_run(), for a per-rerun waterfall. When there
+is no trace file and no collection on the current thread, span() returns a
+shared no-op context manager, so disabled tracing costs one attribute check.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start_us", "started", "depth")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args) -> None:
+        """Attach extra args (status code, cache outcome, ...) to the span."""
+        self.args.update(args)
+
+    def __enter__(self):
+        local = self.tracer._local
+        self.depth = getattr(local, "depth", 0)
+        local.depth = self.depth + 1
+        self.start_us = time.time_ns() // 1000
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        self.tracer._local.depth = self.depth
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._emit({
+            "name": self.name,
+            "cat": self.cat,
+            "ph": "X",
+            "ts": self.start_us,
+            "dur": round(duration * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "args": dict(self.args, depth=self.depth),
+        })
+        return False
+
+
+class Tracer:
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self.directory / f"trace-{os.getpid()}.json" if self.directory else None
+
+    def span(self, name: str, cat: str = "app", **args):
+        if self.directory is None and getattr(self._local, "events", None) is None:
+            return NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def begin_run(self) -> None:
+        """Start collecting this thread's spans (one Streamlit rerun)."""
+        self._local.events = []
+        self._local.depth = 0
+
+    def end_run(self) -> List[Dict[str, Any]]:
+        """Stop collecting; write the collected spans to the trace file and return them."""
+        events = getattr(self._local, "events", None) or []
+        self._local.events = None
+        self._write(events)
+        return events
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        events = getattr(self._local, "events", None)
+        if events is not None:
+            events.append(event)
+        else:
+            self._write([event])
+
+    def _write(self, events: List[Dict[str, Any]]) -> None:
+        path = self.path
+        if path is None or not events:
+            return
+        data = "".join(json.dumps(event, separators=(",", ":")) + ",\n" for event in events)
+        with self._lock:
+            try:
+                if path.exists() and path.stat().st_size + len(data) > self.max_bytes:
+                    self._rotate(path)
+                new_file = not path.exists()
+                with open(path, "a", encoding="utf-8") as f:
+                    if new_file:
+                        f.write("[\n")
+                    f.write(data)
+            except OSError:
+                pass
+
+    def _rotate(self, path: Path) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            older = path.with_name(f"{path.name}.{i}")
+            if older.exists():
+                os.replace(older, path.with_name(f"{path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(path, path.with_name(f"{path.name}.1"))
+        else:
+            path.unlink()
+
+
+def waterfall_rows(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Spans of one run as rows (start/end in ms from the run's first span), in start order."""
+    if not events:
+        return []
+    origin = min(event["ts"] for event in events)
+    rows = []
+    for event in sorted(events, key=lambda e: (e["ts"], -e["dur"])):
+        depth = event["args"].get("depth", 0)
+        start = (event["ts"] - origin) / 1000
+        rows.append({
+            "span": "  " * depth + event["name"],
+            "start_ms": round(start, 2),
+            "end_ms": round(start + event["dur"] / 1000, 2),
+            "duration_ms": round(event["dur"] / 1000, 2),
+            "depth": depth,
+        })
+    return rows
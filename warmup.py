@@ -0,0 +1,92 @@
+"""
+Once-per-process warm-up and cold-start timing.
+
+A fresh worker would otherwise pay for lazy imports, parser setup, overlay
+layers, the TLS handshake to pcpao.gov and a cold local cache tier on the
+first user's first click. Warmup runs named stages in a daemon thread,
+started from the first script run, and records how long each took or why it
+failed; a failing stage never stops the others.
+
+ColdStart records how long the first page load and the first interaction
+in this process took, so runs with and without warm-up can be compared
+(benchmarks/cold_start.py does this on fresh processes).
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Stage = Tuple[str, Callable[[], Any]]
+
+
+class Warmup:
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = list(stages)
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.seconds = 0.0
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Warmup":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def run(self) -> None:
+        started = time.perf_counter()
+        try:
+            for name, stage in self.stages:
+                stage_started = time.perf_counter()
+                try:
+                    detail = stage()
+                    result = {"detail": "" if detail is None else str(detail)}
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                result["seconds"] = time.perf_counter() - stage_started
+                self.results[name] = result
+        finally:
+            self.seconds = time.perf_counter() - started
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def report(self) -> List[Dict[str, Any]]:
+        """One row per stage: name, ms, and detail or error ("pending" until it has run)."""
+        rows = []
+        for name, _ in self.stages:
+            result = self.results.get(name)
+            if result is None:
+                rows.append({"stage": name, "ms": None, "result": "pending"})
+            else:
+                rows.append({
+                    "stage": name,
+                    "ms": round(result["seconds"] * 1000, 1),
+                    "result": result.get("error") or result["detail"],
+                })
+        return rows
+
+
+class ColdStart:
+    """First page load and first interaction of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.first_load: Optional[float] = None
+        self.first_interaction: Optional[float] = None
+
+    def observe(self, seconds: float, interaction: bool) -> None:
+        with self._lock:
+            if interaction and self.first_interaction is None:
+                self.first_interaction = seconds
+            elif not interaction and self.first_load is None:
+                self.first_load = seconds
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            return {"first_load": self.first_load, "first_interaction": self.first_interaction}